@@ -0,0 +1,439 @@
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import fields
+import asyncio
+import base64
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from price_data import PriceDownloadError
+from strategy_engine import (
+    CostModel,
+    Direction,
+    ExitRules,
+    PairResult,
+    PerformanceMetrics,
+    StrategyPlan,
+    analyze_pair,
+    analyze_pair_momentum,
+    generate_strategy_plan,
+    size_positions,
+)
+
+
+# ---------------------------------------------------------
+# Configuration (environment variables)
+# ---------------------------------------------------------
+API_WORKERS = int(os.environ.get("HEDGEHUB_API_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+API_QUEUE = int(os.environ.get("HEDGEHUB_API_QUEUE", 16))             # waiting jobs beyond busy workers
+API_JOB_TIMEOUT = float(os.environ.get("HEDGEHUB_API_TIMEOUT", 120))
+API_CACHE_TTL = float(os.environ.get("HEDGEHUB_API_CACHE_TTL", 900))
+API_CACHE_ENTRIES = int(os.environ.get("HEDGEHUB_API_CACHE_ENTRIES", 1024))
+
+
+# ---------------------------------------------------------
+# Columnar series encoding
+# ---------------------------------------------------------
+def encode_array(values) -> dict:
+    """Little-endian raw buffer, base64; decode with np.frombuffer(b64decode(data), dtype)."""
+    array = np.ascontiguousarray(values)
+    if array.dtype.kind == "M":
+        array = array.astype("datetime64[ns]").view("<i8")
+        dtype = "datetime64[ns]"
+    else:
+        array = array.astype(array.dtype.newbyteorder("<"), copy=False)
+        dtype = array.dtype.str
+    return {"dtype": dtype, "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def encode_frame(frame: pd.DataFrame | pd.Series | None) -> dict | None:
+    """One shared index plus one binary column per series (instead of row-wise records)."""
+    if frame is None:
+        return None
+    if isinstance(frame, pd.Series):
+        frame = frame.to_frame(frame.name if frame.name is not None else "value")
+    index = frame.index
+    if isinstance(index, pd.DatetimeIndex) and index.tz is not None:
+        index = index.tz_localize(None)
+    return {
+        "length": len(frame),
+        "index": encode_array(np.asarray(index)),
+        "columns": {str(col): encode_array(frame[col].to_numpy(dtype=np.float64)) for col in frame.columns},
+    }
+
+
+def decode_frame(payload: dict | None) -> pd.DataFrame | None:
+    """Inverse of encode_frame, for Python clients."""
+    if payload is None:
+        return None
+
+    def _decode(column: dict) -> np.ndarray:
+        raw = base64.b64decode(column["data"])
+        if column["dtype"] == "datetime64[ns]":
+            return np.frombuffer(raw, dtype="<i8").view("datetime64[ns]")
+        return np.frombuffer(raw, dtype=column["dtype"])
+
+    return pd.DataFrame(
+        {name: _decode(column) for name, column in payload["columns"].items()},
+        index=_decode(payload["index"]),
+    )
+
+
+def _plain(value):
+    if isinstance(value, (np.floating, float)):
+        return float(value) if np.isfinite(value) else None
+    if isinstance(value, (np.integer, np.bool_)):
+        return value.item()
+    return value
+
+
+def _direction_json(direction) -> str:
+    # /plan and /positions both answer with the name, which /positions accepts back
+    return Direction(direction).name
+
+
+def _performance_json(perf: PerformanceMetrics | None, include_series: bool) -> dict | None:
+    if perf is None:
+        return None
+    out = {
+        f.name: _plain(getattr(perf, f.name))
+        for f in fields(perf)
+        if f.name not in ("daily_returns", "equity_curve", "intervals")
+    }
+    if perf.intervals is not None:
+        intervals = {}
+        for f in fields(perf.intervals):
+            value = getattr(perf.intervals, f.name)
+            intervals[f.name] = [_plain(v) for v in value] if isinstance(value, tuple) else _plain(value)
+        out["intervals"] = intervals
+    if include_series:
+        out["daily_returns"] = encode_frame(perf.daily_returns)
+    return out
+
+
+def _pair_result_json(result: PairResult, include_series: bool) -> dict:
+    out = {
+        name: _plain(getattr(result, name))
+        for name in (
+            "pair_ok", "mode", "signal", "explanation", "hedge_ratio", "coint_pvalue",
+            "last_spread", "last_zscore", "entry_z", "exit_z", "spread_mean", "spread_std",
+            "half_life", "hurst", "variance_ratio",
+        )
+    }
+    out["performance"] = _performance_json(result.performance, include_series)
+    out["preset_performance"] = {
+        key: _performance_json(perf, False) for key, perf in (result.preset_performance or {}).items()
+    }
+    if result.walk_forward is not None:
+        out["walk_forward"] = _performance_json(result.walk_forward.performance, False)
+    if include_series:
+        out["series"] = {
+            "prices": encode_frame(result.prices),
+            "spread": encode_frame(result.spread_series.rename("spread")),
+            "zscore": encode_frame(
+                result.spread_zscores.rename("zscore") if result.spread_zscores is not None else None
+            ),
+            "rolling_pvalue": encode_frame(
+                result.rolling_pvalue.rename("pvalue") if result.rolling_pvalue is not None else None
+            ),
+        }
+    return out
+
+
+def _plan_json(plan: StrategyPlan) -> dict:
+    out = {
+        name: _plain(getattr(plan, name))
+        for name in (
+            "risk_level", "signal_type", "rationale", "entry_z", "exit_z", "spread_value",
+            "zscore_value", "allocation_pct", "suggested_notional", "hedge_ratio",
+            "ticker_a", "ticker_b",
+        )
+    }
+    out["direction"] = _direction_json(plan.direction)
+    out["performance"] = _performance_json(plan.performance, False)
+    return out
+
+
+# ---------------------------------------------------------
+# Jobs executed in the worker pool (module level so they pickle)
+# ---------------------------------------------------------
+def _pair_kwargs(body: dict) -> dict:
+    kwargs = {
+        "ticker_a": str(body["ticker_a"]).strip().upper(),
+        "ticker_b": str(body["ticker_b"]).strip().upper(),
+        "start": str(body["start"]),
+        "end": str(body["end"]),
+    }
+    for name in ("entry_z", "exit_z", "p_threshold"):
+        if body.get(name) is not None:
+            kwargs[name] = float(body[name])
+    if body.get("regime_window") is not None:
+        kwargs["regime_window"] = int(body["regime_window"])
+    if body.get("regime_filter") is not None:
+        kwargs["regime_filter"] = bool(body["regime_filter"])
+    if body.get("cost_model"):
+        kwargs["cost_model"] = CostModel(**body["cost_model"])
+    if body.get("exit_rules"):
+        kwargs["exit_rules"] = ExitRules(**body["exit_rules"])
+    return kwargs
+
+
+def _analyze_job(body: dict) -> dict:
+    result = analyze_pair(**_pair_kwargs(body))
+    return _pair_result_json(result, bool(body.get("include_series", True)))
+
+
+def _momentum_job(body: dict) -> dict:
+    kwargs = {key: value for key, value in _pair_kwargs(body).items()
+              if key in ("ticker_a", "ticker_b", "start", "end")}
+    for name in ("high_pct", "low_pct"):
+        if body.get(name) is not None:
+            kwargs[name] = float(body[name])
+    result = analyze_pair_momentum(**kwargs)
+    return _pair_result_json(result, bool(body.get("include_series", True)))
+
+
+def _plan_job(body: dict) -> dict:
+    kwargs = _pair_kwargs(body)
+    mode = body.get("mode", "pairs_trading")
+    if mode == "momentum":
+        result = analyze_pair_momentum(
+            kwargs["ticker_a"], kwargs["ticker_b"], kwargs["start"], kwargs["end"]
+        )
+    else:
+        result = analyze_pair(**kwargs)
+    plan = generate_strategy_plan(
+        amount=float(body["amount"]),
+        risk_level=str(body.get("risk_level", "Medium")),
+        pair_result=result,
+        ticker_a=kwargs["ticker_a"],
+        ticker_b=kwargs["ticker_b"],
+    )
+    return _plan_json(plan)
+
+
+def _positions_job(body: dict) -> dict:
+    # orders may be columnar ({"ticker_a": [...], ...}) or a list of row objects
+    orders = pd.DataFrame(body["orders"])
+    lot_size = body.get("lot_size", 1)
+    sized = size_positions(orders, lot_size=None if lot_size is None else int(lot_size))
+    sized["direction"] = [_direction_json(value) for value in sized["direction"]]
+    return {
+        "columns": {
+            str(col): [_plain(value) for value in sized[col].tolist()] for col in sized.columns
+        }
+    }
+
+
+# ---------------------------------------------------------
+# Pool with backpressure and response cache
+# ---------------------------------------------------------
+class ServiceFull(Exception):
+    pass
+
+
+class ResponseCache:
+    """LRU of encoded JSON bodies keyed by endpoint and canonical request."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, body: bytes) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class JobRunner:
+    """
+    Bounded process pool. At most ``workers + queue_size`` jobs are admitted;
+    beyond that ``submit`` raises ServiceFull (HTTP 429). Identical requests
+    share one running job and then the cached response. The shared job is a
+    task owned by the runner, not by the request that started it, so a
+    client that disconnects only stops waiting; the others still get the
+    result.
+
+    A slot is held until the pool job itself finishes, not until the request
+    gives up: a job that times out (504) while running keeps its worker busy,
+    so it keeps counting against capacity. Timed-out jobs still queued are
+    cancelled and release their slot at once.
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout: float, cache: ResponseCache):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.timeout = timeout
+        self.cache = cache
+        self.in_flight = 0
+        self.rejected = 0
+        self._pool: ProcessPoolExecutor | None = None
+        self._running: dict[str, asyncio.Task] = {}
+
+    def start(self) -> None:
+        if self._pool is None:
+            # spawn: forking the server process (event loop, threads) can deadlock the children
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def stop(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def submit(self, name: str, job, body: dict) -> bytes:
+        key = name + ":" + hashlib.sha256(
+            json.dumps(body, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        task = self._running.get(key)
+        if task is None:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                raise ServiceFull()
+
+            self.start()
+            loop = asyncio.get_running_loop()
+            self.in_flight += 1
+            job_future = self._pool.submit(job, body)
+            job_future.add_done_callback(lambda _: self._release_from_pool(loop))
+            task = loop.create_task(self._finish(key, job_future))
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())  # mark retrieved
+            self._running[key] = task
+        # a waiter that is cancelled (client gone) leaves the shared task running
+        return await asyncio.shield(task)
+
+    async def _finish(self, key: str, job_future) -> bytes:
+        try:
+            # on timeout wait_for cancels the wrapper, which cancels the job if not yet started
+            payload = await asyncio.wait_for(asyncio.wrap_future(job_future), self.timeout)
+            encoded = json.dumps(payload, separators=(",", ":")).encode()
+            self.cache.put(key, encoded)
+            return encoded
+        finally:
+            self._running.pop(key, None)
+
+    def _release_from_pool(self, loop: asyncio.AbstractEventLoop) -> None:
+        # runs on the pool's result thread; the counter is only touched on the loop
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass                            # loop already closed at shutdown
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+
+
+RUNNER = JobRunner(
+    API_WORKERS, API_QUEUE, API_JOB_TIMEOUT, ResponseCache(API_CACHE_TTL, API_CACHE_ENTRIES)
+)
+
+
+# ---------------------------------------------------------
+# HTTP layer
+# ---------------------------------------------------------
+def _error(status: int, message: str, **headers) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status, headers=headers or None)
+
+
+def _endpoint(name: str, job, required: tuple[str, ...]):
+    async def handler(request: Request) -> Response:
+        try:
+            body = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return _error(400, "Request body must be JSON")
+        if not isinstance(body, dict):
+            return _error(400, "Request body must be a JSON object")
+        missing = [field for field in required if body.get(field) in (None, "")]
+        if missing:
+            return _error(400, f"Missing fields: {', '.join(missing)}")
+
+        try:
+            encoded = await RUNNER.submit(name, job, body)
+        except ServiceFull:
+            return _error(429, "Analysis workers are saturated, retry shortly", **{"Retry-After": "2"})
+        except asyncio.TimeoutError:
+            return _error(504, f"Analysis timed out after {RUNNER.timeout:g}s")
+        except PriceDownloadError as err:
+            return _error(503 if err.retryable else 422, str(err))
+        except (KeyError, TypeError, ValueError) as err:
+            return _error(422, str(err))
+        return Response(encoded, media_type="application/json")
+
+    return handler
+
+
+async def health(request: Request) -> JSONResponse:
+    return JSONResponse(
+        {
+            "workers": RUNNER.workers,
+            "capacity": RUNNER.capacity,
+            "in_flight": RUNNER.in_flight,
+            "rejected": RUNNER.rejected,
+            "cache_entries": len(RUNNER.cache._entries),
+            "cache_hits": RUNNER.cache.hits,
+            "cache_misses": RUNNER.cache.misses,
+        }
+    )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    RUNNER.start()
+    try:
+        yield
+    finally:
+        RUNNER.stop()
+
+
+_PAIR_FIELDS = ("ticker_a", "ticker_b", "start", "end")
+
+app = Starlette(
+    routes=[
+        Route("/analyze", _endpoint("analyze", _analyze_job, _PAIR_FIELDS), methods=["POST"]),
+        Route("/momentum", _endpoint("momentum", _momentum_job, _PAIR_FIELDS), methods=["POST"]),
+        Route("/plan", _endpoint("plan", _plan_job, _PAIR_FIELDS + ("amount",)), methods=["POST"]),
+        Route("/positions", _endpoint("positions", _positions_job, ("orders",)), methods=["POST"]),
+        Route("/health", health, methods=["GET"]),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        app,
+        host=os.environ.get("HEDGEHUB_API_HOST", "127.0.0.1"),
+        port=int(os.environ.get("HEDGEHUB_API_PORT", 8001)),
+    )
@@ -0,0 +1,194 @@
+from __future__ import annotations
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+import asyncio
+import multiprocessing
+import os
+
+import pandas as pd
+
+from price_data import download_prices
+from shared_cache import shared_get, shared_set
+from strategy_engine import (
+    PairResult,
+    analysis_request,
+    analyze_pair_momentum_prices,
+    analyze_pair_prices,
+)
+
+
+# ---------------------------------------------------------
+# asyncio front-end for the engine
+# ---------------------------------------------------------
+class AsyncEngine:
+    """
+    Non-blocking wrappers around the engine for asyncio services.
+
+    Downloads run in threads (they wait on the network), the statistics and
+    backtests run in a process pool. A semaphore bounds how many pairs are in
+    flight, and every step has its own timeout so a slow ticker only fails
+    its own pair.
+
+    A timeout fails the caller but cannot stop work already started: the
+    download thread or pool job runs to completion. Pool jobs therefore hold
+    one of ``max_workers`` job slots until they actually finish, so jobs
+    abandoned by timeouts delay new computations instead of piling up in the
+    pool queue. Abandoned downloads occupy the loop's default thread pool.
+
+        async with AsyncEngine(max_concurrency=8) as engine:
+            results = await engine.analyze_many([("KO", "PEP"), ("XOM", "CVX")], start, end)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        fetch_timeout: float | None = 30.0,
+        compute_timeout: float | None = 120.0,
+        executor: Executor | None = None,
+        max_workers: int | None = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.fetch_timeout = fetch_timeout
+        self.compute_timeout = compute_timeout
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._max_workers = max_workers or min(max_concurrency, os.cpu_count() or 1)
+        self._semaphore: asyncio.Semaphore | None = None
+        self._job_slots: asyncio.Semaphore | None = None
+
+    async def __aenter__(self) -> "AsyncEngine":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._owns_executor and self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, True, cancel_futures=True)
+
+    def _pool(self) -> Executor:
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and threads can deadlock the children
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _slots(self) -> asyncio.Semaphore:
+        # created lazily so the engine can be built outside the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _jobs(self) -> asyncio.Semaphore:
+        if self._job_slots is None:
+            self._job_slots = asyncio.Semaphore(self._max_workers)
+        return self._job_slots
+
+    async def _timed(self, awaitable, timeout: float | None, what: str):
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"{what} timed out after {timeout:g}s") from None
+
+    async def download_prices(self, ticker: str, start: str, end: str) -> pd.Series:
+        return await self._timed(
+            asyncio.to_thread(download_prices, ticker, start, end),
+            self.fetch_timeout,
+            f"Price download for {ticker}",
+        )
+
+    async def _download_pair(
+        self, ticker_a: str, ticker_b: str, start: str, end: str
+    ) -> tuple[pd.Series, pd.Series]:
+        prices_a, prices_b = await asyncio.gather(
+            self.download_prices(ticker_a, start, end),
+            self.download_prices(ticker_b, start, end),
+        )
+        return prices_a, prices_b
+
+    async def _compute(self, func, what: str):
+        loop = asyncio.get_running_loop()
+        jobs = self._jobs()
+
+        def _release(_):
+            try:
+                loop.call_soon_threadsafe(jobs.release)
+            except RuntimeError:        # loop already closed
+                pass
+
+        async def _run():
+            await jobs.acquire()
+            try:
+                future = self._pool().submit(func)
+            except BaseException:
+                jobs.release()
+                raise
+            # the slot follows the pool job, not this coroutine
+            future.add_done_callback(_release)
+            return await asyncio.wrap_future(future)
+
+        return await self._timed(_run(), self.compute_timeout, what)
+
+    async def _shared(self, key: str, ticker_a: str, ticker_b: str, start: str, end: str, func, what: str):
+        # the shared cache is SQLite on local disk: cheap, but still kept off the loop
+        cached = await asyncio.to_thread(shared_get, key)
+        if cached is not None:
+            return cached
+        prices_a, prices_b = await self._download_pair(ticker_a, ticker_b, start, end)
+        result = await self._compute(partial(func, prices_a, prices_b, ticker_a, ticker_b), what)
+        await asyncio.to_thread(shared_set, key, result)
+        return result
+
+    async def analyze_pair(
+        self,
+        ticker_a: str,
+        ticker_b: str,
+        start: str,
+        end: str,
+        **kwargs,
+    ) -> PairResult:
+        """Same keyword arguments (and shared-cache key) as strategy_engine.analyze_pair."""
+        key, params = analysis_request("analyze_pair", ticker_a, ticker_b, start, end, **kwargs)
+        async with self._slots():
+            return await self._shared(
+                key,
+                ticker_a, ticker_b, start, end,
+                partial(analyze_pair_prices, **params),
+                f"Analysis of {ticker_a}/{ticker_b}",
+            )
+
+    async def analyze_pair_momentum(
+        self,
+        ticker_a: str,
+        ticker_b: str,
+        start: str,
+        end: str,
+        **kwargs,
+    ) -> PairResult:
+        key, params = analysis_request("analyze_pair_momentum", ticker_a, ticker_b, start, end, **kwargs)
+        async with self._slots():
+            return await self._shared(
+                key,
+                ticker_a, ticker_b, start, end,
+                partial(analyze_pair_momentum_prices, **params),
+                f"Momentum analysis of {ticker_a}/{ticker_b}",
+            )
+
+    async def analyze_many(
+        self,
+        pairs: list[tuple[str, str]],
+        start: str,
+        end: str,
+        **kwargs,
+    ) -> dict[tuple[str, str], PairResult | BaseException]:
+        """
+        Analyze many pairs concurrently. Failures (bad ticker, timeout) are
+        returned in place of that pair's result instead of raising.
+        """
+        outcomes = await asyncio.gather(
+            *(self.analyze_pair(a, b, start, end, **kwargs) for a, b in pairs),
+            return_exceptions=True,
+        )
+        return dict(zip(pairs, outcomes))
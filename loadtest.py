@@ -0,0 +1,328 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import random
+import resource
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from price_data import PriceArchive, configure_price_cache, set_price_source
+from result_store import ResultStore
+from shared_cache import configure_shared_cache
+from strategy_engine import (
+    DEFAULT_APP_COST_MODEL,
+    DEFAULT_APP_P_THRESHOLD,
+    analyze_pair,
+    analyze_pair_momentum,
+    compute_positions,
+    generate_strategy_plan,
+    simulate_growth_paths,
+)
+
+
+# ---------------------------------------------------------
+# Load test for one or more app workers
+#
+# Each worker process runs its sessions on a single asyncio loop, and every
+# action executes synchronously on that loop, like a Shiny reactive effect.
+# Latency is measured from the moment the analyst clicks, so it includes
+# the time spent waiting behind other sessions on the same worker. Prices
+# come from an offline fixture archive with a simulated provider round trip.
+# What is exercised is the engine work behind each button (download,
+# analysis, result store, plan, sizing, projection); websocket and render
+# overhead are not included.
+# ---------------------------------------------------------
+ACTIONS = ("run_pair_test", "use_momentum_model", "generate_strategy")
+
+
+@dataclass
+class LoadConfig:
+    name: str = "default"
+    sessions: int = 10              # simulated analysts, spread round-robin over workers
+    workers: int = 1                # app worker processes
+    price_cache: bool = True
+    result_store: bool = False
+    iterations: int = 3             # times each session walks through ACTIONS
+    think_seconds: float = 0.5      # mean pause between clicks (exponential)
+    fetch_latency: float = 0.2      # simulated provider round trip per ticker
+    seed: int = 0
+
+
+# ---------------------------------------------------------
+# Offline price fixture
+# ---------------------------------------------------------
+def synthetic_prices(
+    groups: int = 5,
+    per_group: int = 4,
+    days: int = 1500,
+    seed: int = 0,
+    start: str = "2015-01-02",
+) -> pd.DataFrame:
+    """
+    Date x ticker frame: tickers in a group share a random-walk factor plus
+    their own mean-reverting noise, so within-group pairs cointegrate and
+    cross-group pairs mostly do not.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=days)
+    columns = {}
+    for group in range(groups):
+        factor = np.cumsum(rng.normal(0.0003, 0.012, days))
+        for member in range(per_group):
+            noise = np.zeros(days)
+            shocks = rng.normal(0.0, 0.01, days)
+            for t in range(1, days):
+                noise[t] = 0.95 * noise[t - 1] + shocks[t]
+            scale = rng.uniform(0.6, 1.4)
+            columns[f"G{group}M{member}"] = rng.uniform(20, 200) * np.exp(scale * factor + noise)
+    return pd.DataFrame(columns, index=dates)
+
+
+def build_fixture(
+    path: str | Path,
+    groups: int = 5,
+    per_group: int = 4,
+    days: int = 1500,
+    seed: int = 0,
+) -> PriceArchive:
+    """Synthetic archive of synthetic_prices (adj_close only)."""
+    return PriceArchive.write(path, {"adj_close": synthetic_prices(groups, per_group, days, seed)})
+
+
+class FixturePriceSource:
+    """download_prices backend reading the fixture archive (end date exclusive, like Yahoo)."""
+
+    def __init__(self, archive: PriceArchive, latency: float = 0.0):
+        self.archive = archive
+        self.latency = latency
+
+    def __call__(self, ticker: str, start: str, end: str) -> pd.Series:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        series = self.archive.series(ticker)
+        window = (series.index >= pd.Timestamp(start)) & (series.index < pd.Timestamp(end))
+        return series[window].dropna().copy()
+
+
+# ---------------------------------------------------------
+# Worker process
+# ---------------------------------------------------------
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0   # KiB on Linux
+
+
+class _Session:
+    def __init__(self, session_id: int, tickers: list[str], dates: pd.DatetimeIndex,
+                 config: LoadConfig, store: ResultStore | None):
+        self.rng = random.Random(config.seed * 100_003 + session_id)
+        self.tickers = tickers
+        self.dates = dates
+        self.config = config
+        self.store = store
+        self.pair: tuple[str, str, str, str] | None = None
+        self.result = None
+        self.momentum = None
+
+    def _inputs(self) -> tuple[str, str, str, str]:
+        group = self.rng.choice(sorted({t[:2] for t in self.tickers}))
+        members = [t for t in self.tickers if t.startswith(group)]
+        ticker_a, ticker_b = self.rng.sample(members, 2)
+        years = self.rng.choice((2, 3, 4))
+        end = self.dates[-1] - pd.Timedelta(days=30 * self.rng.randrange(0, 6))
+        start = end - pd.DateOffset(years=years)
+        return ticker_a, ticker_b, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+    def _stored_or_run(self, ticker_a, ticker_b, start, end, mode, params, compute):
+        if self.store is None:
+            return compute()
+        return self.store.load_or_analyze(ticker_a, ticker_b, start, end, mode, params, compute)[1]
+
+    def run_pair_test(self) -> None:
+        ticker_a, ticker_b, start, end = self._inputs()
+        self.pair = (ticker_a, ticker_b, start, end)
+        self.result = self._stored_or_run(
+            ticker_a, ticker_b, start, end, "pairs_trading",
+            {"p_threshold": DEFAULT_APP_P_THRESHOLD, "cost_model": DEFAULT_APP_COST_MODEL},
+            lambda: analyze_pair(
+                ticker_a, ticker_b, start, end,
+                p_threshold=DEFAULT_APP_P_THRESHOLD, cost_model=DEFAULT_APP_COST_MODEL,
+            ),
+        )
+
+    def use_momentum_model(self) -> None:
+        ticker_a, ticker_b, start, end = self.pair
+        self.momentum = self._stored_or_run(
+            ticker_a, ticker_b, start, end, "momentum", {},
+            lambda: analyze_pair_momentum(ticker_a, ticker_b, start, end),
+        )
+
+    def generate_strategy(self) -> None:
+        ticker_a, ticker_b, _, _ = self.pair
+        plan = generate_strategy_plan(
+            amount=float(self.rng.choice((10_000, 50_000, 250_000))),
+            risk_level=self.rng.choice(("Low", "Medium", "High")),
+            pair_result=self.result,
+            ticker_a=ticker_a,
+            ticker_b=ticker_b,
+        )
+        if plan.prices is not None:
+            compute_positions(
+                prices=plan.prices,
+                hedge_ratio=plan.hedge_ratio or 1.0,
+                invest_amount=plan.suggested_notional,
+                signal=plan.signal_type,
+                direction=plan.direction,
+                lot_size=1,
+            )
+        if plan.performance is not None and plan.performance.daily_returns is not None:
+            simulate_growth_paths(plan.performance.daily_returns)
+
+
+async def _drive_session(session: _Session, config: LoadConfig, samples: list) -> None:
+    for _ in range(config.iterations):
+        for action in ACTIONS:
+            think = session.rng.expovariate(1.0 / config.think_seconds) if config.think_seconds > 0 else 0.0
+            clicked = time.perf_counter() + think
+            await asyncio.sleep(think)
+            getattr(session, action)()          # blocks the loop, as a sync Shiny effect does
+            samples.append((action, time.perf_counter() - clicked))
+
+
+def _run_worker(config: LoadConfig, fixture: str, session_ids: list[int]) -> dict:
+    archive = PriceArchive(fixture)
+    set_price_source(FixturePriceSource(archive, config.fetch_latency))
+    configure_price_cache(enabled=config.price_cache)
+    if not config.price_cache:
+        # "cache off" means no cross-process layer either, whatever HEDGEHUB_SHARED_CACHE says
+        configure_shared_cache(enabled=False)
+
+    store = None
+    tmpdir = None
+    if config.result_store:
+        tmpdir = tempfile.TemporaryDirectory()
+        store = ResultStore(Path(tmpdir.name) / "results.db")
+
+    base_rss = _peak_rss_mb()
+    cpu_start = time.process_time()
+    samples: list[tuple[str, float]] = []
+    sessions = [_Session(sid, archive.tickers, archive.dates, config, store) for sid in session_ids]
+
+    async def _main():
+        await asyncio.gather(*(_drive_session(s, config, samples) for s in sessions))
+
+    started = time.perf_counter()
+    asyncio.run(_main())
+    elapsed = time.perf_counter() - started
+
+    if store is not None:
+        store.close()
+        tmpdir.cleanup()
+    return {
+        "samples": samples,
+        "sessions": len(session_ids),
+        "cpu_seconds": time.process_time() - cpu_start,
+        "base_rss_mb": base_rss,
+        "peak_rss_mb": _peak_rss_mb(),
+        "elapsed": elapsed,
+    }
+
+
+# ---------------------------------------------------------
+# Driver and report
+# ---------------------------------------------------------
+def run_load_test(config: LoadConfig, fixture: str | Path) -> pd.DataFrame:
+    """One row per action: latency percentiles (ms) plus per-session CPU and memory."""
+    assignments = [list(range(w, config.sessions, config.workers)) for w in range(config.workers)]
+    assignments = [ids for ids in assignments if ids]
+
+    # fresh interpreters per run, so caches and RSS start from zero like a new deployment
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(assignments), mp_context=context) as pool:
+        results = list(pool.map(_run_worker, itertools.repeat(config), itertools.repeat(str(fixture)), assignments))
+
+    samples = pd.DataFrame(
+        [sample for result in results for sample in result["samples"]],
+        columns=["action", "latency"],
+    )
+    sessions = sum(result["sessions"] for result in results)
+    cpu_per_session = sum(result["cpu_seconds"] for result in results) / sessions
+    mem_per_session = sum(result["peak_rss_mb"] - result["base_rss_mb"] for result in results) / sessions
+    wall = max(result["elapsed"] for result in results)
+
+    rows = []
+    for action in ACTIONS:
+        latency = samples.loc[samples["action"] == action, "latency"].to_numpy() * 1000.0
+        p50, p95, p99 = np.percentile(latency, [50, 95, 99]) if latency.size else (np.nan,) * 3
+        rows.append(
+            {
+                "config": config.name,
+                "workers": config.workers,
+                "sessions": config.sessions,
+                "price_cache": config.price_cache,
+                "result_store": config.result_store,
+                "action": action,
+                "count": latency.size,
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+                "max_ms": latency.max() if latency.size else np.nan,
+                "cpu_s_per_session": cpu_per_session,
+                "peak_mb_per_session": mem_per_session,
+                "actions_per_s": len(samples) / wall if wall > 0 else np.nan,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def compare_configs(configs: list[LoadConfig], fixture: str | Path) -> pd.DataFrame:
+    return pd.concat([run_load_test(config, fixture) for config in configs], ignore_index=True)
+
+
+def main(argv: list[str] | None = None) -> pd.DataFrame:
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the Hedgehub app")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    parser.add_argument("--cache", choices=("on", "off", "both"), default="both")
+    parser.add_argument("--store", action="store_true", help="route analyses through a result store")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--think", type=float, default=0.5, help="mean think time between clicks (s)")
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated provider round trip (s)")
+    parser.add_argument("--fixture", help="existing fixture archive; built in a temp dir if omitted")
+    parser.add_argument("--csv", help="also write the report to this CSV file")
+    args = parser.parse_args(argv)
+
+    base = LoadConfig(
+        sessions=args.sessions,
+        result_store=args.store,
+        iterations=args.iterations,
+        think_seconds=args.think,
+        fetch_latency=args.latency,
+    )
+    cache_modes = {"on": [True], "off": [False], "both": [True, False]}[args.cache]
+    configs = [
+        replace(base, name=f"w{workers}-cache_{'on' if cache else 'off'}", workers=workers, price_cache=cache)
+        for workers in args.workers
+        for cache in cache_modes
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture = args.fixture or str(build_fixture(Path(tmp) / "fixture").path)
+        report = compare_configs(configs, fixture)
+
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(report.round(1).to_string(index=False))
+    if args.csv:
+        report.to_csv(args.csv, index=False)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,837 @@
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from yfinance.exceptions import YFTickerMissingError
+
+from shared_cache import cache_key, shared_get_or_compute
+
+# yfinance otherwise logs network errors and answers with an empty frame;
+# its timezone lookup even turns them into "possibly delisted" (YFTzMissingError).
+# Releases without yf.config cannot be told to raise; there those errors
+# still read as missing tickers.
+if hasattr(getattr(yf, "config", None), "debug"):
+    yf.config.debug.hide_exceptions = False
+
+
+# ---------------------------------------------------------
+# Process-wide price cache with single-flight fetches
+# ---------------------------------------------------------
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0      # callers that waited on another caller's fetch
+    evictions: int = 0
+
+
+class PriceCache:
+    """
+    Thread-safe LRU cache shared by every session in the process. Concurrent
+    requests for the same key wait on a single fetch; entries expire after
+    ``ttl_seconds`` and the least recently used ones are evicted once the
+    cached series exceed ``max_bytes``. Failed fetches are not cached.
+    """
+
+    def __init__(self, ttl_seconds: float = 900.0, max_bytes: int = 256 * 1024 * 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple[float, pd.Series, int]] = OrderedDict()
+        self._inflight: dict[tuple, Future] = {}
+        self._bytes = 0
+
+    def get_or_fetch(self, key: tuple, fetch) -> pd.Series:
+        if not self.enabled:
+            return fetch()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._drop(key)
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self.stats.misses += 1
+            else:
+                self.stats.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = fetch()
+        except BaseException as err:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(err)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def put(self, key: tuple, value: pd.Series) -> None:
+        if self.enabled:
+            with self._lock:
+                self._store(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: tuple, value: pd.Series) -> None:
+        size = int(value.values.nbytes + value.index.nbytes)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.stats.evictions += 1
+
+    def _drop(self, key: tuple) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+
+PRICE_CACHE = PriceCache()
+
+
+def configure_price_cache(
+    ttl_seconds: float | None = None,
+    max_bytes: int | None = None,
+    enabled: bool | None = None,
+) -> PriceCache:
+    if ttl_seconds is not None:
+        PRICE_CACHE.ttl_seconds = ttl_seconds
+    if max_bytes is not None:
+        PRICE_CACHE.max_bytes = max_bytes
+    if enabled is not None:
+        PRICE_CACHE.enabled = enabled
+        if not enabled:
+            PRICE_CACHE.clear()
+    return PRICE_CACHE
+
+
+# ---------------------------------------------------------
+# Download policy: timeouts, retries, circuit breaker
+# ---------------------------------------------------------
+class PriceDownloadError(ValueError):
+    """
+    A ticker could not be downloaded. ``retryable`` is False when the provider
+    answered but had no data (unknown/delisted ticker), True for network
+    errors and timeouts.
+    """
+
+    def __init__(self, ticker: str, message: str, retryable: bool = True, attempts: int = 1):
+        super().__init__(message)
+        self.ticker = ticker
+        self.retryable = retryable
+        self.attempts = attempts
+
+    def __reduce__(self):
+        # keep the extra fields when raised inside a worker process
+        return (type(self), (self.ticker, str(self), self.retryable, self.attempts))
+
+
+@dataclass
+class DownloadPolicy:
+    timeout_seconds: float = 20.0       # per HTTP request
+    max_attempts: int = 3
+    backoff_seconds: float = 0.5        # doubled after each failed attempt
+    max_backoff_seconds: float = 8.0
+    breaker_threshold: int = 5          # consecutive transient failures before opening
+    breaker_cooldown_seconds: float = 60.0
+
+
+class CircuitBreaker:
+    """
+    Stops calling the provider after ``threshold`` consecutive transient
+    failures. While open every call fails fast; after ``cooldown_seconds`` one
+    trial call is let through and closes the breaker again if it succeeds.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown_seconds: float = 60.0):
+        self.threshold = threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self._opened_at < self.cooldown_seconds:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def reset(self) -> None:
+        self.record_success()
+
+
+DOWNLOAD_POLICY = DownloadPolicy()
+BREAKER = CircuitBreaker(DOWNLOAD_POLICY.breaker_threshold, DOWNLOAD_POLICY.breaker_cooldown_seconds)
+
+
+def configure_downloads(**overrides) -> DownloadPolicy:
+    """Update DOWNLOAD_POLICY fields, e.g. ``configure_downloads(max_attempts=5)``."""
+    for name, value in overrides.items():
+        if not hasattr(DOWNLOAD_POLICY, name):
+            raise TypeError(f"Unknown download setting: {name}")
+        setattr(DOWNLOAD_POLICY, name, value)
+    BREAKER.threshold = DOWNLOAD_POLICY.breaker_threshold
+    BREAKER.cooldown_seconds = DOWNLOAD_POLICY.breaker_cooldown_seconds
+    return DOWNLOAD_POLICY
+
+
+def _with_retries(ticker: str, fetch):
+    policy = DOWNLOAD_POLICY
+    attempts = max(1, policy.max_attempts)
+    for attempt in range(1, attempts + 1):
+        if not BREAKER.allow():
+            raise PriceDownloadError(
+                ticker,
+                f"Price provider unavailable, skipped {ticker} (circuit open after repeated failures)",
+                attempts=attempt - 1,
+            )
+        try:
+            value = fetch()
+        except PriceDownloadError as err:
+            if not err.retryable:
+                # the provider answered, so it is healthy; the ticker is the problem
+                BREAKER.record_success()
+                err.attempts = attempt
+                raise
+            BREAKER.record_failure()
+            if attempt == attempts:
+                err.attempts = attempt
+                raise
+            delay = min(policy.max_backoff_seconds, policy.backoff_seconds * 2 ** (attempt - 1))
+            time.sleep(delay * random.uniform(0.5, 1.0))
+        except Exception as err:
+            BREAKER.record_failure()
+            if attempt == attempts:
+                raise PriceDownloadError(
+                    ticker,
+                    f"Download failed for {ticker} after {attempt} attempts: {err}",
+                    attempts=attempt,
+                ) from err
+            delay = min(policy.max_backoff_seconds, policy.backoff_seconds * 2 ** (attempt - 1))
+            time.sleep(delay * random.uniform(0.5, 1.0))
+        else:
+            BREAKER.record_success()
+            return value
+
+
+# ---------------------------------------------------------
+# Downloads
+# ---------------------------------------------------------
+def _yahoo_history(ticker: str, start: str, end: str | None, actions: bool = False) -> pd.DataFrame:
+    """
+    One ticker's unadjusted history. Network and HTTP failures propagate (see
+    hide_exceptions below) and _with_retries treats them as transient; only
+    "ticker missing" answers (no prices, no timezone) are non-retryable.
+    Ticker.history keeps no module-global state, unlike yf.download
+    (shared._DFS / shared._ERRORS), so threads may call it concurrently.
+    """
+    try:
+        return yf.Ticker(ticker).history(
+            start=start, end=end, auto_adjust=False, actions=actions,
+            timeout=DOWNLOAD_POLICY.timeout_seconds,
+        )
+    except YFTickerMissingError as err:
+        raise PriceDownloadError(ticker, f"No prices found for {ticker}: {err}", retryable=False) from err
+
+
+def _fetch_prices(ticker: str, start: str, end: str) -> pd.Series:
+    data = _yahoo_history(ticker, start, end)
+    if "Adj Close" not in data.columns:
+        raise PriceDownloadError(ticker, f"No Adj Close found for {ticker}", retryable=False)
+    prices = data["Adj Close"].dropna()
+    if prices.empty:
+        raise PriceDownloadError(ticker, f"No prices found for {ticker}", retryable=False)
+    return pd.Series(prices.to_numpy(dtype=float), index=_naive_dates(prices.index), name=ticker.upper())
+
+
+# optional replacement for the Yahoo fetch (offline fixtures, load tests)
+_PRICE_SOURCE = None
+
+
+def set_price_source(fetch=None) -> None:
+    """Route downloads through ``fetch(ticker, start, end) -> Series``; None restores Yahoo."""
+    global _PRICE_SOURCE
+    _PRICE_SOURCE = fetch
+
+
+def _price_key(ticker: str, start: str, end: str) -> tuple:
+    return ticker.strip().upper(), str(start), str(end)
+
+
+def download_prices(ticker: str, start: str, end: str) -> pd.Series:
+    key = _price_key(ticker, start, end)
+    fetch = _PRICE_SOURCE or _fetch_prices
+    # in-process cache first, then the cache shared with the other workers
+    return PRICE_CACHE.get_or_fetch(
+        key,
+        lambda: shared_get_or_compute(
+            cache_key("prices", *key),
+            lambda: _with_retries(key[0], lambda: fetch(ticker, start, end)),
+        ),
+    )
+
+
+def seed_prices(ticker: str, start: str, end: str, prices: pd.Series) -> None:
+    """Put a series downloaded in another process (e.g. a warm-up worker) into PRICE_CACHE."""
+    PRICE_CACHE.put(_price_key(ticker, start, end), prices)
+
+
+@dataclass
+class DownloadResult:
+    ticker: str
+    prices: pd.Series | None = None
+    error: str | None = None
+    retryable: bool = False
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.prices is not None
+
+
+def download_many(
+    tickers: list[str],
+    start: str,
+    end: str,
+    max_workers: int = 8,
+) -> dict[str, DownloadResult]:
+    """
+    Download many tickers concurrently (one Ticker.history call per thread,
+    see _yahoo_history). Never raises for a single ticker: each entry carries
+    either its prices or the error that stopped it.
+    """
+    def _one(ticker: str) -> DownloadResult:
+        symbol = ticker.strip().upper()
+        try:
+            return DownloadResult(symbol, prices=download_prices(ticker, start, end))
+        except PriceDownloadError as err:
+            return DownloadResult(symbol, error=str(err), retryable=err.retryable, attempts=err.attempts)
+        except Exception as err:
+            return DownloadResult(symbol, error=str(err), retryable=True, attempts=1)
+
+    unique = list(dict.fromkeys(tickers))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique) or 1))) as pool:
+        results = list(pool.map(_one, unique))
+    return {result.ticker: result for result in results}
+
+
+def prices_frame(results: dict[str, DownloadResult]) -> pd.DataFrame:
+    """Successful downloads as one column per ticker; failures in ``attrs["failed_tickers"]``."""
+    columns = {ticker: result.prices for ticker, result in results.items() if result.ok}
+    frame = pd.concat(columns, axis=1) if columns else pd.DataFrame()
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame.columns = frame.columns.get_level_values(0)
+    frame.attrs["failed_tickers"] = {
+        ticker: result.error for ticker, result in results.items() if not result.ok
+    }
+    return frame
+
+
+# ---------------------------------------------------------
+# Memory-mapped columnar price archive
+# ---------------------------------------------------------
+@dataclass
+class PairView:
+    """Two zero-copy price columns that the engine can use in place of a DataFrame."""
+    A: np.ndarray
+    B: np.ndarray
+    index: pd.DatetimeIndex
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return getattr(self, column)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (self.A.shape[0], 2)
+
+
+class PriceArchive:
+    """
+    On-disk price store for large universes. Each field (e.g. "adj_close") is
+    one float64 file laid out ticker-major, so a ticker's full history is a
+    contiguous row that can be handed to the engine without copying. Dates
+    and tickers live in ``dates.npy`` / ``meta.json``; missing values are NaN.
+    Opening is read-only by default, so any number of worker processes can
+    map the same files and share the OS page cache.
+
+    Every write() produces a new generation of files (``<field>.<version>.f64``)
+    and then swaps ``meta.json`` to point at it, so open archives keep mapping
+    the generation they opened and new readers only ever see a complete one.
+    The previous generation is kept until the next write, for readers that
+    read the old meta.json just before the swap; a reader that still loses
+    the race re-reads meta.json and opens the current generation.
+    """
+
+    _OPEN_ATTEMPTS = 3
+
+    def __init__(self, path: str | os.PathLike, mode: str = "r"):
+        self.path = Path(path)
+        for attempt in range(1, self._OPEN_ATTEMPTS + 1):
+            try:
+                self._open(mode)
+                return
+            except FileNotFoundError:
+                if attempt == self._OPEN_ATTEMPTS:
+                    raise
+
+    def _open(self, mode: str) -> None:
+        self._stamp = _meta_stamp(self.path)
+        meta = json.loads((self.path / "meta.json").read_text())
+        self.tickers: list[str] = meta["tickers"]
+        self.fields: list[str] = meta["fields"]
+        self.version: str | None = meta.get("version")
+        self.dates = pd.DatetimeIndex(np.load(self._file("dates.npy")))
+        self._positions = {ticker: pos for pos, ticker in enumerate(self.tickers)}
+        shape = (len(self.tickers), len(self.dates))
+        self._arrays = {
+            field: np.memmap(self._file(f"{field}.f64"), dtype=np.float64, mode=mode, shape=shape)
+            for field in self.fields
+        }
+
+    def stale(self) -> bool:
+        """True once write() has published a newer generation than the one mapped."""
+        try:
+            return _meta_stamp(self.path) != self._stamp
+        except OSError:
+            return False
+
+    def _file(self, name: str) -> Path:
+        return self.path / (name if self.version is None else _versioned(name, self.version))
+
+    @classmethod
+    def write(
+        cls,
+        path: str | os.PathLike,
+        fields: dict[str, pd.DataFrame],
+    ) -> PriceArchive:
+        """Write date x ticker frames (one per field) aligned on a shared axis."""
+        root = Path(path)
+        root.mkdir(parents=True, exist_ok=True)
+        try:
+            previous = json.loads((root / "meta.json").read_text())
+        except (FileNotFoundError, ValueError):
+            previous = None
+        version = f"{time.time_ns():x}"
+
+        dates = pd.DatetimeIndex([])
+        tickers: list[str] = []
+        for frame in fields.values():
+            dates = dates.union(pd.DatetimeIndex(frame.index))
+            tickers.extend(str(col).upper() for col in frame.columns if str(col).upper() not in tickers)
+
+        for field, frame in fields.items():
+            aligned = frame.set_axis([str(col).upper() for col in frame.columns], axis=1)
+            aligned = aligned.reindex(index=dates, columns=tickers)
+            # fresh files only: truncating a file another process maps would SIGBUS it
+            target = np.memmap(
+                root / _versioned(f"{field}.f64", version),
+                dtype=np.float64,
+                mode="w+",
+                shape=(len(tickers), len(dates)),
+            )
+            target[:] = aligned.to_numpy(dtype=np.float64).T
+            target.flush()
+            del target
+
+        np.save(root / _versioned("dates.npy", version), dates.values.astype("datetime64[ns]"))
+        # the meta.json swap publishes the new generation in one atomic step
+        meta = {"tickers": tickers, "fields": list(fields), "version": version}
+        tmp = root / f"meta.json.{version}.tmp"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, root / "meta.json")
+
+        # generations before the previous one can go: open mappings keep their
+        # data until they are closed
+        keep = {version, previous.get("version") if previous is not None else version}
+        for file in root.iterdir():
+            parts = file.name.split(".")
+            if file.suffix in (".f64", ".npy") and len(parts) in (2, 3):
+                if (parts[1] if len(parts) == 3 else None) not in keep:
+                    file.unlink(missing_ok=True)
+        return cls(root)
+
+    @classmethod
+    def build(
+        cls,
+        path: str | os.PathLike,
+        tickers: list[str],
+        start: str,
+        end: str,
+    ) -> PriceArchive:
+        frame = prices_frame(download_many(tickers, start, end))
+        if frame.empty:
+            raise PriceDownloadError(",".join(tickers), "No ticker could be downloaded", retryable=False)
+        return cls.write(path, {"adj_close": frame})
+
+    def column(self, ticker: str, field: str = "adj_close") -> np.ndarray:
+        return self._arrays[field][self._positions[ticker.upper()]]
+
+    def series(self, ticker: str, field: str = "adj_close") -> pd.Series:
+        return pd.Series(self.column(ticker, field), index=self.dates, name=ticker.upper(), copy=False)
+
+    def pair(self, ticker_a: str, ticker_b: str, field: str = "adj_close") -> PairView:
+        """Both columns restricted to the dates where both have prices."""
+        col_a = self.column(ticker_a, field)
+        col_b = self.column(ticker_b, field)
+        valid = ~(np.isnan(col_a) | np.isnan(col_b))
+        if valid.all():
+            return PairView(col_a, col_b, self.dates)
+        first, last = np.flatnonzero(valid)[[0, -1]]
+        if valid[first:last + 1].all():
+            # a contiguous overlap is still a view
+            window = slice(first, last + 1)
+            return PairView(col_a[window], col_b[window], self.dates[window])
+        return PairView(col_a[valid], col_b[valid], self.dates[valid])
+
+    def frame(self, tickers: list[str] | None = None, field: str = "adj_close") -> pd.DataFrame:
+        """Date x ticker frame; with ``tickers=None`` it wraps the mapping without copying."""
+        if tickers is None:
+            return pd.DataFrame(self._arrays[field].T, index=self.dates, columns=self.tickers, copy=False)
+        rows = [self._positions[ticker.upper()] for ticker in tickers]
+        return pd.DataFrame(
+            self._arrays[field][rows].T, index=self.dates, columns=[t.upper() for t in tickers]
+        )
+
+
+def _meta_stamp(root: Path) -> tuple[int, int]:
+    # write() swaps meta.json with os.replace, so a new generation is a new inode
+    stat = (root / "meta.json").stat()
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def _versioned(name: str, version: str) -> str:
+    stem, ext = name.rsplit(".", 1)
+    return f"{stem}.{version}.{ext}"
+
+
+_OPEN_ARCHIVES: dict[str, PriceArchive] = {}
+
+
+def open_archive(path: str | os.PathLike) -> PriceArchive:
+    """
+    Per-process handle cache, so pool tasks can pass just the archive path.
+    A handle is reopened once a write() has published a new generation.
+    """
+    key = str(Path(path).resolve())
+    archive = _OPEN_ARCHIVES.get(key)
+    if archive is None or archive.stale():
+        archive = _OPEN_ARCHIVES[key] = PriceArchive(key)
+    return archive
+
+
+# ---------------------------------------------------------
+# Corporate-action-aware local price store
+# ---------------------------------------------------------
+def _naive_dates(index: pd.Index) -> pd.DatetimeIndex:
+    dates = pd.DatetimeIndex(index)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    return dates.normalize()
+
+
+def _fetch_history(ticker: str, start: str, end: str | None) -> pd.DataFrame:
+    """As-traded closes with dividend and split events (columns close/dividend/split)."""
+    data = _with_retries(ticker, lambda: _yahoo_history(ticker, start, end, actions=True))
+    if data.empty or "Close" not in data.columns:
+        raise PriceDownloadError(ticker, f"No price history found for {ticker}", retryable=False)
+
+    frame = pd.DataFrame(
+        {
+            "close": data["Close"].to_numpy(dtype=float),
+            "dividend": data.get("Dividends", pd.Series(0.0, index=data.index)).to_numpy(dtype=float),
+            "split": data.get("Stock Splits", pd.Series(0.0, index=data.index)).to_numpy(dtype=float),
+        },
+        index=_naive_dates(data.index),
+    )
+    frame["split"] = frame["split"].where(frame["split"] > 0, 1.0)
+
+    # Yahoo back-adjusts closes and dividends for splits; undo that so stored
+    # rows never change when a later split arrives
+    later_splits = frame["split"][::-1].cumprod()[::-1].shift(-1, fill_value=1.0)
+    frame["close"] *= later_splits
+    frame["dividend"] *= later_splits
+    return frame
+
+
+def adjustment_factors(
+    closes: pd.Series,
+    dividends: pd.Series,
+    splits: pd.Series,
+) -> pd.Series:
+    """
+    Backward adjustment factor per date: the product, over every event with a
+    later ex-date, of 1/split ratio and (1 - dividend / previous close).
+    """
+    dividends = dividends.reindex(closes.index, fill_value=0.0)
+    splits = splits.reindex(closes.index, fill_value=1.0)
+
+    prev_close = closes.shift(1)
+    dividend_factor = (1.0 - dividends / prev_close).where(dividends > 0, 1.0).fillna(1.0)
+    event_factor = dividend_factor / splits
+
+    inclusive = event_factor[::-1].cumprod()[::-1]
+    return inclusive.shift(-1, fill_value=1.0)
+
+
+@dataclass
+class RefreshResult:
+    ticker: str
+    rows_added: int
+    actions_added: int
+    recomputed: bool        # adjustment factors rebuilt for this ticker
+    full_reload: bool
+
+
+class AdjustedPriceStore:
+    """
+    SQLite store of as-traded closes plus split/dividend events, with the
+    derived adjusted series materialized per ticker. ``refresh`` downloads
+    only the tail since the last stored date; adjustment factors are rebuilt
+    only for tickers that received a new corporate action (or whose
+    overlapping history was revised), otherwise new rows are appended with a
+    factor of 1.
+    """
+
+    OVERLAP_DAYS = 10
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS closes (
+                ticker TEXT NOT NULL, date TEXT NOT NULL, close REAL NOT NULL,
+                PRIMARY KEY (ticker, date)
+            );
+            CREATE TABLE IF NOT EXISTS actions (
+                ticker TEXT NOT NULL, date TEXT NOT NULL,
+                dividend REAL NOT NULL DEFAULT 0, split REAL NOT NULL DEFAULT 1,
+                PRIMARY KEY (ticker, date)
+            );
+            CREATE TABLE IF NOT EXISTS adjusted (
+                ticker TEXT NOT NULL, date TEXT NOT NULL, adj_close REAL NOT NULL,
+                PRIMARY KEY (ticker, date)
+            );
+            """
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def refresh(self, ticker: str, start: str = "2000-01-01", end: str | None = None) -> RefreshResult:
+        ticker = ticker.strip().upper()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(date) FROM closes WHERE ticker = ?", (ticker,)
+            ).fetchone()
+        last = pd.Timestamp(row[0]) if row and row[0] else None
+
+        if last is None:
+            return self._reload(ticker, start, end)
+
+        fetch_start = (last - pd.Timedelta(days=self.OVERLAP_DAYS)).strftime("%Y-%m-%d")
+        history = _fetch_history(ticker, fetch_start, end)
+
+        # a revised overlap means the provider restated history: start over
+        with self._lock:
+            stored = pd.read_sql_query(
+                "SELECT date, close FROM closes WHERE ticker = ? AND date >= ?",
+                self._conn, params=(ticker, fetch_start), parse_dates=["date"], index_col="date",
+            )["close"]
+        overlap = history.index[history.index <= last].intersection(stored.index)
+        if len(overlap) and not np.allclose(
+            history.loc[overlap, "close"], stored.loc[overlap], rtol=1e-6
+        ):
+            return self._reload(ticker, start, end)
+
+        new_rows = history[history.index > last]
+        events = history[(history["dividend"] > 0) | (history["split"] != 1.0)]
+        known = set(self._action_dates(ticker))
+        new_events = events[~events.index.strftime("%Y-%m-%d").isin(known)]
+
+        with self._lock, self._conn:
+            self._insert_closes(ticker, new_rows)
+            self._insert_actions(ticker, new_events)
+            if new_events.empty:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO adjusted VALUES (?, ?, ?)",
+                    [
+                        (ticker, date.strftime("%Y-%m-%d"), float(close))
+                        for date, close in new_rows["close"].items()
+                    ],
+                )
+        if not new_events.empty:
+            self._recompute(ticker)
+
+        return RefreshResult(
+            ticker=ticker,
+            rows_added=len(new_rows),
+            actions_added=len(new_events),
+            recomputed=not new_events.empty,
+            full_reload=False,
+        )
+
+    def refresh_many(
+        self,
+        tickers: list[str],
+        start: str = "2000-01-01",
+        end: str | None = None,
+    ) -> dict[str, RefreshResult | Exception]:
+        results: dict[str, RefreshResult | Exception] = {}
+        for ticker in tickers:
+            try:
+                results[ticker.upper()] = self.refresh(ticker, start, end)
+            except Exception as err:
+                results[ticker.upper()] = err
+        return results
+
+    def raw(self, ticker: str) -> pd.DataFrame:
+        ticker = ticker.strip().upper()
+        with self._lock:
+            closes = pd.read_sql_query(
+                "SELECT date, close FROM closes WHERE ticker = ? ORDER BY date",
+                self._conn, params=(ticker,), parse_dates=["date"], index_col="date",
+            )
+            actions = pd.read_sql_query(
+                "SELECT date, dividend, split FROM actions WHERE ticker = ? ORDER BY date",
+                self._conn, params=(ticker,), parse_dates=["date"], index_col="date",
+            )
+        frame = closes.join(actions, how="left")
+        frame["dividend"] = frame["dividend"].fillna(0.0)
+        frame["split"] = frame["split"].fillna(1.0)
+        return frame
+
+    def adjusted(self, ticker: str, start: str | None = None, end: str | None = None) -> pd.Series:
+        ticker = ticker.strip().upper()
+        query = "SELECT date, adj_close FROM adjusted WHERE ticker = ?"
+        params: list = [ticker]
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(str(start))
+        if end is not None:
+            query += " AND date < ?"
+            params.append(str(end))
+        with self._lock:
+            frame = pd.read_sql_query(
+                query + " ORDER BY date", self._conn, params=params,
+                parse_dates=["date"], index_col="date",
+            )
+        return frame["adj_close"].rename(ticker)
+
+    def export_archive(self, path: str | os.PathLike, tickers: list[str]) -> PriceArchive:
+        frame = pd.concat({ticker.upper(): self.adjusted(ticker) for ticker in tickers}, axis=1)
+        return PriceArchive.write(path, {"adj_close": frame})
+
+    def _reload(self, ticker: str, start: str, end: str | None) -> RefreshResult:
+        history = _fetch_history(ticker, start, end)
+        events = history[(history["dividend"] > 0) | (history["split"] != 1.0)]
+        with self._lock, self._conn:
+            for table in ("closes", "actions", "adjusted"):
+                self._conn.execute(f"DELETE FROM {table} WHERE ticker = ?", (ticker,))
+            self._insert_closes(ticker, history)
+            self._insert_actions(ticker, events)
+        self._recompute(ticker)
+        return RefreshResult(
+            ticker=ticker,
+            rows_added=len(history),
+            actions_added=len(events),
+            recomputed=True,
+            full_reload=True,
+        )
+
+    def _recompute(self, ticker: str) -> None:
+        raw = self.raw(ticker)
+        factors = adjustment_factors(raw["close"], raw["dividend"], raw["split"])
+        adjusted = raw["close"] * factors
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM adjusted WHERE ticker = ?", (ticker,))
+            self._conn.executemany(
+                "INSERT INTO adjusted VALUES (?, ?, ?)",
+                [
+                    (ticker, date.strftime("%Y-%m-%d"), float(value))
+                    for date, value in adjusted.items()
+                ],
+            )
+
+    def _action_dates(self, ticker: str) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date FROM actions WHERE ticker = ?", (ticker,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _insert_closes(self, ticker: str, frame: pd.DataFrame) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO closes VALUES (?, ?, ?)",
+            [(ticker, date.strftime("%Y-%m-%d"), float(close)) for date, close in frame["close"].items()],
+        )
+
+    def _insert_actions(self, ticker: str, events: pd.DataFrame) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO actions VALUES (?, ?, ?, ?)",
+            [
+                (ticker, date.strftime("%Y-%m-%d"), float(row.dividend), float(row.split))
+                for date, row in events.iterrows()
+            ],
+        )
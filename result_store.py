@@ -0,0 +1,391 @@
+from __future__ import annotations
+from dataclasses import asdict, fields, is_dataclass
+import io
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from strategy_engine import (
+    ENGINE_VERSION,
+    MetricIntervals,
+    PairResult,
+    PerformanceMetrics,
+    WalkForwardFold,
+    WalkForwardResult,
+)
+
+
+# ---------------------------------------------------------
+# Persistent analysis results
+# ---------------------------------------------------------
+_SCHEMA_VERSION = 3         # PRAGMA user_version; older layouts are dropped on open
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    share_id TEXT NOT NULL UNIQUE,  -- random, used in ?analysis= links
+    ticker_a TEXT NOT NULL,
+    ticker_b TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    as_of TEXT,                 -- last price date in the analysis
+    created_at REAL NOT NULL,
+    engine_version INTEGER NOT NULL,
+    mode TEXT NOT NULL,
+    params_key TEXT NOT NULL,
+    signal TEXT,
+    pair_ok INTEGER,
+    coint_pvalue REAL,
+    hedge_ratio REAL,
+    last_zscore REAL,
+    half_life REAL,
+    total_return REAL,
+    sharpe_ratio REAL,
+    max_drawdown REAL,
+    result BLOB NOT NULL        -- _encode_result: JSON fields + npz arrays, no pickle
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_pair ON analyses (ticker_a, ticker_b, as_of);
+CREATE INDEX IF NOT EXISTS idx_analyses_as_of ON analyses (as_of);
+CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses (created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_lookup
+    ON analyses (ticker_a, ticker_b, start, end, mode, params_key);
+"""
+
+_SUMMARY_COLUMNS = (
+    "share_id, ticker_a, ticker_b, start, end, as_of, created_at, mode, signal, pair_ok, "
+    "coint_pvalue, hedge_ratio, last_zscore, half_life, total_return, sharpe_ratio, max_drawdown"
+)
+
+
+def _params_key(params: dict | None) -> str:
+    def _plain(value):
+        return asdict(value) if is_dataclass(value) else value
+
+    return json.dumps({k: _plain(v) for k, v in (params or {}).items()}, sort_keys=True, default=str)
+
+
+# ---------------------------------------------------------
+# PairResult <-> bytes
+#
+# Fields go to JSON and every series/array to one npz, so a stored row is
+# read back as it was saved, without recomputing and without pickle (a
+# later class layout only loses fields it no longer has). Series indexes
+# that are a contiguous slice of the price dates are stored as offsets.
+# ---------------------------------------------------------
+_RESULT_TYPES = {
+    cls.__name__: cls
+    for cls in (PairResult, PerformanceMetrics, MetricIntervals, WalkForwardResult, WalkForwardFold)
+}
+
+
+def _encode_result(result: PairResult) -> bytes:
+    master = pd.DatetimeIndex(result.prices.index)
+    arrays: dict[str, np.ndarray] = {"dates": master.values}
+
+    def _array(values) -> str:
+        name = f"a{len(arrays)}"
+        arrays[name] = np.asarray(values)
+        return name
+
+    def _index(index) -> dict:
+        if not isinstance(index, pd.DatetimeIndex):
+            return {"labels": _array(np.asarray(index))}
+        if len(index) and index[0] in master:
+            offset = master.get_loc(index[0])
+            if isinstance(offset, int) and master[offset:offset + len(index)].equals(index):
+                return {"offset": offset, "length": len(index)}
+        return {"dates": _array(index.values)}
+
+    def _plain(value):
+        if is_dataclass(value):
+            items = {name: _plain(item) for name, item in vars(value).items()}
+            return {"__type__": type(value).__name__, **items}
+        if isinstance(value, pd.DataFrame):
+            return {"__frame__": _array(value.to_numpy()), "columns": list(map(str, value.columns)),
+                    "index": _index(value.index)}
+        if isinstance(value, pd.Series):
+            return {"__series__": _array(value.to_numpy()), "name": value.name, "index": _index(value.index)}
+        if isinstance(value, np.ndarray):
+            return {"__array__": _array(value)}
+        if isinstance(value, pd.Timestamp):
+            return {"__timestamp__": value.isoformat()}
+        if isinstance(value, dict):
+            return {"__dict__": {str(k): _plain(v) for k, v in value.items()}}
+        if isinstance(value, tuple):
+            return {"__tuple__": [_plain(item) for item in value]}
+        if isinstance(value, list):
+            return [_plain(item) for item in value]
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    arrays["fields"] = np.array(json.dumps(_plain(result)))
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def _decode_result(blob: bytes) -> PairResult:
+    with np.load(io.BytesIO(blob), allow_pickle=False) as stored:
+        arrays = {name: stored[name] for name in stored.files}
+    master = pd.DatetimeIndex(arrays["dates"])
+
+    def _index(spec: dict) -> pd.Index:
+        if "labels" in spec:
+            return pd.Index(arrays[spec["labels"]])
+        if "dates" in spec:
+            return pd.DatetimeIndex(arrays[spec["dates"]])
+        return master[spec["offset"]:spec["offset"] + spec["length"]]
+
+    def _value(value):
+        if isinstance(value, list):
+            return [_value(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if "__type__" in value:
+            cls = _RESULT_TYPES[value["__type__"]]
+            known = {f.name for f in fields(cls)}
+            return cls(**{k: _value(v) for k, v in value.items() if k in known})
+        if "__frame__" in value:
+            return pd.DataFrame(arrays[value["__frame__"]], index=_index(value["index"]), columns=value["columns"])
+        if "__series__" in value:
+            return pd.Series(arrays[value["__series__"]], index=_index(value["index"]), name=value["name"])
+        if "__array__" in value:
+            return arrays[value["__array__"]]
+        if "__timestamp__" in value:
+            return pd.Timestamp(value["__timestamp__"])
+        if "__tuple__" in value:
+            return tuple(_value(item) for item in value["__tuple__"])
+        return {k: _value(v) for k, v in value["__dict__"].items()}
+
+    return _value(json.loads(str(arrays["fields"])))
+
+
+class ResultStore:
+    """
+    SQLite record of every analysis: headline metrics as indexed columns for
+    querying, plus the computed PairResult in a compact array encoding that
+    get/find load back without downloading or recomputing anything. find only
+    reuses rows written by the current ENGINE_VERSION; get returns a shared
+    row as it was computed. Rows are addressed by random share ids, and rows older than
+    ``max_age_days`` or beyond the newest ``max_rows`` are purged on save.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike | None = None,
+        max_rows: int | None = None,
+        max_age_days: float | None = None,
+    ):
+        self.path = str(path or os.environ.get("HEDGEHUB_RESULTS_DB", "hedgehub_results.db"))
+        self.max_rows = int(max_rows or os.environ.get("HEDGEHUB_RESULTS_MAX_ROWS", 10_000))
+        self.max_age_days = float(max_age_days or os.environ.get("HEDGEHUB_RESULTS_MAX_AGE_DAYS", 30))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+            # rows from older layouts (pickled results, price windows) cannot be loaded; start over
+            with self._conn:
+                self._conn.execute("DROP TABLE IF EXISTS analyses")
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        else:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def save(
+        self,
+        result: PairResult,
+        ticker_a: str,
+        ticker_b: str,
+        start: str,
+        end: str,
+        params: dict | None = None,
+    ) -> str:
+        """
+        Record ``result`` and return its share id. ``params`` are the keyword
+        arguments the analysis ran with (beyond tickers and dates); find
+        matches on them.
+        """
+        if result.prices is None or result.prices.empty:
+            raise ValueError("only analyses with a price window can be stored")
+        performance = result.performance
+        as_of = pd.Timestamp(result.prices.index[-1]).strftime("%Y-%m-%d")
+        share_id = secrets.token_urlsafe(12)
+
+        row = (
+            share_id,
+            ticker_a.upper(),
+            ticker_b.upper(),
+            str(start),
+            str(end),
+            as_of,
+            time.time(),
+            result.mode,
+            _params_key(params),
+            result.signal,
+            int(result.pair_ok),
+            result.coint_pvalue,
+            result.hedge_ratio,
+            result.last_zscore,
+            result.half_life,
+            performance.total_return if performance else None,
+            performance.sharpe_ratio if performance else None,
+            performance.max_drawdown if performance else None,
+            ENGINE_VERSION,
+            _encode_result(result),
+        )
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO analyses (share_id, ticker_a, ticker_b, start, end, as_of, created_at, "
+                "mode, params_key, signal, pair_ok, coint_pvalue, hedge_ratio, last_zscore, "
+                "half_life, total_return, sharpe_ratio, max_drawdown, engine_version, result) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            self._purge()
+        return share_id
+
+    def _purge(self) -> None:
+        # both deletes walk an index; called with the lock held, inside the save transaction
+        self._conn.execute(
+            "DELETE FROM analyses WHERE created_at < ?", (time.time() - self.max_age_days * 86400,)
+        )
+        self._conn.execute(
+            "DELETE FROM analyses WHERE id <= "
+            "(SELECT id FROM analyses ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (self.max_rows,),
+        )
+
+    def purge(self) -> None:
+        with self._lock, self._conn:
+            self._purge()
+
+    @staticmethod
+    def _load(blob: bytes) -> PairResult | None:
+        try:
+            return _decode_result(blob)
+        except Exception as e:
+            print("Stored result could not be loaded:", e)
+            return None
+
+    def get(self, share_id: str) -> PairResult | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM analyses WHERE share_id = ?", (str(share_id),)
+            ).fetchone()
+        return self._load(row[0]) if row else None
+
+    def find(
+        self,
+        ticker_a: str,
+        ticker_b: str,
+        start: str,
+        end: str,
+        mode: str = "pairs_trading",
+        params: dict | None = None,
+        max_age_seconds: float | None = None,
+    ) -> tuple[str, PairResult] | None:
+        """Most recent stored run with exactly these inputs, if any, as (share id, result)."""
+        query = (
+            "SELECT share_id, result FROM analyses "
+            "WHERE ticker_a = ? AND ticker_b = ? "
+            "AND start = ? AND end = ? AND mode = ? AND params_key = ? AND engine_version = ?"
+        )
+        args: list = [
+            ticker_a.upper(), ticker_b.upper(), str(start), str(end), mode, _params_key(params), ENGINE_VERSION,
+        ]
+        if max_age_seconds is not None:
+            query += " AND created_at >= ?"
+            args.append(time.time() - max_age_seconds)
+        with self._lock:
+            row = self._conn.execute(query + " ORDER BY created_at DESC LIMIT 1", args).fetchone()
+        if row is None:
+            return None
+        result = self._load(row[1])
+        return (row[0], result) if result is not None else None
+
+    def lookup(self, ticker_a, ticker_b, start, end, mode, params, max_age_seconds=None):
+        """find, with store errors printed and treated as a miss."""
+        try:
+            return self.find(
+                ticker_a, ticker_b, start, end, mode=mode, params=params, max_age_seconds=max_age_seconds
+            )
+        except Exception as e:
+            print("Result store error:", e)
+            return None
+
+    def record(self, result, ticker_a, ticker_b, start, end, params) -> str | None:
+        """save, with store errors printed; returns None when nothing was stored."""
+        try:
+            return self.save(result, ticker_a, ticker_b, start, end, params)
+        except Exception as e:
+            print("Result store error:", e)
+            return None
+
+    def load_or_analyze(
+        self, ticker_a, ticker_b, start, end, mode, params, compute, max_age_seconds=None
+    ) -> tuple[str | None, PairResult]:
+        """Stored result for these inputs if recent enough, else compute() and store it. Returns (id, result)."""
+        hit = self.lookup(ticker_a, ticker_b, start, end, mode, params, max_age_seconds)
+        if hit is not None:
+            return hit
+        result = compute()
+        return self.record(result, ticker_a, ticker_b, start, end, params), result
+
+    def query(
+        self,
+        max_pvalue: float | None = None,
+        min_sharpe: float | None = None,
+        as_of: str | None = None,
+        ticker: str | None = None,
+        mode: str | None = None,
+        pair_ok: bool | None = None,
+        limit: int = 500,
+    ) -> pd.DataFrame:
+        """
+        Latest stored analysis per pair (optionally as of a date), filtered on
+        metrics, e.g. ``query(max_pvalue=0.01, min_sharpe=1, as_of="2024-06-30")``.
+        """
+        latest_filters = []
+        args: list = []
+        if as_of is not None:
+            latest_filters.append("as_of <= ?")
+            args.append(str(as_of))
+        if mode is not None:
+            latest_filters.append("mode = ?")
+            args.append(mode)
+        if ticker is not None:
+            latest_filters.append("(ticker_a = ? OR ticker_b = ?)")
+            args.extend([ticker.upper(), ticker.upper()])
+        where = f"WHERE {' AND '.join(latest_filters)}" if latest_filters else ""
+
+        metric_filters = ["rank = 1"]
+        if max_pvalue is not None:
+            metric_filters.append("coint_pvalue < ?")
+            args.append(max_pvalue)
+        if min_sharpe is not None:
+            metric_filters.append("sharpe_ratio > ?")
+            args.append(min_sharpe)
+        if pair_ok is not None:
+            metric_filters.append("pair_ok = ?")
+            args.append(int(pair_ok))
+        args.append(int(limit))
+
+        sql = (
+            f"SELECT {_SUMMARY_COLUMNS} FROM ("
+            f"  SELECT {_SUMMARY_COLUMNS}, ROW_NUMBER() OVER ("
+            "    PARTITION BY ticker_a, ticker_b, mode ORDER BY as_of DESC, created_at DESC"
+            f"  ) AS rank FROM analyses {where}"
+            f") WHERE {' AND '.join(metric_filters)} "
+            "ORDER BY sharpe_ratio DESC LIMIT ?"
+        )
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=args)
@@ -0,0 +1,267 @@
+from __future__ import annotations
+from dataclasses import asdict, is_dataclass
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+
+# ---------------------------------------------------------
+# Cache shared by every worker process on the host
+# ---------------------------------------------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS idx_entries_expires ON entries (expires_at);
+
+-- running payload total kept by triggers, so set() can test the size cap in O(1)
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);
+INSERT OR IGNORE INTO totals SELECT 0, COALESCE(SUM(size), 0) FROM entries;
+CREATE TRIGGER IF NOT EXISTS entries_inserted AFTER INSERT ON entries
+    BEGIN UPDATE totals SET bytes = bytes + NEW.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS entries_updated AFTER UPDATE OF size ON entries
+    BEGIN UPDATE totals SET bytes = bytes + NEW.size - OLD.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS entries_deleted AFTER DELETE ON entries
+    BEGIN UPDATE totals SET bytes = bytes - OLD.size WHERE id = 0; END;
+COMMIT;
+"""
+
+# upsert rather than INSERT OR REPLACE: REPLACE's implicit delete skips the triggers
+_UPSERT = """
+INSERT INTO entries (key, expires_at, accessed_at, size, payload) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    expires_at = excluded.expires_at,
+    accessed_at = excluded.accessed_at,
+    size = excluded.size,
+    payload = excluded.payload
+"""
+
+# drop least recently used entries until the newest ones fit under max_bytes
+_EVICT_LRU = """
+DELETE FROM entries WHERE key IN (
+    SELECT key FROM (
+        SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS running FROM entries
+    ) WHERE running > ?
+)
+"""
+
+
+# bump when the layout of keys or stored values changes
+_KEY_SCHEMA = 1
+
+# settings that change what a computation returns without being one of its
+# arguments (engine version, working precision); part of every key
+_KEY_CONTEXT: dict = {}
+
+
+def set_key_context(**values) -> None:
+    _KEY_CONTEXT.update(values)
+
+
+def cache_key(namespace: str, *parts, **params) -> str:
+    """
+    Stable text key; dataclass params (CostModel, ExitRules) are expanded
+    field by field. The key schema and the set_key_context values are
+    included, so changing either starts from fresh entries.
+    """
+    def _plain(value):
+        return asdict(value) if is_dataclass(value) else value
+
+    def _encode(value):
+        # numpy arrays/scalars in full (str() would elide long arrays)
+        return value.tolist() if hasattr(value, "tolist") else str(value)
+
+    body = [str(p).strip().upper() if isinstance(p, str) else p for p in parts]
+    return json.dumps(
+        [namespace, _KEY_SCHEMA, _KEY_CONTEXT, body, {k: _plain(v) for k, v in params.items()}],
+        sort_keys=True,
+        default=_encode,
+    )
+
+
+class SharedCache:
+    """
+    SQLite-backed cache (WAL mode) that several app processes can open at
+    once, so the first worker to download or analyze a pair warms it for
+    the others. Values are pickled and zlib-compressed; each write is a
+    single transaction, so readers never see a partial entry. Entries expire
+    after ``ttl_seconds`` and the least recently read ones are evicted once
+    the payloads exceed ``max_bytes``.
+
+    WAL lets readers run in parallel but admits one writer at a time, so a
+    hit only writes its access time back when the stored one is more than
+    ``touch_seconds`` old; LRU order is therefore approximate to that grain.
+
+    Any error (database locked too long, disk full, a corrupt payload or one
+    pickled by a different code version, a value that cannot be pickled) is
+    printed and counts as a miss or a skipped write: the cache never fails
+    the computation behind it.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        ttl_seconds: float = 900.0,
+        max_bytes: int = 1024 * 1024 * 1024,
+        busy_timeout: float = 5.0,
+        touch_seconds: float = 60.0,
+    ):
+        self.path = str(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.busy_timeout = busy_timeout
+        self.touch_seconds = touch_seconds
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # one connection per thread and per process (connections do not survive fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str, default=None):
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT payload, accessed_at FROM entries WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return default
+            value = pickle.loads(zlib.decompress(row[0]))
+            if now - row[1] > self.touch_seconds:
+                with conn:
+                    conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+        except Exception as e:
+            print("Shared cache read failed:", e)
+            return default
+
+    def set(self, key: str, value, ttl_seconds: float | None = None) -> bool:
+        now = time.time()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        try:
+            payload = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+            if len(payload) > self.max_bytes:
+                return False
+            conn = self._connect()
+            with conn:
+                conn.execute(_UPSERT, (key, now + ttl, now, len(payload), payload))
+                conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+                total = conn.execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+                if total > self.max_bytes:
+                    conn.execute(_EVICT_LRU, (self.max_bytes,))
+            return True
+        except Exception as e:
+            print("Shared cache write failed:", e)
+            return False
+
+    def get_or_compute(self, key: str, compute, ttl_seconds: float | None = None):
+        """
+        Cached value, or ``compute()`` stored for the other workers. Two
+        workers missing at the same moment both compute; the later write wins.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        value = compute()
+        self.set(key, value, ttl_seconds)
+        return value
+
+    def delete(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def total_bytes(self) -> int:
+        return self._connect().execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+
+
+# ---------------------------------------------------------
+# Process-wide instance
+#
+# Disabled unless HEDGEHUB_SHARED_CACHE names a database file; every worker
+# pointed at the same file shares the entries.
+#   HEDGEHUB_SHARED_CACHE      path, e.g. /var/cache/hedgehub/shared.db
+#   HEDGEHUB_SHARED_CACHE_TTL  seconds, default 900
+#   HEDGEHUB_SHARED_CACHE_MB   size limit, default 1024
+# ---------------------------------------------------------
+def _from_env() -> SharedCache | None:
+    path = os.environ.get("HEDGEHUB_SHARED_CACHE")
+    if not path:
+        return None
+    try:
+        return SharedCache(
+            path,
+            ttl_seconds=float(os.environ.get("HEDGEHUB_SHARED_CACHE_TTL", 900)),
+            max_bytes=int(float(os.environ.get("HEDGEHUB_SHARED_CACHE_MB", 1024)) * 1024 * 1024),
+        )
+    except (sqlite3.Error, ValueError) as e:
+        print("Shared cache disabled:", e)
+        return None
+
+
+SHARED_CACHE: SharedCache | None = _from_env()
+
+
+def configure_shared_cache(
+    path: str | os.PathLike | None = None,
+    ttl_seconds: float | None = None,
+    max_bytes: int | None = None,
+    enabled: bool | None = None,
+) -> SharedCache | None:
+    """Open (or switch) the shared cache at ``path``; ``enabled=False`` turns it off."""
+    global SHARED_CACHE
+    if enabled is False:
+        SHARED_CACHE = None
+        return None
+    if path is not None:
+        SHARED_CACHE = SharedCache(path)
+    if SHARED_CACHE is not None:
+        if ttl_seconds is not None:
+            SHARED_CACHE.ttl_seconds = ttl_seconds
+        if max_bytes is not None:
+            SHARED_CACHE.max_bytes = max_bytes
+    return SHARED_CACHE
+
+
+def shared_get(key: str, default=None):
+    cache = SHARED_CACHE
+    return default if cache is None else cache.get(key, default)
+
+
+def shared_set(key: str, value, ttl_seconds: float | None = None) -> bool:
+    cache = SHARED_CACHE
+    return False if cache is None else cache.set(key, value, ttl_seconds)
+
+
+def shared_get_or_compute(key: str, compute, ttl_seconds: float | None = None):
+    """``compute()`` through the shared cache when one is configured."""
+    cache = SHARED_CACHE
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(key, compute, ttl_seconds)
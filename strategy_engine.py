@@ -1,12 +1,25 @@
 from __future__ import annotations
+from concurrent.futures import Executor, ProcessPoolExecutor
 from dataclasses import dataclass
+from enum import IntEnum
+from multiprocessing import shared_memory
+import inspect
 import math
+import os
 
+import numpy as np
 import pandas as pd
-import yfinance as yf
-import statsmodels.api as sm
+from statsmodels.tsa.adfvalues import mackinnonp
 from statsmodels.tsa.stattools import adfuller
 
+from price_data import download_many, download_prices, prices_frame
+from shared_cache import cache_key, set_key_context, shared_get_or_compute
+
+# bump whenever a change alters analysis results; stored and cached results
+# from another version are recomputed instead of reused
+ENGINE_VERSION = 2
+set_key_context(engine_version=ENGINE_VERSION)
+
 
 # ---------------------------------------------------------
 # Performance metrics for backtest
@@ -21,6 +34,57 @@ class PerformanceMetrics:
     sharpe_ratio: float
     max_drawdown: float
     total_trades: int
+    total_costs: float = 0.0
+    daily_returns: pd.Series | None = None
+    equity_curve: pd.Series | None = None
+    intervals: MetricIntervals | None = None
+
+
+@dataclass
+class MetricIntervals:
+    """Block-bootstrap (lower, upper) bounds for the noisiest headline metrics."""
+    level: float
+    n_resamples: int
+    block_size: int
+    annualized_return: tuple[float, float]
+    sharpe_ratio: tuple[float, float]
+    max_drawdown: tuple[float, float]
+
+
+# ---------------------------------------------------------
+# Trading frictions charged inside the backtest
+# ---------------------------------------------------------
+@dataclass
+class CostModel:
+    commission_bps: float = 0.0         # per side, on traded notional
+    commission_per_share: float = 0.0   # per side, in dollars
+    slippage_bps: float = 0.0           # half spread + impact, on traded notional
+    borrow_bps_annual: float = 0.0      # short-leg borrow fee, charged daily while held
+
+
+# defaults of the app's pair-panel inputs; warm-up and load tests submit the
+# same values so their cached results match what users request
+DEFAULT_APP_COST_MODEL = CostModel(commission_bps=2.0, borrow_bps_annual=50.0)
+DEFAULT_APP_P_THRESHOLD = 0.05
+
+
+# ---------------------------------------------------------
+# Risk exits layered on the z-score entry/exit rules
+# (each field may also be an array with one value per backtest row)
+# ---------------------------------------------------------
+@dataclass
+class ExitRules:
+    stop_z: float | np.ndarray | None = None            # close when |z| reaches this
+    stop_loss: float | np.ndarray | None = None         # close after losing this fraction of the trade's spread exposure
+    max_holding_days: int | np.ndarray | None = None    # close after this many bars in the trade
+    cooldown_days: int | np.ndarray = 0                 # bars without new entries after a stop/time exit
+
+    def is_active(self) -> bool:
+        return (
+            self.stop_z is not None
+            or self.stop_loss is not None
+            or self.max_holding_days is not None
+        )
 
 
 # ---------------------------------------------------------
@@ -44,6 +108,72 @@ class PairResult:
     performance: PerformanceMetrics | None = None
     entry_z: float | None = None
     exit_z: float | None = None
+    walk_forward: WalkForwardResult | None = None
+
+    # spread statistics and per-risk-level backtests, computed once per analysis
+    spread_mean: float | None = None
+    spread_std: float | None = None
+    preset_performance: dict[str, PerformanceMetrics] | None = None
+
+    # mean-reversion diagnostics of the spread
+    half_life: float | None = None
+    hurst: float | None = None
+    variance_ratio: float | None = None
+
+    # rolling ADF p-value of the spread; windows above p_threshold are not traded
+    rolling_pvalue: pd.Series | None = None
+    regime_window: int | None = None
+    # per-bar regime mask every backtest of this analysis ran under (None = filter off)
+    tradable: np.ndarray | None = None
+
+
+class Direction(IntEnum):
+    """Trade direction of a pair, signed like backtest positions (+1 = long A)."""
+    SHORT_A_LONG_B = -1
+    FLAT = 0
+    LONG_A_SHORT_B = 1
+
+
+_SIGNAL_DIRECTIONS: dict[str, Direction] = {
+    "long_A_short_B": Direction.LONG_A_SHORT_B,
+    "short_A_long_B": Direction.SHORT_A_LONG_B,
+    "momentum_buy_A_sell_B": Direction.LONG_A_SHORT_B,
+    "momentum_buy_B_sell_A": Direction.SHORT_A_LONG_B,
+    "close_positions": Direction.FLAT,
+    "no_trade": Direction.FLAT,
+    "no_pairs_trade_cointegration_failed": Direction.FLAT,
+    "hold_no_signal": Direction.FLAT,
+}
+
+
+def signal_direction(signal: str | None) -> Direction:
+    return _SIGNAL_DIRECTIONS.get(signal or "", Direction.FLAT)
+
+
+def parse_direction(value) -> Direction:
+    """
+    Direction of an order: a Direction, its name ("LONG_A_SHORT_B"), its
+    value (-1, 0, 1, also as text) or an engine signal code. Anything else
+    raises ValueError instead of silently sizing the order flat.
+    """
+    if isinstance(value, Direction):
+        return value
+    if isinstance(value, str):
+        text = value.strip()
+        if text in _SIGNAL_DIRECTIONS:
+            return _SIGNAL_DIRECTIONS[text]
+        if text.upper() in Direction.__members__:
+            return Direction[text.upper()]
+        try:
+            value = int(text)
+        except ValueError:
+            pass
+    if isinstance(value, (int, np.integer, float, np.floating)) and not isinstance(value, (bool, np.bool_)):
+        if value in (-1, 0, 1):
+            return Direction(int(value))
+    raise ValueError(
+        f"unrecognized direction {value!r}; expected a Direction name or value or an engine signal code"
+    )
 
 
 @dataclass
@@ -63,6 +193,8 @@ class StrategyPlan:
     hedge_ratio: float | None = None
     ticker_a: str | None = None
     ticker_b: str | None = None
+    direction: Direction = Direction.FLAT
+    performance: PerformanceMetrics | None = None   # backtest at this risk level
 
 
 _RISK_PRESETS: dict[str, dict[str, float]] = {
@@ -72,17 +204,109 @@ _RISK_PRESETS: dict[str, dict[str, float]] = {
 }
 
 
+def _preset_key(risk_level: str | None) -> str:
+    return (risk_level or "MEDIUM").strip().upper()
+
+
+def preset_performance(
+    pair_result: PairResult | None,
+    risk_level: str | None,
+) -> PerformanceMetrics | None:
+    """Cached backtest for a risk level; unknown levels fall back to MEDIUM."""
+    if pair_result is None or not pair_result.preset_performance:
+        return None
+    key = _preset_key(risk_level)
+    if key not in _RISK_PRESETS:
+        key = "MEDIUM"
+    return pair_result.preset_performance.get(key)
+
+
 # ---------------------------------------------------------
 # Position sizing helper
 # ---------------------------------------------------------
+def size_positions(orders: pd.DataFrame, lot_size: int | None = 1) -> pd.DataFrame:
+    """
+    Vectorized sizing for a book of pair orders, one row per (pair, account).
+
+    Required columns: ticker_a, ticker_b, price_a, price_b, hedge_ratio,
+    direction (see parse_direction) and notional. A
+    ``lot_size`` column overrides the argument per row. Shares are rounded
+    down to whole lots; ``lot_size=None`` keeps fractional shares (2 dp).
+    Any other columns (account, pair id, ...) are passed through.
+    """
+    out = orders.copy()
+
+    direction = out["direction"]
+    if pd.api.types.is_numeric_dtype(direction) and not pd.api.types.is_bool_dtype(direction):
+        codes = direction.to_numpy(dtype=float)
+        unknown = ~np.isin(codes, (-1, 0, 1))
+        if unknown.any():
+            raise ValueError(f"unrecognized direction {codes[unknown][0]!r}; expected -1, 0 or 1")
+        sign = codes.astype(np.int64)
+    else:
+        sign = np.array([int(parse_direction(value)) for value in direction], dtype=np.int64)
+
+    price_a = out["price_a"].to_numpy(dtype=float)
+    price_b = out["price_b"].to_numpy(dtype=float)
+    hedge = out["hedge_ratio"].to_numpy(dtype=float)
+    hedge = np.where(hedge > 0, hedge, 1.0)
+    notional = np.where(sign != 0, out["notional"].to_numpy(dtype=float), 0.0)
+
+    long_amount = notional / (1 + hedge)
+    short_amount = notional * hedge / (1 + hedge)
+    long_is_a = sign > 0
+    long_price = np.where(long_is_a, price_a, price_b)
+    short_price = np.where(long_is_a, price_b, price_a)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        long_shares = np.where(long_price > 0, long_amount / long_price, 0.0)
+        short_shares = np.where(short_price > 0, short_amount / short_price, 0.0)
+
+    lots = out["lot_size"].to_numpy() if "lot_size" in out.columns else lot_size
+    if lots is None:
+        long_shares = np.round(long_shares, 2)
+        short_shares = np.round(short_shares, 2)
+    else:
+        lots = np.maximum(np.asarray(lots, dtype=np.int64), 1)
+        long_shares = (np.floor(long_shares / lots) * lots).astype(np.int64)
+        short_shares = (np.floor(short_shares / lots) * lots).astype(np.int64)
+        # report what the rounded share counts actually buy
+        long_amount = long_shares * long_price
+        short_amount = short_shares * short_price
+
+    flat = sign == 0
+    ticker_a = out["ticker_a"].to_numpy(dtype=object)
+    ticker_b = out["ticker_b"].to_numpy(dtype=object)
+    out["direction"] = sign
+    out["long_ticker"] = np.where(flat, "", np.where(long_is_a, ticker_a, ticker_b))
+    out["short_ticker"] = np.where(flat, "", np.where(long_is_a, ticker_b, ticker_a))
+    out["long_shares"] = long_shares
+    out["short_shares"] = short_shares
+    out["long_amount"] = np.round(long_amount, 2)
+    out["short_amount"] = np.round(short_amount, 2)
+    return out
+
+
+def _legacy_signal_direction(signal: str, col_a: str, col_b: str) -> Direction:
+    signal_upper = (signal or "").upper()
+    if "LONG" in signal_upper and col_a.upper() in signal_upper:
+        return Direction.LONG_A_SHORT_B
+    if "LONG" in signal_upper and col_b.upper() in signal_upper:
+        return Direction.SHORT_A_LONG_B
+    return Direction.FLAT
+
+
 def compute_positions(
     prices: pd.DataFrame,
     hedge_ratio: float,
     invest_amount: float,
     signal: str,
+    direction: Direction | None = None,
+    lot_size: int | None = None,
 ) -> dict:
     """
     自动识别列名，无论是 A/B 还是 AAPL/MSFT 都可以正常工作。
+    Pass ``direction`` to skip parsing the display signal string.
     """
 
     if prices is None or prices.empty:
@@ -106,23 +330,10 @@ def compute_positions(
     price_a = float(prices[col_a].iloc[-1])
     price_b = float(prices[col_b].iloc[-1])
 
-    if hedge_ratio <= 0:
-        hedge_ratio = 1.0
-
-    long_amount = invest_amount / (1 + hedge_ratio)
-    short_amount = invest_amount * hedge_ratio / (1 + hedge_ratio)
+    if direction is None:
+        direction = _legacy_signal_direction(signal, str(col_a), str(col_b))
 
-    signal_upper = (signal or "").upper()
-
-    if "LONG" in signal_upper and col_a.upper() in signal_upper:
-        long_ticker, short_ticker = col_a, col_b
-        long_shares = long_amount / price_a
-        short_shares = short_amount / price_b
-    elif "LONG" in signal_upper and col_b.upper() in signal_upper:
-        long_ticker, short_ticker = col_b, col_a
-        long_shares = long_amount / price_b
-        short_shares = short_amount / price_a
-    else:
+    if direction == Direction.FLAT:
         # no directional signal
         return {
             "long_ticker": "",
@@ -135,13 +346,28 @@ def compute_positions(
             "price_b": price_b,
         }
 
+    row = size_positions(
+        pd.DataFrame(
+            {
+                "ticker_a": [col_a],
+                "ticker_b": [col_b],
+                "price_a": [price_a],
+                "price_b": [price_b],
+                "hedge_ratio": [hedge_ratio],
+                "direction": [int(direction)],
+                "notional": [invest_amount],
+            }
+        ),
+        lot_size=lot_size,
+    ).iloc[0]
+
     return {
-        "long_ticker": long_ticker,
-        "short_ticker": short_ticker,
-        "long_shares": round(long_shares, 2),
-        "short_shares": round(short_shares, 2),
-        "long_amount": round(long_amount, 2),
-        "short_amount": round(short_amount, 2),
+        "long_ticker": row["long_ticker"],
+        "short_ticker": row["short_ticker"],
+        "long_shares": row["long_shares"].item(),
+        "short_shares": row["short_shares"].item(),
+        "long_amount": row["long_amount"].item(),
+        "short_amount": row["short_amount"].item(),
         "price_a": round(price_a, 4),
         "price_b": round(price_b, 4),
     }
@@ -166,7 +392,7 @@ def generate_strategy_plan(
     label_a = _clean_label(ticker_a, "ASSET A")
     label_b = _clean_label(ticker_b, "ASSET B")
 
-    preset_key = (risk_level or "MEDIUM").strip().upper()
+    preset_key = _preset_key(risk_level)
     preset = _RISK_PRESETS.get(preset_key, _RISK_PRESETS["MEDIUM"])
 
     entry_z: float | None = float(preset["entry_z"])
@@ -179,6 +405,8 @@ def generate_strategy_plan(
     hedge: float | None = None
     prices: pd.DataFrame | None = None
     signal_type = "Await Analysis"
+    direction = Direction.FLAT
+    performance: PerformanceMetrics | None = None
 
     if pair_result is not None:
         mode = (pair_result.mode or "").lower()
@@ -191,9 +419,10 @@ def generate_strategy_plan(
             hedge = 1.0
             prices = pair_result.prices
 
-            if pair_result.signal == "momentum_buy_A_sell_B":
+            direction = signal_direction(pair_result.signal)
+            if direction == Direction.LONG_A_SHORT_B:
                 signal_type = f"Long {label_a} Short {label_b}"
-            elif pair_result.signal == "momentum_buy_B_sell_A":
+            elif direction == Direction.SHORT_A_LONG_B:
                 signal_type = f"Long {label_b} Short {label_a}"
             else:
                 signal_type = "Hold / No Momentum Signal"
@@ -209,11 +438,14 @@ def generate_strategy_plan(
             rationale = "Spread deviation versus long-term equilibrium."
             hedge = pair_result.hedge_ratio
             prices = pair_result.prices
+            performance = preset_performance(pair_result, preset_key)
 
             if zscore_value >= float(preset["entry_z"]):
                 signal_type = f"Short {label_a} Long {label_b}"
+                direction = Direction.SHORT_A_LONG_B
             elif zscore_value <= -float(preset["entry_z"]):
                 signal_type = f"Long {label_a} Short {label_b}"
+                direction = Direction.LONG_A_SHORT_B
             else:
                 signal_type = "Wait for Entry"
 
@@ -234,80 +466,293 @@ def generate_strategy_plan(
         hedge_ratio=hedge,
         ticker_a=label_a,
         ticker_b=label_b,
+        direction=direction,
+        performance=performance,
     )
 
 
+# ---------------------------------------------------------
+# Working precision for scans and backtests
+#
+# "float32" halves the memory of the price panel, candidate spreads and
+# the (combos x bars) return/position grids in scan_pairs and the backtest
+# functions. Accumulation-sensitive steps stay float64: hedge-ratio OLS,
+# ADF, spread mean/std, diagnostics sums, and compounding of equity
+# (total return, drawdown, Sharpe).
+#
+# Error bounds with float32 (unit roundoff u = 2**-24 ~ 6e-8):
+#   - daily returns: absolute error <= ~2u (1.2e-7) per bar, from rounding
+#     the two prices of each return;
+#   - equity / total return: relative error <= bars * 2u * allocation in the
+#     worst case (~3e-4 over 10 years), ~sqrt(bars) * u typically (~1e-5);
+#     Sharpe and volatility likewise agree to ~1e-5 relative;
+#   - z-scores: absolute error ~ u * max|A| / std(spread). A signal can only
+#     differ from the float64 path on a bar whose z-score lies within that
+#     distance of an entry/exit threshold; when that happens the trade path,
+#     and so the metrics of that one pair, legitimately diverge.
+# ---------------------------------------------------------
+_PRECISIONS = {"float64": np.float64, "float32": np.float32}
+_PRECISION = "float64"
+
+
+def set_precision(precision: str = "float64") -> None:
+    """Working dtype for scan_pairs and the backtests: "float64" (default) or "float32"."""
+    global _PRECISION
+    if precision not in _PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision} (use one of {', '.join(_PRECISIONS)})")
+    _PRECISION = precision
+    set_key_context(precision=precision)
+
+
+def _work_dtype(precision: str | None = None) -> type:
+    precision = precision or _PRECISION
+    if precision not in _PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision} (use one of {', '.join(_PRECISIONS)})")
+    return _PRECISIONS[precision]
+
+
+set_precision(os.environ.get("HEDGEHUB_PRECISION", "float64"))
+
+
 # ---------------------------------------------------------
 # Pairs trading backtest on spread
+# (price_frame may be a DataFrame or a price_data.PairView of
+#  memory-mapped columns; zscores may be a Series or an array)
 # ---------------------------------------------------------
-def run_pairs_trading_backtest(
-    price_frame: pd.DataFrame,
-    beta: float,
-    zscores: pd.Series,
-    entry_z: float,
-    exit_z: float,
-    initial_capital: float = 1_000_000.0,
-    allocation: float = 0.5,
-) -> PerformanceMetrics:
-    rows = price_frame.shape[0]
-    if rows < 2 or zscores.empty:
-        return PerformanceMetrics(
-            initial_capital=initial_capital,
-            final_value=initial_capital,
-            total_return=0.0,
-            annualized_return=0.0,
-            annualized_volatility=0.0,
-            sharpe_ratio=0.0,
-            max_drawdown=0.0,
-            total_trades=0,
+def _empty_performance(initial_capital: float) -> PerformanceMetrics:
+    return PerformanceMetrics(
+        initial_capital=initial_capital,
+        final_value=initial_capital,
+        total_return=0.0,
+        annualized_return=0.0,
+        annualized_volatility=0.0,
+        sharpe_ratio=0.0,
+        max_drawdown=0.0,
+        total_trades=0,
+    )
+
+
+def _position_paths(
+    zscores: np.ndarray,
+    entry_z: np.ndarray,
+    exit_z: np.ndarray,
+    tradable: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized form of the entry/exit state machine for many thresholds at once.
+    Returns signed positions (+1 long A / -1 short A / 0 flat), one row per
+    (entry_z, exit_z) pair, plus the number of entries per row. Bars where
+    ``tradable`` is False force an exit and block new entries.
+    """
+    z = zscores[None, :]
+    # int8 signs keep the position grid small and do not promote float32 returns
+    signals = np.where(
+        z > entry_z[:, None], np.int8(-1), np.where(z < -entry_z[:, None], np.int8(1), np.int8(0))
+    )
+    exits = np.abs(z) <= exit_z[:, None]
+    if tradable is not None:
+        blocked = ~tradable[None, :]
+        signals = np.where(blocked, 0, signals)
+        exits = exits | blocked
+
+    # an exit bar flattens the book; the first signal after it opens the next trade
+    marked = signals != 0
+    seen = np.cumsum(marked, axis=1)
+    before_exit = np.maximum.accumulate(np.where(exits, seen - marked, 0), axis=1)
+    opens = marked & (seen - before_exit == 1)
+
+    fixed = exits | opens
+    cols = np.arange(z.shape[1])
+    last_fixed = np.maximum.accumulate(np.where(fixed, cols, -1), axis=1)
+    held = np.take_along_axis(np.where(fixed, signals, np.int8(0)), np.maximum(last_fixed, 0), axis=1)
+    positions = np.where(last_fixed >= 0, held, np.int8(0))
+    return positions, opens.sum(axis=1)
+
+
+_NO_HOLDING_LIMIT = 2**31 - 1
+
+
+def _rule_position_paths(
+    zscores: np.ndarray,
+    spread_returns: np.ndarray,
+    entry_z: np.ndarray,
+    exit_z: np.ndarray,
+    rules: ExitRules,
+    tradable: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    _position_paths plus stop, holding-period and cooldown exits. These are
+    path dependent, so time is a loop, but every step updates all
+    parameter rows at once; a grid over the rules costs one pass.
+    ``spread_returns[i]`` is the return earned by the position decided on
+    ``zscores[i]``.
+    """
+    combos, bars = entry_z.shape[0], zscores.shape[0]
+
+    def _row_param(value, empty, dtype=float):
+        if value is None:
+            return np.full(combos, empty, dtype=dtype)
+        return np.broadcast_to(np.asarray(value, dtype=dtype), (combos,))
+
+    stop_z = _row_param(rules.stop_z, np.inf)
+    stop_loss = _row_param(rules.stop_loss, np.inf)
+    max_holding = _row_param(rules.max_holding_days, _NO_HOLDING_LIMIT, np.int64)
+    cooldown = _row_param(rules.cooldown_days, 0, np.int64)
+
+    positions = np.zeros((combos, bars), dtype=np.int8)
+    trades = np.zeros(combos, dtype=int)
+    pos = np.zeros(combos)
+    held = np.zeros(combos, dtype=np.int64)
+    growth = np.ones(combos)            # spread growth since entry, per unit of position
+    wait = np.zeros(combos, dtype=np.int64)
+
+    for bar in range(bars):
+        z = zscores[bar]
+        in_trade = pos != 0
+        if bar > 0:
+            growth = np.where(in_trade, growth * (1.0 + pos * spread_returns[bar - 1]), 1.0)
+        held = np.where(in_trade, held + 1, 0)
+        wait = np.maximum(wait - 1, 0)
+
+        stopped = in_trade & (
+            (abs(z) >= stop_z) | (growth - 1.0 <= -stop_loss) | (held >= max_holding)
         )
+        blocked = tradable is not None and not tradable[bar]
+        exiting = stopped | (in_trade & (abs(z) <= exit_z)) | blocked
+        pos = np.where(exiting, 0.0, pos)
+        wait = np.where(stopped, cooldown + 1, wait)
+
+        signal = np.where(z > entry_z, -1.0, np.where(z < -entry_z, 1.0, 0.0))
+        opens = (pos == 0) & (signal != 0) & (wait == 0) & ~stopped & (not blocked)
+        pos = np.where(opens, signal, pos)
+        trades += opens
+        positions[:, bar] = pos
+
+    return positions, trades
 
-    allocation = max(0.0, min(1.0, allocation))
+
+def _backtest_kernel(
+    prices_a: np.ndarray,
+    prices_b: np.ndarray,
+    zscores: np.ndarray,
+    beta: float,
+    entry_z: np.ndarray,
+    exit_z: np.ndarray,
+    allocation: float | np.ndarray,
+    cost_model: CostModel | None = None,
+    tradable: np.ndarray | None = None,
+    exit_rules: ExitRules | None = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Net daily strategy returns, entry counts and cost drag for every
+    (entry_z, exit_z) row; ``allocation`` may be a scalar or one value per row.
+    ``tradable`` is an optional per-bar regime mask aligned with ``zscores``.
+    Returns have one column per bar after the first, in the dtype of the prices.
+    """
+    entry_z = np.atleast_1d(np.asarray(entry_z, dtype=float))
+    exit_z = np.atleast_1d(np.asarray(exit_z, dtype=float))
+    combos = entry_z.shape[0]
+    rows = prices_a.shape[0]
+    if rows < 2:
+        empty = np.zeros((combos, 0))
+        return empty, np.zeros(combos, dtype=int), empty
+
+    dtype = np.result_type(prices_a, prices_b)
+    allocation = np.clip(np.broadcast_to(np.asarray(allocation, dtype=dtype), (combos,)), 0.0, 1.0)
+    beta = float(beta)
     exposure_scale = max(1.0, 1.0 + abs(beta))
 
-    returns_a = price_frame["A"].pct_change().fillna(0.0)
-    returns_b = price_frame["B"].pct_change().fillna(0.0)
-
-    position = 0.0
-    capital = initial_capital
-    equity_curve = [capital]
-    daily_returns: list[float] = []
-    trades = 0
-
-    for idx in range(1, rows):
-        z = float(zscores.iloc[idx - 1])
-
-        if position != 0.0 and abs(z) <= exit_z:
-            position = 0.0
-
-        if position == 0.0:
-            if z > entry_z:
-                position = -allocation     # short A, long B
-                trades += 1
-            elif z < -entry_z:
-                position = allocation      # long A, short B
-                trades += 1
-
-        spread_return = (returns_a.iloc[idx] - beta * returns_b.iloc[idx]) / exposure_scale
-        day_return = position * spread_return
-        daily_returns.append(day_return)
-        capital *= (1 + day_return)
-        equity_curve.append(capital)
-
-    if not daily_returns:
-        return PerformanceMetrics(
-            initial_capital=initial_capital,
-            final_value=initial_capital,
-            total_return=0.0,
-            annualized_return=0.0,
-            annualized_volatility=0.0,
-            sharpe_ratio=0.0,
-            max_drawdown=0.0,
-            total_trades=0,
+    returns_a = np.diff(prices_a) / prices_a[:-1]
+    returns_b = np.diff(prices_b) / prices_b[:-1]
+    spread_returns = (returns_a - beta * returns_b) / exposure_scale
+
+    # the position held over bar t is decided on the z-score of bar t-1
+    if tradable is not None:
+        tradable = np.asarray(tradable, dtype=bool)[:-1]
+    if exit_rules is not None and exit_rules.is_active():
+        signs, trades = _rule_position_paths(
+            zscores[:-1], spread_returns, entry_z, exit_z, exit_rules, tradable
+        )
+    else:
+        signs, trades = _position_paths(zscores[:-1], entry_z, exit_z, tradable)
+    positions = allocation[:, None] * signs
+    gross = positions * spread_returns
+
+    costs = np.zeros_like(gross)
+    if cost_model is not None:
+        weight_a = 1.0 / exposure_scale
+        weight_b = abs(beta) / exposure_scale
+        turnover = np.abs(np.diff(positions, axis=1, prepend=0.0))
+        per_unit = (weight_a + weight_b) * (
+            cost_model.commission_bps + cost_model.slippage_bps
+        ) / 10_000.0
+        per_unit = per_unit + cost_model.commission_per_share * (
+            weight_a / prices_a[:-1] + weight_b / prices_b[:-1]
+        )
+        costs += turnover * per_unit
+
+        if cost_model.borrow_bps_annual:
+            short_weight = np.where(signs > 0, weight_b, np.where(signs < 0, weight_a, 0.0)).astype(dtype)
+            costs += (
+                np.abs(positions) * short_weight
+                * cost_model.borrow_bps_annual / 10_000.0 / 252
+            )
+
+    return gross - costs, trades, costs
+
+
+def _summary_arrays(returns: np.ndarray) -> dict[str, np.ndarray]:
+    """Row-wise version of the headline metrics in _performance_from_returns."""
+    periods = returns.shape[1]
+    # equity compounds in float64 whatever the working precision
+    growth = np.cumprod(np.add(returns, 1.0, dtype=np.float64), axis=1)
+    total_return = growth[:, -1] - 1.0 if periods else np.zeros(returns.shape[0])
+
+    growth_factor = 1.0 + total_return
+    with np.errstate(invalid="ignore", divide="ignore"):
+        annualized_return = np.where(
+            growth_factor > 0,
+            np.abs(growth_factor) ** (252 / max(periods, 1)) - 1.0,
+            0.0,
         )
+    if periods > 1:
+        annualized_vol = returns.std(axis=1, ddof=1, dtype=np.float64) * math.sqrt(252)
+    else:
+        annualized_vol = np.zeros(returns.shape[0])
+    sharpe = np.divide(
+        annualized_return,
+        annualized_vol,
+        out=np.zeros_like(annualized_return),
+        where=annualized_vol > 0,
+    )
+
+    equity = np.concatenate([np.ones((returns.shape[0], 1)), growth], axis=1)
+    max_drawdown = (equity / np.maximum.accumulate(equity, axis=1) - 1.0).min(axis=1)
+
+    return {
+        "total_return": total_return,
+        "annualized_return": annualized_return,
+        "annualized_volatility": annualized_vol,
+        "sharpe_ratio": sharpe,
+        "max_drawdown": max_drawdown,
+    }
 
-    equity_series = pd.Series(equity_curve, index=price_frame.index)
-    daily_series = pd.Series(daily_returns, index=price_frame.index[1:])
+
+def _performance_from_returns(
+    daily_returns: pd.Series,
+    initial_capital: float,
+    trades: int,
+    start_label=None,
+    cost_returns: np.ndarray | None = None,
+) -> PerformanceMetrics:
+    if daily_returns.empty:
+        return _empty_performance(initial_capital)
+
+    # equity starts one bar before the first return (the signal bar)
+    growth = np.concatenate([[1.0], np.cumprod(np.add(daily_returns.to_numpy(), 1.0, dtype=np.float64))])
+    equity_index = [start_label, *daily_returns.index] if start_label is not None else None
+    equity_series = pd.Series(growth * initial_capital, index=equity_index)
+    capital = float(equity_series.iloc[-1])
 
     total_return = float(capital / initial_capital - 1.0)
 
@@ -318,7 +763,7 @@ def run_pairs_trading_backtest(
     else:
         annualized_return = 0.0
 
-    daily_vol = float(daily_series.std(ddof=1)) if num_periods > 1 else 0.0
+    daily_vol = float(np.std(daily_returns.to_numpy(), ddof=1, dtype=np.float64)) if num_periods > 1 else 0.0
     annualized_vol = daily_vol * math.sqrt(252)
     sharpe = annualized_return / annualized_vol if annualized_vol > 0 else 0.0
 
@@ -326,6 +771,11 @@ def run_pairs_trading_backtest(
     drawdowns = (equity_series / running_max) - 1.0
     max_drawdown = float(drawdowns.min()) if not drawdowns.empty else 0.0
 
+    # cost drag is a fraction of the equity at the start of each bar
+    total_costs = 0.0
+    if cost_returns is not None:
+        total_costs = float(np.dot(cost_returns.astype(np.float64), equity_series.to_numpy()[:-1]))
+
     return PerformanceMetrics(
         initial_capital=initial_capital,
         final_value=capital,
@@ -335,39 +785,1150 @@ def run_pairs_trading_backtest(
         sharpe_ratio=sharpe,
         max_drawdown=max_drawdown,
         total_trades=trades,
+        total_costs=total_costs,
+        daily_returns=daily_returns,
+        equity_curve=equity_series,
+    )
+
+
+def run_pairs_trading_backtest(
+    price_frame: pd.DataFrame,
+    beta: float,
+    zscores: pd.Series,
+    entry_z: float,
+    exit_z: float,
+    initial_capital: float = 1_000_000.0,
+    allocation: float = 0.5,
+    cost_model: CostModel | None = None,
+    tradable: np.ndarray | None = None,
+    exit_rules: ExitRules | None = None,
+    precision: str | None = None,
+) -> PerformanceMetrics:
+    rows = price_frame.shape[0]
+    if rows < 2 or len(zscores) == 0:
+        return _empty_performance(initial_capital)
+
+    dtype = _work_dtype(precision)
+    daily_returns, trades, costs = _backtest_kernel(
+        np.asarray(price_frame["A"], dtype=dtype),
+        np.asarray(price_frame["B"], dtype=dtype),
+        np.asarray(zscores, dtype=dtype),
+        beta,
+        entry_z,
+        exit_z,
+        allocation,
+        cost_model,
+        tradable,
+        exit_rules,
+    )
+    daily_series = pd.Series(daily_returns[0], index=price_frame.index[1:])
+    return _performance_from_returns(
+        daily_series,
+        initial_capital,
+        int(trades[0]),
+        start_label=price_frame.index[0],
+        cost_returns=costs[0],
     )
 
 
+def run_backtest_grid(
+    price_frame: pd.DataFrame,
+    beta: float,
+    zscores: pd.Series,
+    entry_values: list[float],
+    exit_values: list[float],
+    allocation: float = 0.5,
+    cost_model: CostModel | None = None,
+    exit_rules: ExitRules | None = None,
+    tradable: np.ndarray | None = None,
+) -> pd.DataFrame:
+    """
+    Backtest every entry_z x exit_z combination in one vectorized pass and
+    return one row of net-of-cost metrics per combination.
+    """
+    entry_grid, exit_grid = np.meshgrid(
+        np.asarray(entry_values, dtype=float),
+        np.asarray(exit_values, dtype=float),
+        indexing="ij",
+    )
+    entry_flat = entry_grid.ravel()
+    exit_flat = exit_grid.ravel()
+
+    returns, trades, costs = _backtest_kernel(
+        np.asarray(price_frame["A"], dtype=_work_dtype()),
+        np.asarray(price_frame["B"], dtype=_work_dtype()),
+        np.asarray(zscores, dtype=_work_dtype()),
+        beta,
+        entry_flat,
+        exit_flat,
+        allocation,
+        cost_model,
+        tradable,
+        exit_rules,
+    )
+    summary = _summary_arrays(returns)
+    return pd.DataFrame(
+        {
+            "entry_z": entry_flat,
+            "exit_z": exit_flat,
+            **summary,
+            "total_trades": trades,
+            "cost_drag": costs.sum(axis=1),
+        }
+    )
+
+
+def run_exit_rule_grid(
+    price_frame: pd.DataFrame,
+    beta: float,
+    zscores: pd.Series,
+    entry_z: float,
+    exit_z: float,
+    stop_z_values: list[float | None] = (None,),
+    stop_loss_values: list[float | None] = (None,),
+    max_holding_values: list[int | None] = (None,),
+    cooldown_values: list[int] = (0,),
+    allocation: float = 0.5,
+    cost_model: CostModel | None = None,
+    tradable: np.ndarray | None = None,
+) -> pd.DataFrame:
+    """
+    Search the ExitRules parameters for fixed entry/exit thresholds: every
+    combination is a row of one kernel pass. ``None`` disables that rule.
+    """
+    def _values(values, disabled):
+        return np.array([disabled if v is None else v for v in values], dtype=float)
+
+    grids = np.meshgrid(
+        _values(stop_z_values, np.inf),
+        _values(stop_loss_values, np.inf),
+        _values(max_holding_values, _NO_HOLDING_LIMIT),
+        _values(cooldown_values, 0),
+        indexing="ij",
+    )
+    stop_z, stop_loss, max_holding, cooldown = (grid.ravel() for grid in grids)
+    combos = stop_z.shape[0]
+
+    rules = ExitRules(
+        stop_z=stop_z,
+        stop_loss=stop_loss,
+        max_holding_days=max_holding.astype(np.int64),
+        cooldown_days=cooldown.astype(np.int64),
+    )
+    returns, trades, costs = _backtest_kernel(
+        np.asarray(price_frame["A"], dtype=_work_dtype()),
+        np.asarray(price_frame["B"], dtype=_work_dtype()),
+        np.asarray(zscores, dtype=_work_dtype()),
+        beta,
+        np.full(combos, entry_z),
+        np.full(combos, exit_z),
+        allocation,
+        cost_model,
+        tradable,
+        rules,
+    )
+    summary = _summary_arrays(returns)
+    return pd.DataFrame(
+        {
+            "stop_z": np.where(np.isinf(stop_z), np.nan, stop_z),
+            "stop_loss": np.where(np.isinf(stop_loss), np.nan, stop_loss),
+            "max_holding_days": np.where(max_holding >= _NO_HOLDING_LIMIT, np.nan, max_holding),
+            "cooldown_days": cooldown.astype(int),
+            **summary,
+            "total_trades": trades,
+            "cost_drag": costs.sum(axis=1),
+        }
+    )
+
+
+def backtest_surface(
+    prices: np.ndarray,
+    beta: float,
+    zscores: np.ndarray,
+    entry_values: np.ndarray,
+    exit_values: np.ndarray,
+    allocation: float = 0.5,
+    cost_model: CostModel | None = None,
+    tradable: np.ndarray | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Sharpe and max-drawdown surfaces (entry rows x exit columns) from one
+    kernel call. ``prices`` is a (rows, 2) array of A/B prices; cells with
+    exit_z >= entry_z are NaN. Top-level so it can run on a process pool.
+    """
+    entry_values = np.asarray(entry_values, dtype=float)
+    exit_values = np.asarray(exit_values, dtype=float)
+    entries, exits = np.meshgrid(entry_values, exit_values, indexing="ij")
+    shape = entries.shape
+
+    dtype = _work_dtype()
+    returns, _, _ = _backtest_kernel(
+        prices[:, 0].astype(dtype, copy=False), prices[:, 1].astype(dtype, copy=False),
+        np.asarray(zscores, dtype=dtype), beta,
+        entries.ravel(), exits.ravel(), allocation, cost_model, tradable,
+    )
+    summary = _summary_arrays(returns)
+    invalid = exits >= entries
+    sharpe = summary["sharpe_ratio"].reshape(shape)
+    drawdown = summary["max_drawdown"].reshape(shape)
+    sharpe[invalid] = np.nan
+    drawdown[invalid] = np.nan
+    return {"sharpe_ratio": sharpe, "max_drawdown": drawdown}
+
+
+def run_preset_backtests(
+    price_frame: pd.DataFrame,
+    beta: float,
+    zscores: pd.Series,
+    initial_capital: float = 1_000_000.0,
+    cost_model: CostModel | None = None,
+    tradable: np.ndarray | None = None,
+    exit_rules: ExitRules | None = None,
+) -> dict[str, PerformanceMetrics]:
+    """Backtest every _RISK_PRESETS level (thresholds and allocation) in one kernel call."""
+    keys = list(_RISK_PRESETS)
+    if price_frame.shape[0] < 2 or len(zscores) == 0:
+        return {key: _empty_performance(initial_capital) for key in keys}
+
+    returns, trades, costs = _backtest_kernel(
+        np.asarray(price_frame["A"], dtype=_work_dtype()),
+        np.asarray(price_frame["B"], dtype=_work_dtype()),
+        np.asarray(zscores, dtype=_work_dtype()),
+        beta,
+        np.array([_RISK_PRESETS[key]["entry_z"] for key in keys]),
+        np.array([_RISK_PRESETS[key]["exit_z"] for key in keys]),
+        np.array([_RISK_PRESETS[key]["allocation_pct"] for key in keys]),
+        cost_model,
+        tradable,
+        exit_rules,
+    )
+    index = price_frame.index
+    return {
+        key: _performance_from_returns(
+            pd.Series(returns[row], index=index[1:]),
+            initial_capital,
+            int(trades[row]),
+            start_label=index[0],
+            cost_returns=costs[row],
+        )
+        for row, key in enumerate(keys)
+    }
+
+
 # ---------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------
-def download_prices(ticker: str, start: str, end: str) -> pd.Series:
-    data = yf.download(
-        ticker,
-        start=start,
-        end=end,
-        progress=False,
-        auto_adjust=False,
-    )
-    if "Adj Close" not in data.columns:
-        raise ValueError(f"No Adj Close found for {ticker}")
-    return data["Adj Close"].dropna()
+def estimate_hedge_ratio(prices_a: pd.Series, prices_b: pd.Series) -> float:
+    # closed-form OLS slope of A on B with intercept: cov(A, B) / var(B)
+    y = np.asarray(prices_a, dtype=np.float64)
+    x = np.asarray(prices_b, dtype=np.float64)
+    x_dev = x - x.mean()
+    denom = float(x_dev @ x_dev)
+    if denom == 0.0:
+        return 0.0
+    return float(x_dev @ (y - y.mean()) / denom)
 
 
-def estimate_hedge_ratio(prices_a: pd.Series, prices_b: pd.Series) -> float:
-    x = sm.add_constant(prices_b.values)
-    y = prices_a.values
-    model = sm.OLS(y, x).fit()
-    return float(model.params[1])
+def hedge_ratio_matrix(prices: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    OLS hedge ratio and intercept for every ordered pair of columns at once.
+    ``beta.loc[a, b]`` / ``alpha.loc[a, b]`` regress ``a`` on ``b`` (the
+    analyze_pair convention), all from one centered cross-product matrix.
+    Rows with any missing price are dropped; constant columns give NaN.
+    """
+    panel = prices.dropna(how="any")
+    values = panel.to_numpy(dtype=np.float64)
+    means = values.mean(axis=0)
+    centered = values - means
+    cross = centered.T @ centered           # (N, N), proportional to the covariance
+
+    variances = np.diag(cross).copy()
+    variances[variances == 0] = np.nan
+    beta = cross / variances[None, :]
+    alpha = means[:, None] - beta * means[None, :]
+
+    labels = panel.columns
+    return (
+        pd.DataFrame(beta, index=labels, columns=labels),
+        pd.DataFrame(alpha, index=labels, columns=labels),
+    )
 
 
 def adf_test(series: pd.Series) -> float:
-    return float(adfuller(series.values)[1])
+    return float(adfuller(np.asarray(series, dtype=float))[1])
+
+
+def rolling_adf_pvalues(
+    series: pd.Series | np.ndarray,
+    window: int = 252,
+    lags: int = 1,
+) -> pd.Series | np.ndarray:
+    """
+    ADF p-value (constant, ``lags`` fixed lagged differences) over every
+    ``window``-bar window, labelled at the window's last bar; NaN until the
+    first full window. Each window equals ``adfuller(x, maxlag=lags,
+    autolag=None)``, but the regression cross-products come from running
+    sums, so the whole series costs one pass plus a batched k×k solve.
+    """
+    index = series.index if isinstance(series, pd.Series) else None
+    values = np.asarray(series, dtype=np.float64)
+    values = values - values.mean()         # keeps the running sums well scaled
+    size = values.shape[0]
+    out = np.full(size, np.nan)
+    nobs = window - lags - 1
+    k = lags + 2
+    if nobs <= k or size < window:
+        return pd.Series(out, index=index) if index is not None else out
+
+    # regression row for bar t: dy_t on [1, y_{t-1}, dy_{t-1}, ..., dy_{t-lags}]
+    diffs = np.diff(values)
+    first = lags + 1
+    target = diffs[first - 1:]
+    design = np.empty((target.shape[0], k))
+    design[:, 0] = 1.0
+    design[:, 1] = values[first - 1:-1]
+    for lag in range(1, lags + 1):
+        design[:, 1 + lag] = diffs[first - 1 - lag:size - 1 - lag]
+
+    def _window_sums(terms: np.ndarray) -> np.ndarray:
+        running = np.concatenate([np.zeros((1,) + terms.shape[1:]), np.cumsum(terms, axis=0)])
+        return running[nobs:] - running[:-nobs]
+
+    xtx = _window_sums(design[:, :, None] * design[:, None, :])
+    xty = _window_sums(design * target[:, None])
+    yty = _window_sums(target * target)
+
+    coef = np.linalg.solve(xtx, xty[:, :, None])[:, :, 0]
+    residual_ss = np.maximum(yty - np.einsum("wk,wk->w", coef, xty), 0.0)
+    sigma2 = residual_ss / (nobs - k)
+    gamma_var = sigma2 * np.linalg.inv(xtx)[:, 1, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tstats = coef[:, 1] / np.sqrt(gamma_var)
+
+    out[window - 1:] = [
+        mackinnonp(t, regression="c", N=1) if np.isfinite(t) else np.nan for t in tstats
+    ]
+    return pd.Series(out, index=index) if index is not None else out
+
+
+# ---------------------------------------------------------
+# Universe screening
+# ---------------------------------------------------------
+def download_price_matrix(
+    tickers: list[str],
+    start: str,
+    end: str,
+    max_workers: int = 8,
+) -> pd.DataFrame:
+    """
+    One column per ticker that downloaded; tickers that failed are left out
+    and listed with their error in ``frame.attrs["failed_tickers"]``.
+    """
+    return prices_frame(download_many(tickers, start, end, max_workers=max_workers))
+
+
+def prefilter_pairs(
+    prices: pd.DataFrame,
+    top_k: int = 5,
+    method: str = "correlation",
+) -> pd.DataFrame:
+    """
+    Cheap pre-screen before the cointegration test. Scores every ticker pair
+    in one matrix operation (return correlation, or sum of squared distances
+    between normalized price paths) and keeps each ticker's ``top_k`` nearest
+    partners. Returns unique (ticker_a, ticker_b, score) rows.
+    """
+    panel = prices.dropna(how="any")
+    tickers = np.asarray(panel.columns)
+    count = tickers.size
+    if count < 2 or panel.shape[0] < 3:
+        return pd.DataFrame(columns=["ticker_a", "ticker_b", "score"])
+
+    values = panel.to_numpy()
+    if not np.issubdtype(values.dtype, np.floating):
+        values = values.astype(np.float64)
+    method = method.lower()
+    if method == "correlation":
+        returns = np.diff(np.log(values), axis=0)
+        returns -= returns.mean(axis=0, dtype=np.float64).astype(returns.dtype)
+        norms = np.linalg.norm(returns, axis=0)
+        norms[norms == 0] = np.inf
+        scaled = returns / norms
+        score = scaled.T @ scaled             # higher is closer
+        distance = -score
+    elif method == "distance":
+        # |x|^2 + |y|^2 - 2xy cancels badly for close paths: always float64
+        normalized = values.astype(np.float64, copy=False) / values[0]
+        sq_norms = np.einsum("ij,ij->j", normalized, normalized)
+        score = sq_norms[:, None] + sq_norms[None, :] - 2.0 * (normalized.T @ normalized)
+        np.maximum(score, 0.0, out=score)     # lower is closer
+        distance = score
+    else:
+        raise ValueError(f"Unknown prefilter method: {method}")
+
+    np.fill_diagonal(distance, np.inf)
+    k = max(1, min(top_k, count - 1))
+    nearest = np.argpartition(distance, k - 1, axis=1)[:, :k]
+
+    rows = np.repeat(np.arange(count), k)
+    cols = nearest.ravel()
+    first, second = np.minimum(rows, cols), np.maximum(rows, cols)
+    pairs = np.unique(np.stack([first, second], axis=1), axis=0)
+
+    candidates = pd.DataFrame(
+        {
+            "ticker_a": tickers[pairs[:, 0]],
+            "ticker_b": tickers[pairs[:, 1]],
+            "score": score[pairs[:, 0], pairs[:, 1]],
+        }
+    )
+    return candidates.sort_values(
+        "score", ascending=(method == "distance"), ignore_index=True
+    )
+
+
+def mean_reversion_diagnostics(
+    spreads: np.ndarray | pd.DataFrame,
+    max_lag: int = 20,
+    vr_lag: int = 10,
+) -> pd.DataFrame:
+    """
+    Half-life (AR(1) fit of the spread changes on the lagged level), Hurst
+    exponent (log-log slope of lagged-difference dispersion) and variance
+    ratio VR(vr_lag), computed column-wise for many spreads at once.
+    """
+    labels = spreads.columns if isinstance(spreads, pd.DataFrame) else None
+    values = np.asarray(spreads)
+    if not np.issubdtype(values.dtype, np.floating):
+        values = values.astype(np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    rows = values.shape[0]
+    # float32 spreads are accepted as is; every sum below accumulates in float64
+    acc = np.float64
+
+    # half-life: delta s_t = a + lambda * s_{t-1}
+    lagged = values[:-1] - values[:-1].mean(axis=0, dtype=acc).astype(values.dtype)
+    delta = np.diff(values, axis=0)
+    delta = delta - delta.mean(axis=0, dtype=acc).astype(values.dtype)
+    denom = np.einsum("ij,ij->j", lagged, lagged, dtype=acc)
+    slope = np.divide(
+        np.einsum("ij,ij->j", lagged, delta, dtype=acc), denom,
+        out=np.zeros(values.shape[1]), where=denom > 0,
+    )
+    with np.errstate(divide="ignore"):
+        half_life = np.where(slope < 0, -math.log(2) / slope, np.inf)
+
+    # hurst: std(s_{t+tau} - s_t) ~ tau ** H
+    lags = np.arange(2, max(3, min(max_lag, rows // 2)))
+    dispersion = np.stack([(values[lag:] - values[:-lag]).std(axis=0, dtype=acc) for lag in lags])
+    log_lags = np.log(lags) - np.log(lags).mean()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_disp = np.log(dispersion)
+        hurst = (log_lags @ (log_disp - log_disp.mean(axis=0))) / (log_lags @ log_lags)
+
+    # variance ratio: var(s_t - s_{t-q}) / (q * var(s_t - s_{t-1}))
+    q = max(2, min(vr_lag, rows - 2))
+    one_step = np.diff(values, axis=0).var(axis=0, ddof=1, dtype=acc)
+    q_step = (values[q:] - values[:-q]).var(axis=0, ddof=1, dtype=acc)
+    variance_ratio = np.divide(
+        q_step, q * one_step, out=np.full(values.shape[1], np.nan), where=one_step > 0
+    )
+
+    return pd.DataFrame(
+        {"half_life": half_life, "hurst": hurst, "variance_ratio": variance_ratio},
+        index=labels,
+    )
+
+
+def scan_pairs(
+    prices: pd.DataFrame,
+    top_k: int = 5,
+    method: str = "correlation",
+    p_threshold: float = 0.05,
+    max_half_life: float | None = None,
+    entry_z: float = 2.0,
+    exit_z: float = 0.5,
+    cost_model: CostModel | None = None,
+    sort_by: str = "coint_pvalue",
+    precision: str | None = None,
+    bootstrap: int = 0,
+    executor: Executor | None = None,
+) -> pd.DataFrame:
+    """
+    Pre-screen a price matrix, fit hedge ratios and mean-reversion diagnostics
+    for the candidates in batch, drop pairs whose half-life exceeds
+    ``max_half_life``, then run ADF and the backtest on what is left.
+    Tickers that failed to download (see download_price_matrix) or have no
+    data are reported in ``result.attrs["failed_tickers"]``.
+    ``precision`` overrides set_precision() for the panel and spreads.
+    With ``bootstrap`` resamples, adds bootstrap_intervals columns (e.g.
+    ``sharpe_ratio_lo``), which can be used as ``sort_by`` keys.
+    """
+    dtype = _work_dtype(precision)
+    failed = dict(prices.attrs.get("failed_tickers", {}))
+    empty = prices.columns[prices.isna().all()]
+    failed.update({ticker: "No prices in the requested window" for ticker in empty})
+
+    panel = prices.drop(columns=empty).dropna(how="any").astype(dtype, copy=False)
+    candidates = prefilter_pairs(panel, top_k=top_k, method=method)
+    candidates.attrs["failed_tickers"] = failed
+    if candidates.empty:
+        return candidates
+
+    values_a = panel[candidates["ticker_a"]].to_numpy(dtype=dtype)
+    values_b = panel[candidates["ticker_b"]].to_numpy(dtype=dtype)
+    betas, _ = hedge_ratio_matrix(panel)
+    hedge_ratios = betas.to_numpy()[
+        betas.index.get_indexer(candidates["ticker_a"]),
+        betas.columns.get_indexer(candidates["ticker_b"]),
+    ]
+    hedge_ratios = np.nan_to_num(hedge_ratios)
+    spreads = values_a - hedge_ratios.astype(dtype) * values_b
+    del values_a, values_b
+
+    diagnostics = mean_reversion_diagnostics(spreads)
+    candidates["hedge_ratio"] = hedge_ratios
+    candidates = pd.concat([candidates, diagnostics], axis=1)
+
+    keep = np.ones(len(candidates), dtype=bool)
+    if max_half_life is not None:
+        keep = candidates["half_life"].to_numpy() <= max_half_life
+    candidates = candidates[keep].reset_index(drop=True)
+    spreads = spreads[:, keep]
+
+    pvalues = []
+    sharpes = []
+    total_returns = []
+    daily_returns = []
+    for col, (ticker_a, ticker_b, beta) in enumerate(
+        zip(candidates["ticker_a"], candidates["ticker_b"], candidates["hedge_ratio"])
+    ):
+        spread = spreads[:, col]
+        pvalues.append(adf_test(spread))
+
+        std = float(spread.std(ddof=1, dtype=np.float64))
+        zscores = _zscores(spread, float(spread.mean(dtype=np.float64)), std)
+        pair_frame = panel[[ticker_a, ticker_b]].set_axis(["A", "B"], axis=1)
+        performance = run_pairs_trading_backtest(
+            pair_frame, beta, zscores, entry_z, exit_z, cost_model=cost_model, precision=precision
+        )
+        sharpes.append(performance.sharpe_ratio)
+        total_returns.append(performance.total_return)
+        if bootstrap and performance.daily_returns is not None:
+            daily_returns.append(performance.daily_returns.to_numpy(dtype=np.float64))
+
+    candidates["coint_pvalue"] = pvalues
+    candidates["pair_ok"] = candidates["coint_pvalue"] < p_threshold
+    candidates["sharpe_ratio"] = sharpes
+    candidates["total_return"] = total_returns
+    if bootstrap and daily_returns:
+        # every candidate spans the same panel dates, so all pairs go through one batch
+        intervals = bootstrap_intervals(np.stack(daily_returns), n_resamples=bootstrap, executor=executor)
+        candidates = pd.concat([candidates, intervals], axis=1)
+
+    if sort_by not in candidates.columns:
+        raise ValueError(f"Unknown sort_by column: {sort_by} (interval columns need bootstrap > 0)")
+
+    ascending = sort_by in ("coint_pvalue", "half_life", "hurst", "variance_ratio")
+    ranked = candidates.sort_values(sort_by, ascending=ascending, ignore_index=True)
+    ranked.attrs["failed_tickers"] = failed
+    return ranked
+
+
+# ---------------------------------------------------------
+# Walk-forward (out-of-sample) evaluation
+# ---------------------------------------------------------
+@dataclass
+class WalkForwardFold:
+    train_start: object
+    train_end: object
+    test_start: object
+    test_end: object
+    hedge_ratio: float
+    entry_z: float
+    exit_z: float
+    performance: PerformanceMetrics
+
+
+@dataclass
+class WalkForwardResult:
+    folds: list[WalkForwardFold]
+    performance: PerformanceMetrics     # stitched out-of-sample backtest
+    train_size: int
+    test_size: int
+    anchored: bool = False
+
+
+# read-only price buffer attached by each pool worker
+_SHARED_PRICES: np.ndarray | None = None
+_SHARED_BLOCK: shared_memory.SharedMemory | None = None
+
+
+def _attach_shared_prices(name: str, shape: tuple[int, int]) -> None:
+    global _SHARED_PRICES, _SHARED_BLOCK
+    try:
+        block = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        block = shared_memory.SharedMemory(name=name)
+    prices = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+    prices.flags.writeable = False
+    _SHARED_BLOCK = block
+    _SHARED_PRICES = prices
+
+
+def walk_forward_splits(
+    rows: int,
+    train_size: int = 252,
+    test_size: int = 63,
+    anchored: bool = False,
+) -> list[tuple[int, int, int]]:
+    """(train_start, train_end, test_end) row bounds; test folds are contiguous."""
+    if train_size < 2 or test_size < 1:
+        raise ValueError("train_size must be >= 2 and test_size >= 1")
+
+    splits = []
+    train_end = train_size
+    while train_end < rows:
+        test_end = min(train_end + test_size, rows)
+        train_start = 0 if anchored else train_end - train_size
+        splits.append((train_start, train_end, test_end))
+        train_end = test_end
+    return splits
+
+
+def _fit_spread(prices_a: np.ndarray, prices_b: np.ndarray) -> tuple[float, float, float]:
+    beta = estimate_hedge_ratio(prices_a, prices_b)
+    spread = prices_a - beta * prices_b
+    return beta, float(spread.mean()), float(spread.std(ddof=1))
+
+
+def _zscores(spread: np.ndarray, mean: float, std: float) -> np.ndarray:
+    if std > 0:
+        return (spread - mean) / std
+    return np.zeros_like(spread)
+
+
+def _evaluate_fold(
+    prices: np.ndarray,
+    bounds: tuple[int, int, int],
+    entry_grid: tuple[float, ...],
+    exit_grid: tuple[float, ...],
+    allocation: float,
+    cost_model: CostModel | None = None,
+    regime: tuple[int, float] | None = None,
+) -> tuple[float, float, float, np.ndarray, int, np.ndarray]:
+    train_start, train_end, test_end = bounds
+    train_a = prices[train_start:train_end, 0]
+    train_b = prices[train_start:train_end, 1]
+    beta, mean, std = _fit_spread(train_a, train_b)
+
+    # regime mask from this fold's beta; each bar's rolling window ends at that
+    # bar, so no row after it is used. Bars without a full window stay flat.
+    train_mask = test_mask = None
+    if regime is not None:
+        window, p_threshold = regime
+        first = max(0, min(train_start, train_end - window))
+        spread = prices[first:test_end, 0] - beta * prices[first:test_end, 1]
+        tradable = rolling_adf_pvalues(spread, window=window) < p_threshold
+        train_mask = tradable[train_start - first:train_end - first]
+        test_mask = tradable[train_end - 1 - first:]
+
+    # thresholds are picked on the train fold only, by net Sharpe
+    entries, exits = np.meshgrid(entry_grid, exit_grid, indexing="ij")
+    entries, exits = entries.ravel(), exits.ravel()
+    if entries.size > 1:
+        train_z = _zscores(train_a - beta * train_b, mean, std)
+        returns, _, _ = _backtest_kernel(
+            train_a, train_b, train_z, beta, entries, exits, allocation, cost_model, train_mask
+        )
+        sharpe = _summary_arrays(returns)["sharpe_ratio"]
+        sharpe[exits >= entries] = -np.inf
+        best = int(np.argmax(sharpe))
+    else:
+        best = 0
+    entry_z, exit_z = float(entries[best]), float(exits[best])
+
+    # the test slice starts on the last train bar, which supplies the first signal
+    test_a = prices[train_end - 1:test_end, 0]
+    test_b = prices[train_end - 1:test_end, 1]
+    test_z = _zscores(test_a - beta * test_b, mean, std)
+    returns, trades, costs = _backtest_kernel(
+        test_a, test_b, test_z, beta, entry_z, exit_z, allocation, cost_model, test_mask
+    )
+    return beta, entry_z, exit_z, returns[0], int(trades[0]), costs[0]
+
+
+def _evaluate_fold_shared(
+    bounds: tuple[int, int, int],
+    entry_grid: tuple[float, ...],
+    exit_grid: tuple[float, ...],
+    allocation: float,
+    cost_model: CostModel | None = None,
+    regime: tuple[int, float] | None = None,
+) -> tuple[float, float, float, np.ndarray, int, np.ndarray]:
+    return _evaluate_fold(
+        _SHARED_PRICES, bounds, entry_grid, exit_grid, allocation, cost_model, regime
+    )
+
+
+def walk_forward_backtest(
+    price_frame: pd.DataFrame,
+    train_size: int = 252,
+    test_size: int = 63,
+    entry_z: float = 2.0,
+    exit_z: float = 0.5,
+    entry_grid: list[float] | None = None,
+    exit_grid: list[float] | None = None,
+    anchored: bool = False,
+    initial_capital: float = 1_000_000.0,
+    allocation: float = 0.5,
+    cost_model: CostModel | None = None,
+    max_workers: int | None = None,
+    regime_window: int | None = None,
+    p_threshold: float = 0.05,
+) -> WalkForwardResult:
+    """
+    Fit the hedge ratio, spread mean/std (and thresholds, when grids are given)
+    on each train fold, trade the following test fold, and stitch the
+    out-of-sample returns into a single backtest. Folds run on a process pool
+    that shares one read-only copy of the prices; ``max_workers=1`` runs inline.
+    With ``regime_window`` each fold also goes flat while the rolling ADF
+    p-value of its own spread (train-fold beta) is at or above ``p_threshold``.
+    """
+    prices = np.column_stack(
+        [np.asarray(price_frame["A"], dtype=np.float64), np.asarray(price_frame["B"], dtype=np.float64)]
+    )
+    regime = None if regime_window is None else (int(regime_window), float(p_threshold))
+    splits = walk_forward_splits(prices.shape[0], train_size, test_size, anchored)
+    entries = tuple(entry_grid) if entry_grid else (entry_z,)
+    exits = tuple(exit_grid) if exit_grid else (exit_z,)
+
+    if not splits:
+        return WalkForwardResult(
+            folds=[],
+            performance=_empty_performance(initial_capital),
+            train_size=train_size,
+            test_size=test_size,
+            anchored=anchored,
+        )
+
+    workers = max_workers or min(len(splits), os.cpu_count() or 1)
+    if workers <= 1 or len(splits) == 1:
+        outputs = [
+            _evaluate_fold(prices, bounds, entries, exits, allocation, cost_model, regime)
+            for bounds in splits
+        ]
+    else:
+        block = shared_memory.SharedMemory(create=True, size=prices.nbytes)
+        try:
+            np.ndarray(prices.shape, dtype=np.float64, buffer=block.buf)[:] = prices
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_attach_shared_prices,
+                initargs=(block.name, prices.shape),
+            ) as pool:
+                outputs = list(
+                    pool.map(
+                        _evaluate_fold_shared,
+                        splits,
+                        [entries] * len(splits),
+                        [exits] * len(splits),
+                        [allocation] * len(splits),
+                        [cost_model] * len(splits),
+                        [regime] * len(splits),
+                    )
+                )
+        finally:
+            block.close()
+            block.unlink()
+
+    index = price_frame.index
+    folds: list[WalkForwardFold] = []
+    stitched: list[np.ndarray] = []
+    stitched_costs: list[np.ndarray] = []
+    total_trades = 0
+    for (train_start, train_end, test_end), (beta, fold_entry, fold_exit, returns, trades, costs) in zip(
+        splits, outputs
+    ):
+        fold_returns = pd.Series(returns, index=index[train_end:test_end])
+        folds.append(
+            WalkForwardFold(
+                train_start=index[train_start],
+                train_end=index[train_end - 1],
+                test_start=index[train_end],
+                test_end=index[test_end - 1],
+                hedge_ratio=beta,
+                entry_z=fold_entry,
+                exit_z=fold_exit,
+                performance=_performance_from_returns(
+                    fold_returns,
+                    initial_capital,
+                    trades,
+                    start_label=index[train_end - 1],
+                    cost_returns=costs,
+                ),
+            )
+        )
+        stitched.append(returns)
+        stitched_costs.append(costs)
+        total_trades += trades
+
+    first_test = splits[0][1]
+    oos_returns = pd.Series(np.concatenate(stitched), index=index[first_test:])
+    performance = _performance_from_returns(
+        oos_returns,
+        initial_capital,
+        total_trades,
+        start_label=index[first_test - 1],
+        cost_returns=np.concatenate(stitched_costs),
+    )
+    return WalkForwardResult(
+        folds=folds,
+        performance=performance,
+        train_size=train_size,
+        test_size=test_size,
+        anchored=anchored,
+    )
+
+
+# ---------------------------------------------------------
+# Portfolio of pair strategies
+# ---------------------------------------------------------
+@dataclass
+class PortfolioResult:
+    method: str
+    weights: pd.Series                  # fraction of capital per pair (sum = gross exposure)
+    risk_contributions: pd.Series       # share of portfolio variance per pair
+    covariance: pd.DataFrame            # annualized covariance of pair returns
+    pair_returns: pd.DataFrame
+    performance: PerformanceMetrics
+    target_volatility: float | None = None
+
+
+def combine_pair_returns(performances: dict[str, PerformanceMetrics | None]) -> pd.DataFrame:
+    """
+    Daily strategy returns of many pairs on one date index. A pair contributes
+    0 on days outside its own history (its capital sits in cash).
+    """
+    columns = {
+        label: perf.daily_returns
+        for label, perf in performances.items()
+        if perf is not None and perf.daily_returns is not None and not perf.daily_returns.empty
+    }
+    if not columns:
+        return pd.DataFrame()
+    return pd.concat(columns, axis=1).sort_index().fillna(0.0)
+
+
+def _equal_risk_weights(cov: np.ndarray, iterations: int = 100, tol: float = 1e-10) -> np.ndarray:
+    """
+    Equal-risk-contribution weights from Newton's method on the strictly
+    convex problem min 0.5 w'Cw - (1/n) sum(log w_i). Its minimizer has
+    w_i (Cw)_i = 1/n for every pair, negative correlations included; the
+    result is then normalized to sum to 1. Steps are damped to keep w > 0
+    and backtracked until the objective decreases.
+    """
+    n = cov.shape[0]
+    budget = 1.0 / n
+
+    def _objective(w: np.ndarray) -> float:
+        return 0.5 * float(w @ cov @ w) - budget * float(np.log(w).sum())
+
+    # inverse volatility start, exact for uncorrelated pairs
+    weights = 1.0 / np.sqrt(np.diag(cov))
+    weights /= weights.sum()
+    value = _objective(weights)
+    for _ in range(iterations):
+        marginal = cov @ weights
+        # at the optimum every w_i (Cw)_i equals the budget exactly
+        if np.max(np.abs(weights * marginal / budget - 1.0)) < tol:
+            break
+        gradient = marginal - budget / weights
+        hessian = cov + np.diag(budget / weights**2)
+        step = np.linalg.solve(hessian, gradient)
+        # largest step keeping every weight positive, then halve until the objective drops
+        shrinking = step > 0
+        scale = min(1.0, 0.99 * float(np.min(weights[shrinking] / step[shrinking]))) if shrinking.any() else 1.0
+        while scale > 1e-12:
+            candidate = weights - scale * step
+            candidate_value = _objective(candidate)
+            if candidate_value <= value:
+                break
+            scale *= 0.5
+        else:
+            break
+        weights, value = candidate, candidate_value
+    return weights / weights.sum()
+
+
+def allocate_pairs(
+    returns: pd.DataFrame,
+    method: str = "equal_risk",
+    target_volatility: float = 0.10,
+    max_leverage: float = 1.0,
+) -> pd.Series:
+    """
+    Capital weights across pair strategies from their return covariance.
+
+    ``equal_risk``: every pair contributes the same share of portfolio
+    variance, fully invested (weights sum to 1).
+    ``vol_target``: inverse-volatility weights scaled so the portfolio's
+    annualized volatility hits ``target_volatility``, with gross exposure
+    capped at ``max_leverage``.
+    Pairs that never traded (zero volatility) get no capital.
+    """
+    weights = pd.Series(0.0, index=returns.columns)
+    cov = returns.cov().to_numpy() * 252
+    active = np.diag(cov) > 0
+    if not active.any():
+        return weights
+
+    sub_cov = cov[np.ix_(active, active)]
+    method = method.lower()
+    if method == "equal_risk":
+        raw = _equal_risk_weights(sub_cov)
+    elif method == "vol_target":
+        raw = 1.0 / np.sqrt(np.diag(sub_cov))
+        raw /= raw.sum()
+        port_vol = math.sqrt(float(raw @ sub_cov @ raw))
+        if port_vol > 0:
+            raw *= target_volatility / port_vol
+        if raw.sum() > max_leverage:
+            raw *= max_leverage / raw.sum()
+    else:
+        raise ValueError(f"Unknown allocation method: {method}")
+
+    weights[active] = raw
+    return weights
+
+
+def build_portfolio(
+    performances: dict[str, PerformanceMetrics | None],
+    method: str = "equal_risk",
+    target_volatility: float = 0.10,
+    max_leverage: float = 1.0,
+    initial_capital: float = 1_000_000.0,
+) -> PortfolioResult:
+    """Combine per-pair backtests into one book and score the combined equity curve."""
+    pair_returns = combine_pair_returns(performances)
+    if pair_returns.empty:
+        return PortfolioResult(
+            method=method,
+            weights=pd.Series(dtype=float),
+            risk_contributions=pd.Series(dtype=float),
+            covariance=pd.DataFrame(),
+            pair_returns=pair_returns,
+            performance=_empty_performance(initial_capital),
+            target_volatility=target_volatility if method == "vol_target" else None,
+        )
+
+    weights = allocate_pairs(pair_returns, method, target_volatility, max_leverage)
+    covariance = pair_returns.cov() * 252
+    w = weights.to_numpy()
+    contributions = w * (covariance.to_numpy() @ w)
+    total = contributions.sum()
+    risk_contributions = pd.Series(
+        contributions / total if total > 0 else np.zeros_like(w), index=weights.index
+    )
+
+    portfolio_returns = pd.Series(pair_returns.to_numpy() @ w, index=pair_returns.index)
+    trades = sum(
+        perf.total_trades for label, perf in performances.items()
+        if perf is not None and weights.get(label, 0.0) > 0
+    )
+    performance = _performance_from_returns(portfolio_returns, initial_capital, trades)
+
+    return PortfolioResult(
+        method=method,
+        weights=weights,
+        risk_contributions=risk_contributions,
+        covariance=covariance,
+        pair_returns=pair_returns,
+        performance=performance,
+        target_volatility=target_volatility if method == "vol_target" else None,
+    )
+
+
+# ---------------------------------------------------------
+# Monte Carlo projection of strategy returns
+# ---------------------------------------------------------
+def simulate_growth_paths(
+    daily_returns: pd.Series | np.ndarray,
+    horizon: int = 63,
+    n_paths: int = 5000,
+    block_size: int = 10,
+    seed: int | None = 0,
+) -> np.ndarray:
+    """
+    Moving-block bootstrap of historical strategy returns. Draws
+    ``n_paths`` futures of ``horizon`` days, each stitched from random
+    ``block_size``-day stretches of history (keeps volatility clustering and
+    the on/off pattern of trades). Returns growth of 1.0 as an
+    (n_paths, horizon + 1) array whose first column is 1.
+    """
+    returns = np.asarray(daily_returns, dtype=np.float64)
+    returns = returns[np.isfinite(returns)]
+    if returns.size == 0:
+        return np.ones((n_paths, horizon + 1))
+
+    block = max(1, min(block_size, returns.size))
+    blocks = -(-horizon // block)
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, returns.size - block + 1, size=(n_paths, blocks))
+    picks = (starts[:, :, None] + np.arange(block)).reshape(n_paths, -1)[:, :horizon]
+
+    growth = np.ones((n_paths, horizon + 1))
+    np.cumprod(1.0 + returns[picks], axis=1, out=growth[:, 1:])
+    return growth
+
+
+def projection_bands(
+    growth: np.ndarray,
+    percentiles: tuple[float, ...] = (5, 25, 50, 75, 95),
+) -> pd.DataFrame:
+    """Percentiles of simulated growth per day, one column per percentile (e.g. "p5")."""
+    bands = np.percentile(growth, percentiles, axis=0)
+    return pd.DataFrame(
+        bands.T,
+        index=pd.RangeIndex(growth.shape[1], name="day"),
+        columns=[f"p{p:g}" for p in percentiles],
+    )
+
+
+# ---------------------------------------------------------
+# Bootstrap confidence intervals for backtest metrics
+#
+# Resamples are stitched from random block_size-day stretches of the
+# daily strategy returns (as in simulate_growth_paths), so flat and in-trade
+# spells and volatility clusters survive. Each chunk of resamples is one
+# (resamples x days) array through _summary_arrays; chunks have their own
+# spawned seed, so results are the same with or without an executor.
+# ---------------------------------------------------------
+_BOOTSTRAP_METRICS = ("annualized_return", "sharpe_ratio", "max_drawdown")
+_BOOTSTRAP_RESAMPLES = 2000
+_BOOTSTRAP_BLOCK = 10
+_BOOTSTRAP_LEVEL = 0.9
+
+
+def _block_bootstrap_picks(size: int, n_resamples: int, block_size: int, rng) -> np.ndarray:
+    block = max(1, min(block_size, size))
+    blocks = -(-size // block)
+    starts = rng.integers(0, size - block + 1, size=(n_resamples, blocks))
+    return (starts[:, :, None] + np.arange(block)).reshape(n_resamples, -1)[:, :size]
+
+
+def _bootstrap_chunk(
+    returns: np.ndarray,
+    n_resamples: int,
+    block_size: int,
+    seed: np.random.SeedSequence,
+) -> dict[str, np.ndarray]:
+    """Metrics of ``n_resamples`` resamples for each row of ``returns``. Top-level for process pools."""
+    picks = _block_bootstrap_picks(returns.shape[1], n_resamples, block_size, np.random.default_rng(seed))
+    out = {name: np.empty((returns.shape[0], n_resamples)) for name in _BOOTSTRAP_METRICS}
+    # every series reuses the same draws, so one array of picks serves the batch
+    for row, series in enumerate(returns):
+        summary = _summary_arrays(series[picks])
+        for name in _BOOTSTRAP_METRICS:
+            out[name][row] = summary[name]
+    return out
+
+
+def bootstrap_intervals(
+    returns: np.ndarray | pd.DataFrame,
+    n_resamples: int = _BOOTSTRAP_RESAMPLES,
+    block_size: int = _BOOTSTRAP_BLOCK,
+    level: float = _BOOTSTRAP_LEVEL,
+    seed: int | None = 0,
+    executor: Executor | None = None,
+    chunk_size: int = 1000,
+) -> pd.DataFrame:
+    """
+    Confidence intervals for annualized return, Sharpe and max drawdown of
+    many equal-length daily return series at once (one column per series
+    for a DataFrame, one row for a 2-D array). Returns one row per series
+    with ``<metric>_lo`` / ``<metric>_hi`` columns. ``executor`` (e.g. a
+    ProcessPoolExecutor) runs the chunks of ``chunk_size`` resamples in
+    parallel.
+    """
+    labels = None
+    if isinstance(returns, pd.DataFrame):
+        labels = returns.columns
+        values = returns.to_numpy(dtype=np.float64).T
+    else:
+        values = np.atleast_2d(np.asarray(returns, dtype=np.float64))
+    columns = [f"{name}_{side}" for name in _BOOTSTRAP_METRICS for side in ("lo", "hi")]
+    if values.shape[1] < 2 or n_resamples < 1:
+        return pd.DataFrame(np.nan, index=labels if labels is not None else range(values.shape[0]), columns=columns)
+
+    sizes = [min(chunk_size, n_resamples - done) for done in range(0, n_resamples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = ([values] * len(sizes), sizes, [block_size] * len(sizes), seeds)
+    chunks = list(executor.map(_bootstrap_chunk, *args) if executor is not None else map(_bootstrap_chunk, *args))
+
+    tail = (1.0 - level) / 2.0
+    bounds = {}
+    for name in _BOOTSTRAP_METRICS:
+        samples = np.concatenate([chunk[name] for chunk in chunks], axis=1)
+        lo, hi = np.quantile(samples, [tail, 1.0 - tail], axis=1)
+        bounds[f"{name}_lo"] = lo
+        bounds[f"{name}_hi"] = hi
+    return pd.DataFrame(bounds, index=labels, columns=columns)
+
+
+def metric_intervals(
+    daily_returns: pd.Series | np.ndarray | None,
+    n_resamples: int = _BOOTSTRAP_RESAMPLES,
+    block_size: int = _BOOTSTRAP_BLOCK,
+    level: float = _BOOTSTRAP_LEVEL,
+    seed: int | None = 0,
+    executor: Executor | None = None,
+) -> MetricIntervals | None:
+    """bootstrap_intervals for one return series; None when there are fewer than two returns."""
+    if daily_returns is None:
+        return None
+    values = np.asarray(daily_returns, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if values.size < 2:
+        return None
+    row = bootstrap_intervals(
+        values[None, :], n_resamples, block_size, level, seed, executor
+    ).iloc[0]
+    return MetricIntervals(
+        level=level,
+        n_resamples=n_resamples,
+        block_size=block_size,
+        **{name: (float(row[f"{name}_lo"]), float(row[f"{name}_hi"])) for name in _BOOTSTRAP_METRICS},
+    )
 
 
 # ---------------------------------------------------------
 # Pairs trading analysis (primary engine)
 # ---------------------------------------------------------
+def analysis_request(kind: str, ticker_a: str, ticker_b: str, start: str, end: str, **overrides) -> tuple[str, dict]:
+    """
+    Shared-cache key and complete keyword arguments for ``kind``
+    ("analyze_pair" or "analyze_pair_momentum"). Defaults come from the
+    matching *_prices function, so every front-end (analyze_pair, AsyncEngine)
+    builds the same key without repeating the parameter list.
+    """
+    analyze = {
+        "analyze_pair": analyze_pair_prices,
+        "analyze_pair_momentum": analyze_pair_momentum_prices,
+    }[kind]
+    params = {
+        name: param.default
+        for name, param in inspect.signature(analyze).parameters.items()
+        if param.default is not inspect.Parameter.empty
+    }
+    unknown = set(overrides) - set(params)
+    if unknown:
+        raise TypeError(f"{kind}() got unexpected arguments: {', '.join(sorted(unknown))}")
+    params.update(overrides)
+    return cache_key(kind, ticker_a, ticker_b, start, end, **params), params
+
+
 def analyze_pair(
     ticker_a: str,
     ticker_b: str,
@@ -375,11 +1936,61 @@ def analyze_pair(
     end: str,
     entry_z: float = 2.0,
     exit_z: float = 0.5,
-    p_threshold: float = 0.05
+    p_threshold: float = 0.05,
+    wf_train_size: int = 252,
+    wf_test_size: int = 63,
+    cost_model: CostModel | None = None,
+    regime_window: int = 252,
+    regime_filter: bool = True,
+    exit_rules: ExitRules | None = None,
 ) -> PairResult:
-    prices_a = download_prices(ticker_a, start, end)
-    prices_b = download_prices(ticker_b, start, end)
+    key, params = analysis_request(
+        "analyze_pair", ticker_a, ticker_b, start, end,
+        entry_z=entry_z,
+        exit_z=exit_z,
+        p_threshold=p_threshold,
+        wf_train_size=wf_train_size,
+        wf_test_size=wf_test_size,
+        cost_model=cost_model,
+        regime_window=regime_window,
+        regime_filter=regime_filter,
+        exit_rules=exit_rules,
+    )
 
+    def _compute() -> PairResult:
+        prices_a = download_prices(ticker_a, start, end)
+        prices_b = download_prices(ticker_b, start, end)
+        return analyze_pair_prices(prices_a, prices_b, ticker_a, ticker_b, **params)
+
+    # other workers sharing the cache reuse the first worker's result
+    return shared_get_or_compute(key, _compute)
+
+
+def analyze_pair_prices(
+    prices_a: pd.Series,
+    prices_b: pd.Series,
+    ticker_a: str,
+    ticker_b: str,
+    entry_z: float = 2.0,
+    exit_z: float = 0.5,
+    p_threshold: float = 0.05,
+    wf_train_size: int = 252,
+    wf_test_size: int = 63,
+    cost_model: CostModel | None = None,
+    regime_window: int = 252,
+    regime_filter: bool = True,
+    exit_rules: ExitRules | None = None,
+) -> PairResult:
+    """
+    CPU-bound part of analyze_pair, on already downloaded prices. With
+    ``regime_filter`` the backtests go flat and take no new entries while the
+    rolling ``regime_window``-bar ADF p-value is at or above ``p_threshold``.
+    The in-sample backtests (headline, presets) use the full-sample spread's
+    mask, kept on the result (``tradable``) for grids and heatmaps built
+    later; walk-forward folds rebuild it from their own train-fold beta so
+    the out-of-sample numbers see no later data. Bars before the first full
+    window are not traded.
+    """
     df = pd.concat([prices_a, prices_b], axis=1).dropna()
     df.columns = ["A", "B"]
 
@@ -402,13 +2013,41 @@ def analyze_pair(
         last_z = 0.0
         zscores = pd.Series(0.0, index=spread.index)
 
+    rolling_pvalue = rolling_adf_pvalues(spread, window=regime_window)
+    # bars before the first full window (NaN p-value) are not traded
+    tradable = None
+    if regime_filter:
+        tradable = rolling_pvalue.to_numpy() < p_threshold
+
     performance = run_pairs_trading_backtest(
         price_frame=df,
         beta=beta,
         zscores=zscores,
         entry_z=entry_z,
         exit_z=exit_z,
+        cost_model=cost_model,
+        tradable=tradable,
+        exit_rules=exit_rules,
+    )
+    performance.intervals = metric_intervals(performance.daily_returns)
+    presets = run_preset_backtests(
+        df, beta, zscores, cost_model=cost_model, tradable=tradable, exit_rules=exit_rules
     )
+    diagnostics = mean_reversion_diagnostics(spread.to_numpy()).iloc[0]
+
+    walk_forward = None
+    if len(df) > wf_train_size:
+        walk_forward = walk_forward_backtest(
+            df,
+            train_size=wf_train_size,
+            test_size=wf_test_size,
+            entry_z=entry_z,
+            exit_z=exit_z,
+            cost_model=cost_model,
+            max_workers=1,
+            regime_window=regime_window if regime_filter else None,
+            p_threshold=p_threshold,
+        )
 
     # 协整失败 → 不推荐 pairs trading
     if not pair_ok:
@@ -433,6 +2072,16 @@ def analyze_pair(
             performance=performance,
             entry_z=entry_z,
             exit_z=exit_z,
+            walk_forward=walk_forward,
+            spread_mean=float(mean_spread),
+            spread_std=float(std_spread),
+            preset_performance=presets,
+            half_life=float(diagnostics["half_life"]),
+            hurst=float(diagnostics["hurst"]),
+            variance_ratio=float(diagnostics["variance_ratio"]),
+            rolling_pvalue=rolling_pvalue,
+            regime_window=regime_window,
+            tradable=tradable,
         )
 
     # 协整通过 → 构造 entry/exit 区间与 signal
@@ -483,6 +2132,16 @@ def analyze_pair(
         performance=performance,
         entry_z=entry_z,
         exit_z=exit_z,
+        walk_forward=walk_forward,
+        spread_mean=float(mean_spread),
+        spread_std=float(std_spread),
+        preset_performance=presets,
+        half_life=float(diagnostics["half_life"]),
+        hurst=float(diagnostics["hurst"]),
+        variance_ratio=float(diagnostics["variance_ratio"]),
+        rolling_pvalue=rolling_pvalue,
+        regime_window=regime_window,
+        tradable=tradable,
     )
 
 
@@ -497,9 +2156,26 @@ def analyze_pair_momentum(
     high_pct: float = 0.9,
     low_pct: float = 0.1,
 ) -> PairResult:
-    prices_a = download_prices(ticker_a, start, end)
-    prices_b = download_prices(ticker_b, start, end)
+    key, params = analysis_request(
+        "analyze_pair_momentum", ticker_a, ticker_b, start, end, high_pct=high_pct, low_pct=low_pct
+    )
+
+    def _compute() -> PairResult:
+        prices_a = download_prices(ticker_a, start, end)
+        prices_b = download_prices(ticker_b, start, end)
+        return analyze_pair_momentum_prices(prices_a, prices_b, ticker_a, ticker_b, **params)
+
+    return shared_get_or_compute(key, _compute)
 
+
+def analyze_pair_momentum_prices(
+    prices_a: pd.Series,
+    prices_b: pd.Series,
+    ticker_a: str,
+    ticker_b: str,
+    high_pct: float = 0.9,
+    low_pct: float = 0.1,
+) -> PairResult:
     df = pd.concat([prices_a, prices_b], axis=1).dropna()
     df.columns = ["A", "B"]
     display_prices = df.rename(columns={"A": ticker_a.upper(), "B": ticker_b.upper()})
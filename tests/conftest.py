@@ -0,0 +1,45 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import loadtest  # noqa: E402
+
+
+@pytest.fixture
+def synthetic_prices():
+    """Factory for group-cointegrated date x ticker frames (loadtest.synthetic_prices)."""
+    return loadtest.synthetic_prices
+
+
+@pytest.fixture
+def pair_prices():
+    """
+    Factory for one cointegrated pair: B is a random walk and A = hedge * B
+    plus AR(1) noise; ``late_phi`` raises the noise persistence from
+    mid-sample on, so the pair stops mean reverting there.
+    """
+    def _make(
+        days: int = 900,
+        seed: int = 5,
+        hedge: float = 1.5,
+        phi: float = 0.8,
+        late_phi: float | None = None,
+        noise: float = 0.6,
+    ) -> tuple[pd.Series, pd.Series]:
+        rng = np.random.default_rng(seed)
+        dates = pd.bdate_range("2018-01-01", periods=days)
+        b = 50 * np.exp(np.cumsum(rng.normal(0.0002, 0.01, days)))
+        spread = np.zeros(days)
+        shocks = rng.normal(0.0, noise, days)
+        for t in range(1, days):
+            persistence = late_phi if late_phi is not None and t >= days // 2 else phi
+            spread[t] = persistence * spread[t - 1] + shocks[t]
+        return pd.Series(hedge * b + spread, index=dates), pd.Series(b, index=dates)
+
+    return _make
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import price_data as pdm
+
+DATES = pd.bdate_range("2024-01-01", periods=6)
+
+# as traded: $2 dividend going ex on day 1, 2:1 split on day 3
+CLOSES = [100.0, 98.0, 99.0, 50.0, 51.0, 52.0]
+DIVIDENDS = [0.0, 2.0, 0.0, 0.0, 0.0, 0.0]
+SPLITS = [0.0, 0.0, 0.0, 2.0, 0.0, 0.0]
+
+
+def _yahoo(days: int, closes: list[float]) -> pd.DataFrame:
+    # what Yahoo shows after ``days`` days: closes and dividends back-adjusted for splits so far
+    splits = np.array(SPLITS[:days])
+    later = np.where(splits > 0, splits, 1.0)[::-1].cumprod()[::-1]
+    later = np.append(later[1:], 1.0)
+    index = DATES[:days].tz_localize("America/New_York")
+    return pd.DataFrame(
+        {
+            "Close": np.array(closes[:days]) / later,
+            "Dividends": np.array(DIVIDENDS[:days]) / later,
+            "Stock Splits": splits,
+        },
+        index=index,
+    )
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    state = {"days": 3, "closes": CLOSES}
+
+    def _history(ticker, start, end, actions=False):
+        frame = _yahoo(state["days"], state["closes"])
+        return frame[frame.index.tz_localize(None) >= pd.Timestamp(start)]
+
+    monkeypatch.setattr(pdm, "_yahoo_history", _history)
+    return state
+
+
+def test_adjustment_factors_for_a_split_after_a_dividend():
+    closes = pd.Series(CLOSES[:5], index=DATES[:5])
+    dividends = pd.Series(DIVIDENDS[:5], index=DATES[:5])
+    splits = pd.Series([1.0, 1.0, 1.0, 2.0, 1.0], index=DATES[:5])
+    factors = pdm.adjustment_factors(closes, dividends, splits)
+    # before the dividend: (1 - 2/100) * 1/2; before the split: 1/2
+    np.testing.assert_allclose(factors, [0.49, 0.5, 0.5, 1.0, 1.0])
+
+
+def test_refresh_recomputes_only_on_new_actions(tmp_path, provider):
+    store = pdm.AdjustedPriceStore(tmp_path / "prices.db")
+
+    first = store.refresh("XYZ", start="2024-01-01")
+    assert first.full_reload and first.rows_added == 3 and first.actions_added == 1
+    np.testing.assert_allclose(store.adjusted("XYZ"), [98.0, 98.0, 99.0])
+
+    # the split arrives: Yahoo now halves the old closes, the store keeps them as traded
+    provider["days"] = 5
+    second = store.refresh("XYZ")
+    assert (second.rows_added, second.actions_added, second.recomputed, second.full_reload) == (2, 1, True, False)
+    np.testing.assert_allclose(store.raw("XYZ")["close"], CLOSES[:5])
+    np.testing.assert_allclose(store.adjusted("XYZ"), [49.0, 49.0, 49.5, 50.0, 51.0])
+
+    # a plain new day is appended at factor 1 without touching the history
+    provider["days"] = 6
+    third = store.refresh("XYZ")
+    assert (third.rows_added, third.actions_added, third.recomputed) == (1, 0, False)
+    np.testing.assert_allclose(store.adjusted("XYZ"), [49.0, 49.0, 49.5, 50.0, 51.0, 52.0])
+    store.close()
+
+
+def test_restated_history_reloads_the_ticker(tmp_path, provider):
+    store = pdm.AdjustedPriceStore(tmp_path / "prices.db")
+    store.refresh("XYZ", start="2024-01-01")
+    provider["closes"] = [100.0, 98.0, 97.0, 50.0, 51.0, 52.0]
+    provider["days"] = 4
+    result = store.refresh("XYZ", start="2024-01-01")
+    assert result.full_reload and result.rows_added == 4
+    np.testing.assert_allclose(store.adjusted("XYZ"), [49.0, 49.0, 48.5, 50.0])
+    store.close()
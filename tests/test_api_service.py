@@ -0,0 +1,66 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("httpx")
+from starlette.testclient import TestClient
+
+import api_service
+from strategy_engine import Direction, StrategyPlan
+
+
+def _plan(direction: Direction) -> StrategyPlan:
+    return StrategyPlan(
+        risk_level="MEDIUM", signal_type="test", rationale="", entry_z=2.0, exit_z=0.5,
+        spread_value=0.0, zscore_value=0.0, allocation_pct=0.5, suggested_notional=1000.0,
+        hedge_ratio=1.5, ticker_a="AAA", ticker_b="BBB", direction=direction,
+    )
+
+
+@pytest.mark.parametrize("direction", list(Direction))
+def test_plan_direction_round_trips_through_positions(direction):
+    plan = api_service._plan_json(_plan(direction))
+    order = {
+        "ticker_a": plan["ticker_a"], "ticker_b": plan["ticker_b"], "price_a": 30.0, "price_b": 7.0,
+        "hedge_ratio": plan["hedge_ratio"], "direction": plan["direction"],
+        "notional": plan["suggested_notional"],
+    }
+    with TestClient(api_service.app) as client:
+        response = client.post("/positions", json={"orders": [order]})
+        assert response.status_code == 200
+        columns = response.json()["columns"]
+        assert columns["direction"] == [plan["direction"]] == [direction.name]
+        assert columns["long_shares"] == [{1: 13, -1: 57, 0: 0}[direction]]
+
+        # what /positions answers is accepted back unchanged
+        again = client.post("/positions", json={"orders": [{**order, "direction": columns["direction"][0]}]})
+        assert again.json()["columns"]["long_shares"] == columns["long_shares"]
+
+        rejected = client.post("/positions", json={"orders": [{**order, "direction": "LONG"}]})
+        assert rejected.status_code == 422
+
+
+def _slow_job(body: dict) -> dict:
+    time.sleep(0.3)
+    return body
+
+
+def test_followers_outlive_the_request_that_started_the_job():
+    async def _main():
+        runner = api_service.JobRunner(1, 1, 5.0, api_service.ResponseCache(60, 10))
+        runner._pool = ThreadPoolExecutor(max_workers=1)
+        try:
+            leader = asyncio.ensure_future(runner.submit("slow", _slow_job, {"x": 1}))
+            await asyncio.sleep(0.05)
+            follower = asyncio.ensure_future(runner.submit("slow", _slow_job, {"x": 1}))
+            await asyncio.sleep(0.05)
+            leader.cancel()                  # the first client disconnects
+            assert await follower == b'{"x":1}'
+            assert leader.cancelled()
+            assert runner.cache.get(next(iter(runner.cache._entries))) == b'{"x":1}'
+        finally:
+            runner.stop()
+
+    asyncio.run(_main())
@@ -0,0 +1,37 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import pytest
+
+import strategy_engine as se
+from async_engine import AsyncEngine
+from shared_cache import cache_key
+
+
+def test_request_fills_defaults_from_the_engine():
+    key, params = se.analysis_request("analyze_pair", "ko", "PEP", "2020-01-01", "2024-01-01", exit_z=0.25)
+    assert params["exit_z"] == 0.25 and params["entry_z"] == 2.0 and params["regime_filter"] is True
+    assert key == cache_key("analyze_pair", "KO", "PEP", "2020-01-01", "2024-01-01", **params)
+
+    _, momentum = se.analysis_request("analyze_pair_momentum", "KO", "PEP", "2020-01-01", "2024-01-01")
+    assert momentum == {"high_pct": 0.9, "low_pct": 0.1}
+
+    with pytest.raises(TypeError):
+        se.analysis_request("analyze_pair", "KO", "PEP", "2020-01-01", "2024-01-01", entry=2.0)
+
+
+def test_abandoned_jobs_keep_their_slot():
+    async def _main():
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            engine = AsyncEngine(executor=pool, max_workers=1, compute_timeout=0.1)
+            with pytest.raises(TimeoutError):
+                await engine._compute(partial(time.sleep, 0.5), "slow job")
+            # the slow job still occupies the only worker, so this waits and times out
+            with pytest.raises(TimeoutError):
+                await engine._compute(lambda: 1, "quick job")
+            await asyncio.sleep(0.5)
+            assert await engine._compute(lambda: 2, "quick job") == 2
+
+    asyncio.run(_main())
@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import strategy_engine as se
+
+
+def test_intervals_cover_the_true_metrics():
+    # iid daily returns; the "true" metrics come from one very long path
+    rng = np.random.default_rng(1)
+    mu, sigma = 0.0004, 0.01
+    truth = se._summary_arrays(rng.normal(mu, sigma, (1, 200_000)))
+    samples = rng.normal(mu, sigma, (250, 500))
+    intervals = se.bootstrap_intervals(samples, n_resamples=400, level=0.9, seed=3)
+    for name in ("annualized_return", "sharpe_ratio"):
+        value = truth[name][0]
+        covered = ((intervals[f"{name}_lo"] <= value) & (value <= intervals[f"{name}_hi"])).mean()
+        # nominal 90%; percentile intervals on 500 bars run a little short
+        assert 0.8 <= covered <= 0.97, (name, covered)
+
+
+def test_fixed_seed_is_reproducible():
+    rng = np.random.default_rng(2)
+    returns = pd.DataFrame(rng.normal(0.0003, 0.01, (300, 3)), columns=["x", "y", "z"])
+    first = se.bootstrap_intervals(returns, n_resamples=300, seed=7, chunk_size=100)
+    pd.testing.assert_frame_equal(first, se.bootstrap_intervals(returns, n_resamples=300, seed=7, chunk_size=100))
+    assert not first.equals(se.bootstrap_intervals(returns, n_resamples=300, seed=8, chunk_size=100))
+    assert list(first.index) == ["x", "y", "z"]
+    assert (first.filter(like="_lo").to_numpy() <= first.filter(like="_hi").to_numpy()).all()
+
+    # chunks run on an executor draw the same resamples as the serial path
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        pooled = se.bootstrap_intervals(returns, n_resamples=300, seed=7, chunk_size=100, executor=pool)
+    pd.testing.assert_frame_equal(first, pooled)
+
+    single = se.metric_intervals(returns["y"], n_resamples=300, seed=7)
+    assert single == se.metric_intervals(returns["y"], n_resamples=300, seed=7)
+    batch = se.bootstrap_intervals(returns, n_resamples=300, seed=7).loc["y"]
+    assert single.sharpe_ratio == (batch["sharpe_ratio_lo"], batch["sharpe_ratio_hi"])
+    assert se.metric_intervals(returns["y"].iloc[:1]) is None
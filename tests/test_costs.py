@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import strategy_engine as se
+
+# flat prices, so every return is cost; beta 1 splits each unit of position
+# half into A ($100) and half into B ($50)
+PRICES_A = np.array([100.0, 100.0, 100.0, 100.0])
+PRICES_B = np.array([50.0, 50.0, 50.0, 50.0])
+# long the spread on bars 0-1, exit on bar 2; held over returns 0 and 1
+ZSCORES = np.array([-2.0, -2.0, 0.0, 0.0])
+
+
+def _kernel(cost_model):
+    returns, trades, costs = se._backtest_kernel(
+        PRICES_A, PRICES_B, ZSCORES, 1.0, 1.0, 0.2, 0.5, cost_model
+    )
+    return returns[0], int(trades[0]), costs[0]
+
+
+def test_commission_slippage_and_per_share_on_entry_and_exit():
+    model = se.CostModel(commission_bps=2.0, slippage_bps=3.0, commission_per_share=0.01)
+    returns, trades, costs = _kernel(model)
+    # per $1 of capital a 0.5 position trades $0.25 of A and $0.25 of B:
+    #   bps leg:       0.50 * 5 bp                  = 0.000250
+    #   per-share leg: (0.25 / 100 + 0.25 / 50) * 0.01 = 0.000075
+    per_side = 0.000250 + 0.000075
+    np.testing.assert_allclose(costs, [per_side, 0.0, per_side])
+    np.testing.assert_allclose(returns, -costs)
+    assert trades == 1
+
+
+def test_borrow_is_charged_daily_on_the_short_leg():
+    model = se.CostModel(borrow_bps_annual=252.0)       # 1 bp a day
+    _, _, costs = _kernel(model)
+    # long A / short B: $0.25 of B borrowed while the position is held
+    np.testing.assert_allclose(costs, [0.25e-4, 0.25e-4, 0.0])
+
+
+def test_performance_reports_the_cost_drag():
+    model = se.CostModel(
+        commission_bps=2.0, slippage_bps=3.0, commission_per_share=0.01, borrow_bps_annual=252.0
+    )
+    frame = pd.DataFrame({"A": PRICES_A, "B": PRICES_B}, index=pd.bdate_range("2024-01-01", periods=4))
+    performance = se.run_pairs_trading_backtest(
+        frame, 1.0, pd.Series(ZSCORES, index=frame.index), 1.0, 0.2, initial_capital=1000.0, cost_model=model
+    )
+    charged = [0.000325 + 0.000025, 0.000025, 0.000325]
+    equity = 1000.0 * np.cumprod(np.concatenate([[1.0], 1.0 - np.array(charged)]))
+    assert performance.final_value == pytest.approx(equity[-1])
+    # dollars charged: each bar's cost rate on the equity it started from
+    assert performance.total_costs == pytest.approx(np.dot(charged, equity[:-1]))
+    assert performance.total_trades == 1
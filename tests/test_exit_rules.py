@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import strategy_engine as se
+
+
+def _paths(z, rules, spread_returns=None, tradable=None):
+    z = np.asarray(z, dtype=float)
+    returns = np.zeros(len(z)) if spread_returns is None else np.asarray(spread_returns, dtype=float)
+    positions, trades = se._rule_position_paths(
+        z, returns, np.array([1.0]), np.array([0.2]), rules, tradable
+    )
+    return positions[0].tolist(), int(trades[0])
+
+
+def test_max_holding_and_cooldown():
+    z = [-2, -2, -2, -2, -2, 0]
+    # closed on the bar the trade turns 2 bars old, reopened on the next signal
+    assert _paths(z, se.ExitRules(max_holding_days=2)) == ([1, 1, 0, 1, 1, 0], 2)
+    # a 2-bar cooldown after the time exit blocks bars 3 and 4
+    assert _paths(z, se.ExitRules(max_holding_days=2, cooldown_days=2)) == ([1, 1, 0, 0, 0, 0], 1)
+
+
+@pytest.mark.parametrize("side", [1, -1])
+def test_stop_loss_compounds_the_trade_return(side):
+    # long spread below -entry, short above; the trade loses 5% then 6%: 0.95 * 0.94 - 1 = -10.7%
+    z = [-2 * side] * 5
+    returns = [-0.05 * side, -0.06 * side, 0.0, 0.0, 0.0]
+    expected = [side, side, 0, side, side]
+    assert _paths(z, se.ExitRules(stop_loss=0.10), returns) == (expected, 2)
+    assert _paths(z, se.ExitRules(stop_loss=0.11), returns) == ([side] * 5, 1)
+
+
+def test_stop_z_exits_and_reenters():
+    assert _paths([-1.5, -3.5, -1.5], se.ExitRules(stop_z=3.0)) == ([1, 0, 1], 2)
+
+
+def test_exit_and_reentry_match_the_plain_state_machine():
+    # exit at |z| <= 0.2, no flip from long to short without an exit in between
+    z = [-1.5, -0.5, 0.1, -1.2, 1.5, 0.0]
+    far = se.ExitRules(max_holding_days=1000)
+    assert _paths(z, far) == ([1, 1, 0, 1, 1, 0], 2)
+    mask = np.array([True, True, True, False, True, True])
+    assert _paths(z, far, tradable=mask) == ([1, 1, 0, 0, -1, 0], 2)
+
+    rng = np.random.default_rng(11)
+    z = np.cumsum(rng.normal(0.0, 0.4, 400))
+    z = (z - z.mean()) / z.std()
+    entry, exit = np.array([1.0, 1.5, 2.0]), np.array([0.0, 0.3, 0.5])
+    plain, plain_trades = se._position_paths(z, entry, exit)
+    rules, rule_trades = se._rule_position_paths(z, np.zeros(400), entry, exit, far)
+    np.testing.assert_array_equal(rules, plain)
+    np.testing.assert_array_equal(rule_trades, plain_trades)
+
+
+def test_grid_rows_follow_the_rules(pair_prices):
+    a, b = pair_prices(days=500, seed=4, hedge=1.2, phi=0.9, noise=0.3)
+    frame = pd.concat([a, b], axis=1).set_axis(["A", "B"], axis=1)
+    beta = se.estimate_hedge_ratio(frame["A"], frame["B"])
+    spread = frame["A"] - beta * frame["B"]
+    zscores = (spread - spread.mean()) / spread.std(ddof=1)
+
+    grid = se.run_exit_rule_grid(
+        frame, beta, zscores, 1.0, 0.2, max_holding_values=[None, 2], cooldown_values=[0, 10]
+    )
+    assert grid[["max_holding_days", "cooldown_days"]].fillna(-1).values.tolist() == [
+        [-1, 0], [-1, 10], [2, 0], [2, 10],
+    ]
+    plain = se.run_pairs_trading_backtest(frame, beta, zscores, 1.0, 0.2)
+    # without a rule the grid row is the plain backtest (the cooldown only follows rule exits)
+    for row in (0, 1):
+        assert grid["total_return"][row] == pytest.approx(plain.total_return)
+        assert grid["total_trades"][row] == plain.total_trades
+    # a 2-bar limit splits trades up; the cooldown then skips the re-entries
+    assert grid["total_trades"][2] > plain.total_trades
+    assert grid["total_trades"][3] < grid["total_trades"][2]
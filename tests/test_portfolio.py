@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategy_engine import PerformanceMetrics, _equal_risk_weights, allocate_pairs, build_portfolio
+
+
+def _risk_shares(cov: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    contributions = weights * (cov @ weights)
+    return contributions / contributions.sum()
+
+
+@pytest.mark.parametrize(
+    "cov",
+    [
+        np.diag([0.04, 0.01, 0.09]),
+        # negatively correlated pairs: the case the old fixed-point loop gave up on
+        np.array([[1.0, -0.6, 0.3], [-0.6, 2.0, -0.5], [0.3, -0.5, 0.5]]) * 0.04,
+        np.array([[0.02, -0.018], [-0.018, 0.03]]),
+    ],
+)
+def test_equal_risk_contributions(cov):
+    weights = _equal_risk_weights(cov)
+    n = cov.shape[0]
+    assert np.all(weights > 0)
+    assert weights.sum() == pytest.approx(1.0)
+    np.testing.assert_allclose(_risk_shares(cov, weights), np.full(n, 1.0 / n), atol=1e-8)
+
+
+def test_equal_risk_random_covariances():
+    rng = np.random.default_rng(7)
+    for n in (4, 8, 20):
+        for _ in range(25):
+            factors = rng.normal(size=(n, n))
+            cov = (factors @ factors.T + 0.01 * np.eye(n)) * 0.01
+            weights = _equal_risk_weights(cov)
+            np.testing.assert_allclose(_risk_shares(cov, weights), np.full(n, 1.0 / n), atol=1e-7)
+
+
+def _performance(returns: pd.Series) -> PerformanceMetrics:
+    return PerformanceMetrics(
+        initial_capital=1.0, final_value=1.0, total_return=0.0, annualized_return=0.0,
+        annualized_volatility=0.0, sharpe_ratio=0.0, max_drawdown=0.0, total_trades=1,
+        daily_returns=returns,
+    )
+
+
+def test_build_portfolio_equal_risk_with_hedging_pairs():
+    rng = np.random.default_rng(3)
+    dates = pd.bdate_range("2020-01-01", periods=750)
+    common = rng.normal(0, 0.01, len(dates))
+    series = {
+        "A/B": common + rng.normal(0, 0.004, len(dates)),
+        "C/D": -0.8 * common + rng.normal(0, 0.006, len(dates)),
+        "E/F": rng.normal(0, 0.02, len(dates)),
+    }
+    performances = {label: _performance(pd.Series(values, index=dates)) for label, values in series.items()}
+
+    portfolio = build_portfolio(performances, method="equal_risk")
+    np.testing.assert_allclose(portfolio.risk_contributions.to_numpy(), 1.0 / 3, atol=1e-8)
+    assert allocate_pairs(portfolio.pair_returns).sum() == pytest.approx(1.0)
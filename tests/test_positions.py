@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategy_engine import Direction, parse_direction, size_positions
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (Direction.SHORT_A_LONG_B, Direction.SHORT_A_LONG_B),
+        ("LONG_A_SHORT_B", Direction.LONG_A_SHORT_B),     # what /plan returns
+        ("short_a_long_b", Direction.SHORT_A_LONG_B),
+        ("long_A_short_B", Direction.LONG_A_SHORT_B),     # engine signal codes
+        ("momentum_buy_B_sell_A", Direction.SHORT_A_LONG_B),
+        ("no_trade", Direction.FLAT),
+        (1, Direction.LONG_A_SHORT_B),
+        (np.int64(-1), Direction.SHORT_A_LONG_B),
+        (0.0, Direction.FLAT),
+        ("-1", Direction.SHORT_A_LONG_B),
+    ],
+)
+def test_parse_direction(value, expected):
+    assert parse_direction(value) is expected
+
+
+@pytest.mark.parametrize("value", ["LONG", "buy", "", None, 2, 0.5, True, float("nan")])
+def test_parse_direction_rejects_unknown_values(value):
+    with pytest.raises(ValueError):
+        parse_direction(value)
+
+
+def _orders(direction, **extra) -> pd.DataFrame:
+    # notional 1000 at hedge 1.5 splits 400 long / 600 short
+    return pd.DataFrame({
+        "ticker_a": ["AAA"], "ticker_b": ["BBB"], "price_a": [30.0], "price_b": [7.0],
+        "hedge_ratio": [1.5], "direction": [direction], "notional": [1000.0], **extra,
+    })
+
+
+def test_share_rounding():
+    row = size_positions(_orders("LONG_A_SHORT_B")).iloc[0]
+    assert (row["long_ticker"], row["short_ticker"]) == ("AAA", "BBB")
+    assert (row["long_shares"], row["short_shares"]) == (13, 85)            # 400/30, 600/7 floored
+    assert (row["long_amount"], row["short_amount"]) == (390.0, 595.0)
+
+    row = size_positions(_orders(-1), lot_size=10).iloc[0]
+    assert (row["long_ticker"], row["short_ticker"]) == ("BBB", "AAA")
+    assert (row["long_shares"], row["short_shares"]) == (50, 20)            # 400/7, 600/30 in lots of 10
+    assert (row["long_amount"], row["short_amount"]) == (350.0, 600.0)
+
+    row = size_positions(_orders(1, lot_size=[5]), lot_size=None).iloc[0]  # the column wins
+    assert (row["long_shares"], row["short_shares"]) == (10, 85)
+
+    row = size_positions(_orders(1), lot_size=None).iloc[0]
+    assert (row["long_shares"], row["short_shares"]) == (13.33, 85.71)
+    assert (row["long_amount"], row["short_amount"]) == (400.0, 600.0)
+
+
+def test_object_column_of_codes_and_names():
+    orders = pd.concat([_orders(1), _orders("SHORT_A_LONG_B"), _orders("FLAT")], ignore_index=True)
+    orders["direction"] = orders["direction"].astype(object)
+    sized = size_positions(orders)
+    assert sized["direction"].tolist() == [1, -1, 0]
+    assert sized["long_shares"].tolist() == [13, 57, 0]
+
+    with pytest.raises(ValueError):
+        size_positions(_orders("sideways"))
+    with pytest.raises(ValueError):
+        size_positions(_orders(2))
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import strategy_engine as se
+
+# documented float32 bounds (see set_precision): ~1e-5 relative on metrics
+METRIC_RTOL = 1e-5
+METRIC_ATOL = 1e-6
+COSTS = se.CostModel(commission_bps=2.0, slippage_bps=1.0, borrow_bps_annual=50.0)
+
+
+@pytest.fixture(autouse=True)
+def _restore_precision():
+    se.set_precision("float64")
+    try:
+        yield
+    finally:
+        se.set_precision("float64")
+
+
+@pytest.fixture
+def prices(synthetic_prices) -> pd.DataFrame:
+    return synthetic_prices(groups=3, per_group=3, days=1500, seed=11, start="2016-01-04")
+
+
+def _pair(prices: pd.DataFrame):
+    frame = prices[["G0M0", "G0M1"]].set_axis(["A", "B"], axis=1)
+    beta = se.estimate_hedge_ratio(frame["A"], frame["B"])
+    spread = frame["A"] - beta * frame["B"]
+    zscores = (spread - spread.mean()) / spread.std()
+    return frame, beta, zscores
+
+
+def _assert_metrics_close(left, right, columns):
+    for column in columns:
+        np.testing.assert_allclose(
+            np.asarray(left[column], dtype=float),
+            np.asarray(right[column], dtype=float),
+            rtol=METRIC_RTOL, atol=METRIC_ATOL, err_msg=column,
+        )
+
+
+def test_signals_identical(prices):
+    _, _, zscores = _pair(prices)
+    entries = np.repeat(np.linspace(1.0, 3.0, 9), 5)
+    exits = np.tile(np.linspace(0.0, 0.8, 5), 9)
+    z64 = zscores.to_numpy(dtype=np.float64)
+    positions64, trades64 = se._position_paths(z64, entries, exits)
+    positions32, trades32 = se._position_paths(z64.astype(np.float32), entries, exits)
+    np.testing.assert_array_equal(positions32, positions64)
+    np.testing.assert_array_equal(trades32, trades64)
+
+
+def test_backtest_grid_matches_float64(prices):
+    frame, beta, zscores = _pair(prices)
+    entries, exits = np.linspace(1.0, 3.0, 9), np.linspace(0.0, 0.9, 6)
+    grid64 = se.run_backtest_grid(frame, beta, zscores, entries, exits, cost_model=COSTS)
+    se.set_precision("float32")
+    grid32 = se.run_backtest_grid(frame, beta, zscores, entries, exits, cost_model=COSTS)
+
+    np.testing.assert_array_equal(grid32["total_trades"], grid64["total_trades"])
+    _assert_metrics_close(
+        grid32, grid64,
+        ["total_return", "annualized_return", "annualized_volatility", "sharpe_ratio", "max_drawdown", "cost_drag"],
+    )
+
+
+def test_single_backtest_matches_float64(prices):
+    frame, beta, zscores = _pair(prices)
+    rules = se.ExitRules(stop_z=3.5, max_holding_days=40, cooldown_days=3)
+    perf64 = se.run_pairs_trading_backtest(frame, beta, zscores, 2.0, 0.5, cost_model=COSTS, exit_rules=rules)
+    se.set_precision("float32")
+    perf32 = se.run_pairs_trading_backtest(frame, beta, zscores, 2.0, 0.5, cost_model=COSTS, exit_rules=rules)
+
+    assert perf32.daily_returns.dtype == np.float32
+    assert perf32.total_trades == perf64.total_trades
+    # same bars in the market
+    np.testing.assert_array_equal(perf32.daily_returns.to_numpy() != 0, perf64.daily_returns.to_numpy() != 0)
+    fields = ["total_return", "annualized_return", "annualized_volatility", "sharpe_ratio", "max_drawdown"]
+    _assert_metrics_close(vars(perf32), vars(perf64), fields)
+    assert perf32.total_costs == pytest.approx(perf64.total_costs, rel=1e-4)
+
+
+def test_scan_pairs_matches_float64(prices):
+    scan64 = se.scan_pairs(prices, top_k=3, cost_model=COSTS)
+    scan32 = se.scan_pairs(prices, top_k=3, cost_model=COSTS, precision="float32")
+
+    key = ["ticker_a", "ticker_b"]
+    merged = scan64.merge(scan32, on=key, suffixes=("_64", "_32"))
+    assert len(merged) == len(scan64) == len(scan32)
+    np.testing.assert_array_equal(merged["pair_ok_32"], merged["pair_ok_64"])
+    for column in ["hedge_ratio", "half_life", "hurst", "variance_ratio", "coint_pvalue", "sharpe_ratio", "total_return"]:
+        np.testing.assert_allclose(
+            merged[f"{column}_32"], merged[f"{column}_64"], rtol=METRIC_RTOL, atol=METRIC_ATOL, err_msg=column
+        )
+
+
+def test_unknown_precision_rejected():
+    with pytest.raises(ValueError):
+        se.set_precision("float16")
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+import price_data as pdm
+
+
+def _frame(level: float) -> pd.DataFrame:
+    dates = pd.bdate_range("2024-01-01", periods=4)
+    return pd.DataFrame({"ko": np.full(4, level), "pep": np.full(4, level + 1)}, index=dates)
+
+
+def _generations(root) -> set[str]:
+    return {file.name.split(".")[1] for file in root.glob("adj_close.*.f64")}
+
+
+def test_previous_generation_survives_one_write(tmp_path):
+    first = pdm.PriceArchive.write(tmp_path, {"adj_close": _frame(1.0)})
+    second = pdm.PriceArchive.write(tmp_path, {"adj_close": _frame(2.0)})
+    assert _generations(tmp_path) == {first.version, second.version}
+    # a reader holding the old meta.json can still open its files
+    assert (tmp_path / f"dates.{first.version}.npy").exists()
+
+    third = pdm.PriceArchive.write(tmp_path, {"adj_close": _frame(3.0)})
+    assert _generations(tmp_path) == {second.version, third.version}
+    assert first.column("KO")[0] == 1.0          # open mappings keep their data
+
+
+def test_open_archive_follows_new_generations(tmp_path):
+    pdm.PriceArchive.write(tmp_path, {"adj_close": _frame(1.0)})
+    handle = pdm.open_archive(tmp_path)
+    assert pdm.open_archive(tmp_path) is handle
+    assert not handle.stale()
+
+    written = pdm.PriceArchive.write(tmp_path, {"adj_close": _frame(2.0)})
+    assert handle.stale()
+    reopened = pdm.open_archive(tmp_path)
+    assert reopened is not handle and reopened.version == written.version
+    assert reopened.column("KO")[0] == 2.0
+    assert pdm.open_archive(tmp_path) is reopened
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+from yfinance.exceptions import YFPricesMissingError
+
+import price_data as pdm
+import shared_cache
+
+
+class _FakeTicker:
+    calls = 0
+    mode = "down"
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+
+    def history(self, **kwargs):
+        _FakeTicker.calls += 1
+        if _FakeTicker.mode == "down":
+            raise ConnectionError("provider down")
+        if _FakeTicker.mode == "missing":
+            raise YFPricesMissingError(self.ticker, "")
+        index = pd.date_range("2024-01-02", periods=3, tz="America/New_York")
+        return pd.DataFrame({"Adj Close": [1.0, 2.0, 3.0]}, index=index)
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    _FakeTicker.calls, _FakeTicker.mode = 0, "down"
+    monkeypatch.setattr(pdm.yf, "Ticker", _FakeTicker)
+    monkeypatch.setattr(pdm, "DOWNLOAD_POLICY", pdm.DownloadPolicy(max_attempts=3, backoff_seconds=0.0))
+    monkeypatch.setattr(pdm, "BREAKER", pdm.CircuitBreaker(threshold=4, cooldown_seconds=60.0))
+    monkeypatch.setattr(pdm.PRICE_CACHE, "enabled", False)
+    monkeypatch.setattr(shared_cache, "SHARED_CACHE", None)
+    monkeypatch.setattr(pdm, "_PRICE_SOURCE", None)
+    return _FakeTicker
+
+
+def test_transient_errors_are_retried_then_open_the_breaker(provider):
+    with pytest.raises(pdm.PriceDownloadError) as err:
+        pdm.download_prices("KO", "2024-01-01", "2024-02-01")
+    assert err.value.retryable and err.value.attempts == 3 and provider.calls == 3
+    assert not pdm.BREAKER.is_open
+
+    # the fourth consecutive failure opens it; the rest of that call fails fast
+    with pytest.raises(pdm.PriceDownloadError) as err:
+        pdm.download_prices("PEP", "2024-01-01", "2024-02-01")
+    assert provider.calls == 4 and err.value.attempts == 1
+    assert pdm.BREAKER.is_open and "circuit open" in str(err.value)
+
+    # after the cooldown one trial call goes through and closes it again
+    provider.mode = "up"
+    pdm.BREAKER._opened_at -= 60.0
+    prices = pdm.download_prices("KO", "2024-01-01", "2024-02-01")
+    assert prices.tolist() == [1.0, 2.0, 3.0] and prices.index.tz is None
+    assert provider.calls == 5 and not pdm.BREAKER.is_open
+
+
+def test_missing_tickers_fail_once_and_leave_the_breaker_closed(provider):
+    provider.mode = "missing"
+    for _ in range(5):
+        with pytest.raises(pdm.PriceDownloadError) as err:
+            pdm.download_prices("ZZZZ", "2024-01-01", "2024-02-01")
+        assert not err.value.retryable and err.value.attempts == 1
+    assert provider.calls == 5 and not pdm.BREAKER.is_open
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+import strategy_engine as se
+
+
+def test_warmup_bars_are_not_traded(pair_prices):
+    # the noise turns near unit-root mid-sample
+    a, b = pair_prices(late_phi=0.999)
+    result = se.analyze_pair_prices(a, b, "A", "B", regime_window=252, p_threshold=0.05)
+    warmup = result.rolling_pvalue.isna().to_numpy()
+    assert warmup.sum() == 251
+    assert not result.tradable[warmup].any()
+    full = ~warmup
+    np.testing.assert_array_equal(result.tradable[full], result.rolling_pvalue.to_numpy()[full] < 0.05)
+
+
+def test_in_sample_paths_use_the_mask(pair_prices):
+    a, b = pair_prices(late_phi=0.999)
+    frame = pd.concat([a, b], axis=1).set_axis(["A", "B"], axis=1)
+    beta = se.estimate_hedge_ratio(frame["A"], frame["B"])
+    spread = frame["A"] - beta * frame["B"]
+    zscores = (spread - spread.mean()) / spread.std(ddof=1)
+    closed = np.zeros(len(frame), dtype=bool)
+
+    single = se.run_pairs_trading_backtest(frame, beta, zscores, 1.0, 0.2, tradable=closed)
+    grid = se.run_backtest_grid(frame, beta, zscores, [1.0, 2.0], [0.0, 0.5], tradable=closed)
+    surface = se.backtest_surface(
+        frame.to_numpy(), beta, zscores.to_numpy(), np.array([1.0, 2.0]), np.array([0.0, 0.5]),
+        tradable=closed,
+    )
+    assert single.total_trades == 0
+    assert (grid["total_trades"] == 0).all()
+    assert np.allclose(surface["max_drawdown"][~np.isnan(surface["max_drawdown"])], 0.0)
+
+
+def test_walk_forward_regime_mask_uses_no_later_data(pair_prices):
+    a, b = pair_prices(late_phi=0.999)
+    frame = pd.concat([a, b], axis=1).set_axis(["A", "B"], axis=1)
+    kwargs = dict(train_size=252, test_size=63, entry_z=1.0, exit_z=0.2, max_workers=1, regime_window=126)
+    base = se.walk_forward_backtest(frame, **kwargs)
+    assert base.performance.total_trades > 0
+
+    # rewrite everything after the second test fold
+    cutoff = 252 + 2 * 63
+    changed = frame.copy()
+    changed.iloc[cutoff:, 0] = changed.iloc[cutoff:, 0] * np.linspace(1.0, 3.0, len(frame) - cutoff)
+    other = se.walk_forward_backtest(changed, **kwargs)
+
+    for fold in range(2):
+        pd.testing.assert_series_equal(
+            base.folds[fold].performance.daily_returns, other.folds[fold].performance.daily_returns
+        )
+    assert not base.folds[3].performance.daily_returns.equals(other.folds[3].performance.daily_returns)
+
+    # the regime filter does change the folds, and inline and pooled runs agree
+    unfiltered = se.walk_forward_backtest(frame, **{**kwargs, "regime_window": None})
+    assert unfiltered.performance.total_return != base.performance.total_return
+    pooled = se.walk_forward_backtest(frame, **{**kwargs, "max_workers": 2})
+    assert pooled.performance.total_return == base.performance.total_return
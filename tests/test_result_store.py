@@ -0,0 +1,85 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import strategy_engine as se
+from result_store import ResultStore
+
+PARAMS = {"p_threshold": 0.05, "cost_model": se.CostModel(commission_bps=2.0, borrow_bps_annual=50.0)}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(tmp_path / "results.db")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def result(pair_prices) -> se.PairResult:
+    a, b = pair_prices(days=600, seed=3, hedge=1.2, phi=0.9, noise=0.4)
+    return se.analyze_pair_prices(a, b, "AAA", "BBB", **PARAMS)
+
+
+def test_round_trip_loads_without_recomputing(store, result, monkeypatch):
+    share_id = store.save(result, "AAA", "BBB", "2019-01-01", "2021-04-20", PARAMS)
+    assert len(share_id) >= 16 and not share_id.isdigit()
+
+    def _no_recompute(*args, **kwargs):
+        raise AssertionError("stored results are loaded, not recomputed")
+
+    monkeypatch.setattr(se, "analyze_pair_prices", _no_recompute)
+    loaded = store.get(share_id)
+    assert loaded.signal == result.signal and loaded.explanation == result.explanation
+    assert loaded.coint_pvalue == result.coint_pvalue
+    assert loaded.performance.sharpe_ratio == result.performance.sharpe_ratio
+    assert loaded.performance.intervals == result.performance.intervals
+    pd.testing.assert_frame_equal(loaded.prices, result.prices, check_freq=False)
+    pd.testing.assert_series_equal(loaded.performance.equity_curve, result.performance.equity_curve, check_freq=False)
+    pd.testing.assert_series_equal(loaded.spread_zscores, result.spread_zscores, check_freq=False)
+    np.testing.assert_array_equal(loaded.tradable, result.tradable)
+    assert loaded.preset_performance.keys() == result.preset_performance.keys()
+    assert len(loaded.walk_forward.folds) == len(result.walk_forward.folds)
+    fold, original = loaded.walk_forward.folds[-1], result.walk_forward.folds[-1]
+    assert (fold.test_start, fold.hedge_ratio) == (original.test_start, original.hedge_ratio)
+
+    found_id, found = store.find("aaa", "bbb", "2019-01-01", "2021-04-20", params=PARAMS)
+    assert found_id == share_id
+    assert found.performance.total_return == result.performance.total_return
+    assert store.find("AAA", "BBB", "2019-01-01", "2021-04-20", params={"p_threshold": 0.01}) is None
+    assert store.get("1") is None
+
+
+def test_other_engine_versions_are_shared_but_not_reused(store, result, monkeypatch):
+    share_id = store.save(result, "AAA", "BBB", "2019-01-01", "2021-04-20", PARAMS)
+    monkeypatch.setattr("result_store.ENGINE_VERSION", se.ENGINE_VERSION + 1)
+    assert store.find("AAA", "BBB", "2019-01-01", "2021-04-20", params=PARAMS) is None
+    assert store.get(share_id) is not None
+
+
+def test_purge_caps_rows_and_age(tmp_path, result):
+    store = ResultStore(tmp_path / "results.db", max_rows=3)
+    ids = [store.save(result, "AAA", "BBB", "2019-01-01", f"2021-0{i + 1}-01", PARAMS) for i in range(5)]
+    assert store.get(ids[0]) is None and store.get(ids[1]) is None
+    assert len(store.query(limit=10)) == 1                  # latest per pair
+    assert store._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0] == 3
+
+    store.max_age_days = 1.0
+    store._conn.execute("UPDATE analyses SET created_at = created_at - 2 * 86400")
+    store.purge()
+    assert store._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0] == 0
+    store.close()
+
+
+@pytest.mark.parametrize("column", ["payload", "prices"])
+def test_older_layouts_are_replaced(tmp_path, result, column):
+    path = tmp_path / "results.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute(f"CREATE TABLE analyses (id INTEGER PRIMARY KEY, {column} BLOB NOT NULL)")
+        conn.execute(f"INSERT INTO analyses ({column}) VALUES (x'00')")
+    store = ResultStore(path)
+    share_id = store.save(result, "AAA", "BBB", "2019-01-01", "2021-04-20", PARAMS)
+    assert store.get(share_id) is not None
+    store.close()
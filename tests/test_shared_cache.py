@@ -0,0 +1,98 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import pytest
+
+import shared_cache
+import strategy_engine as se
+from shared_cache import SharedCache, cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SharedCache(tmp_path / "shared.db", max_bytes=10_000)
+
+
+def _sizes(cache) -> int:
+    return cache._connect().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+
+def test_running_total_follows_inserts_replaces_and_deletes(cache):
+    cache.set("a", b"x" * 100)
+    cache.set("b", list(range(50)))
+    cache.set("a", b"y" * 300)              # replace changes the size
+    assert cache.total_bytes() == _sizes(cache) > 0
+    cache.delete("b")
+    assert cache.total_bytes() == _sizes(cache)
+    cache.set("c", "short", ttl_seconds=-1)  # already expired, dropped by the next set
+    cache.set("d", "other")
+    assert cache.get("c") is None
+    assert cache.total_bytes() == _sizes(cache)
+    cache.clear()
+    assert cache.total_bytes() == 0
+
+
+def test_evicts_least_recently_read_only_over_the_cap(cache):
+    payload = os.urandom(3000)                # incompressible, ~3 KB per entry
+    for key in ("a", "b", "c"):
+        cache.set(key, payload)
+    assert len(cache) == 3
+    cache.touch_seconds = 0.0
+    cache.get("a")                            # a is now newer than b
+    cache.set("d", payload)
+    assert cache.total_bytes() <= cache.max_bytes
+    assert cache.get("b") is None
+    assert cache.get("a") == payload and cache.get("d") == payload
+
+
+def test_hits_write_access_time_only_when_stale(cache):
+    cache.set("a", 1)
+    stamp = lambda: cache._connect().execute("SELECT accessed_at FROM entries").fetchone()[0]
+    before = stamp()
+    assert cache.get("a") == 1
+    assert stamp() == before
+    cache.touch_seconds = 0.0
+    cache.get("a")
+    assert stamp() > before
+
+
+def test_total_is_seeded_from_an_existing_table(tmp_path):
+    path = tmp_path / "shared.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE entries (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL, size INTEGER NOT NULL, payload BLOB NOT NULL)"
+        )
+        conn.execute("INSERT INTO entries VALUES ('old', 1e12, 0, 1234, x'00')")
+    assert SharedCache(path).total_bytes() == 1234
+
+
+def test_unreadable_and_unpicklable_values_are_misses(cache):
+    # a payload pickled by code that no longer exists
+    payload = zlib.compress(b"cgone_module\nThing\n.")
+    with cache._connect() as conn:
+        conn.execute(
+            "INSERT INTO entries VALUES ('stale', ?, ?, ?, ?)", (time.time() + 60, time.time(), len(payload), payload)
+        )
+    assert cache.get("stale", "miss") == "miss"
+    assert cache.set("lock", threading.Lock()) is False
+    assert cache.get("lock") is None
+
+
+def test_keys_follow_engine_version_and_precision(monkeypatch):
+    monkeypatch.setattr(shared_cache, "_KEY_CONTEXT", dict(shared_cache._KEY_CONTEXT))
+    key = cache_key("analyze_pair", "KO", "PEP")
+    assert json.loads(key)[2] == {"engine_version": se.ENGINE_VERSION, "precision": "float64"}
+    se.set_precision("float32")
+    try:
+        assert cache_key("analyze_pair", "KO", "PEP") != key
+    finally:
+        se.set_precision("float64")
+    assert cache_key("analyze_pair", "KO", "PEP") == key
+    monkeypatch.setattr(se, "ENGINE_VERSION", se.ENGINE_VERSION + 1)
+    shared_cache.set_key_context(engine_version=se.ENGINE_VERSION)
+    assert cache_key("analyze_pair", "KO", "PEP") != key
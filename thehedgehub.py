@@ -1,18 +1,170 @@
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs
+import asyncio
+import multiprocessing
+import os
+import time
+
 from shiny import App, ui, render, reactive
 from shinywidgets import output_widget, render_widget
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 
 from strategy_engine import (
+    CostModel,
+    DEFAULT_APP_COST_MODEL,
+    DEFAULT_APP_P_THRESHOLD,
     analyze_pair,
     analyze_pair_momentum,
+    backtest_surface,
+    build_portfolio,
     generate_strategy_plan,
+    preset_performance,
+    projection_bands,
+    simulate_growth_paths,
     StrategyPlan,
     compute_positions,
 )
+from async_engine import AsyncEngine
+from result_store import ResultStore
+from warmup import start_warmup_from_env
 
 NAVBAR_ID = "main_nav"
 
+# analyses are persisted (metrics, params and the computed result) so reloads
+# and shared links skip the download and the recompute; old rows are purged
+RESULT_STORE = ResultStore()
+_RESULT_MAX_AGE_SECONDS = 6 * 3600
+
+# watchlist pairs are precomputed in the background while sessions are served
+WARMUP = start_warmup_from_env(store=RESULT_STORE)
+
+# Monte Carlo balance projection on the Strategy panel
+_PROJECTION_HORIZON_DAYS = 63
+_PROJECTION_PATHS = 5000
+_PROJECTION_MIN_HISTORY = 20
+
+# pause after the last keystroke before numeric inputs propagate
+_INPUT_DEBOUNCE_SECONDS = 0.5
+
+# shared by all sessions (sensitivity grids and portfolio analyses); sensitivity
+# grids are split into one task per entry_z row, and a session keeps at most
+# this many rows queued so one heatmap cannot starve the others
+_SENSITIVITY_POOL: ProcessPoolExecutor | None = None
+_SENSITIVITY_ROWS_PER_SESSION = 4
+
+
+def _sensitivity_pool() -> ProcessPoolExecutor:
+    global _SENSITIVITY_POOL
+    if _SENSITIVITY_POOL is None:
+        # spawn: forking the threaded server process can deadlock the children
+        _SENSITIVITY_POOL = ProcessPoolExecutor(
+            max_workers=max(1, (os.cpu_count() or 2) - 1),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _SENSITIVITY_POOL
+
+
+def _submit_sensitivity_rows(job: dict) -> None:
+    # top the session's queue back up to _SENSITIVITY_ROWS_PER_SESSION rows
+    pool = _sensitivity_pool()
+    while job["rows"] and len(job["pending"]) < _SENSITIVITY_ROWS_PER_SESSION:
+        row = job["rows"].pop(0)
+        future = pool.submit(
+            backtest_surface,
+            job["prices"],
+            job["hedge_ratio"],
+            job["zscores"],
+            job["entry"][row:row + 1],
+            job["exit"],
+            0.5,
+            job["cost_model"],
+            job["tradable"],
+        )
+        job["pending"][future] = row
+
+
+async def _analyze_portfolio(pairs, start, end, params, risk, **portfolio_kwargs):
+    """
+    Portfolio tab job, run as a session ExtendedTask: stored results where
+    recent enough, the remaining pairs downloaded and analyzed concurrently
+    (analysis in the shared process pool), so the event loop stays free.
+    Returns (PortfolioResult, failed pair labels).
+    """
+    hits = await asyncio.gather(*(
+        asyncio.to_thread(RESULT_STORE.lookup, a, b, start, end, "pairs_trading", params, _RESULT_MAX_AGE_SECONDS)
+        for a, b in pairs
+    ))
+    missing = [pair for pair, hit in zip(pairs, hits) if hit is None]
+    computed = {}
+    if missing:
+        engine = AsyncEngine(executor=_sensitivity_pool())
+        computed = await engine.analyze_many(missing, start, end, **params)
+
+    performances = {}
+    failed = []
+    for (ticker_a, ticker_b), hit in zip(pairs, hits):
+        label = f"{ticker_a}/{ticker_b}"
+        if hit is not None:
+            result = hit[1]
+        else:
+            result = computed[(ticker_a, ticker_b)]
+            if isinstance(result, BaseException):
+                failed.append(f"{label} ({result})")
+                continue
+            await asyncio.to_thread(RESULT_STORE.record, result, ticker_a, ticker_b, start, end, params)
+        performances[label] = preset_performance(result, risk) or result.performance
+
+    portfolio = await asyncio.to_thread(build_portfolio, performances, **portfolio_kwargs)
+    return portfolio, failed
+
+
+def _parse_pairs(text: str | None) -> list[tuple[str, str]]:
+    """'KO/PEP, XOM/CVX' -> [("KO", "PEP"), ("XOM", "CVX")]; malformed entries are skipped."""
+    pairs = []
+    for chunk in (text or "").replace(";", ",").replace("\n", ",").split(","):
+        legs = [leg.strip().upper() for leg in chunk.split("/")]
+        if len(legs) == 2 and all(legs) and (legs[0], legs[1]) not in pairs:
+            pairs.append((legs[0], legs[1]))
+    return pairs
+
+
+def _debounce(read, seconds: float = _INPUT_DEBOUNCE_SECONDS):
+    """
+    Reactive reader that follows ``read()`` only once it has stopped changing
+    for ``seconds``; the first value passes straight through. Call inside
+    the server function.
+    """
+    unset = object()
+    latest = reactive.Value(unset)
+    settled = reactive.Value(unset)
+    deadline = [0.0]
+
+    @reactive.effect
+    def _capture():
+        value = read()
+        with reactive.isolate():
+            first = settled.get() is unset
+        if first:
+            settled.set(value)
+        deadline[0] = time.monotonic() + seconds
+        latest.set(value)
+
+    @reactive.effect
+    def _release():
+        value = latest.get()
+        if value is unset:
+            return
+        remaining = deadline[0] - time.monotonic()
+        if remaining > 0:
+            reactive.invalidate_later(remaining)
+            return
+        settled.set(value)
+
+    return settled.get
+
 
 def format_currency(value: float) -> str:
     return f"${value:,.2f}"
@@ -171,7 +323,7 @@ def make_pair_panel() -> ui.nav_panel:
                     ui.input_text("stock_a", "Stock A (e.g., AAPL)", ""),
                     ui.input_text("stock_b", "Stock B (e.g., MSFT)", ""),
                     ui.input_date_range("date_range", "Date Range"),
-                    ui.input_numeric("threshhold_p", "Threshhold P", 0.05),
+                    ui.input_numeric("threshhold_p", "Threshhold P", DEFAULT_APP_P_THRESHOLD),
                     ui.input_numeric(
                         "initial_capital",
                         "Initial Capital ($)",
@@ -186,6 +338,20 @@ def make_pair_panel() -> ui.nav_panel:
                         min=1,
                         step=10,
                     ),
+                    ui.input_numeric(
+                        "trading_cost_bps",
+                        "Trading Cost (bps per side)",
+                        DEFAULT_APP_COST_MODEL.commission_bps,
+                        min=0,
+                        step=0.5,
+                    ),
+                    ui.input_numeric(
+                        "borrow_fee_bps",
+                        "Short Borrow Fee (bps / year)",
+                        DEFAULT_APP_COST_MODEL.borrow_bps_annual,
+                        min=0,
+                        step=5,
+                    ),
                     ui.input_action_button(
                         "run_analysis",
                         "Run Pair Test",
@@ -231,7 +397,41 @@ def make_pair_panel() -> ui.nav_panel:
                             ),
                             output_widget("zscore_chart"),
                         ),
+                        ui.card(
+                            ui.h5(
+                                "Cointegration Stability (Rolling ADF p-value)",
+                                style="color:#00E6A8;",
+                            ),
+                            output_widget("rolling_adf_chart"),
+                        ),
+                    ),
+                    ui.hr(),
+                    ui.h4("Parameter Sensitivity", style="color:#00E6A8;"),
+                    ui.p(
+                        "Backtest the current pair over an entry Z × exit Z grid. "
+                        "Rows of the heatmap fill in as background workers finish.",
+                        style="color:#CCCCCC;",
+                    ),
+                    ui.input_numeric(
+                        "sensitivity_steps",
+                        "Grid Steps per Axis",
+                        50,
+                        min=5,
+                        max=100,
+                        step=5,
+                    ),
+                    ui.input_select(
+                        "sensitivity_metric",
+                        "Metric",
+                        {"sharpe_ratio": "Sharpe Ratio", "max_drawdown": "Max Drawdown"},
+                    ),
+                    ui.input_action_button(
+                        "run_sensitivity",
+                        "Run Sensitivity",
+                        class_="btn btn-outline-success",
                     ),
+                    ui.output_text("sensitivity_status"),
+                    output_widget("sensitivity_heatmap"),
                 ),
             )
         ),
@@ -348,6 +548,46 @@ def make_strategy_panel() -> ui.nav_panel:
                         style="white-space:pre-line; color:#CCCCCC; margin-bottom:12px;",
                     ),
                     output_widget("strategy_chart"),
+                    ui.hr(),
+                    # -------------------------------------
+                    # Section 4 — Portfolio of pairs
+                    # -------------------------------------
+                    ui.h4("🧺 4. Portfolio of Pairs", style="color:#00E6A8; margin-top:5px;"),
+                    ui.p(
+                        "Combine several pair strategies into one book. Capital is split across pairs from the "
+                        "covariance of their backtested returns, using the date range and costs from Pair Analysis "
+                        "and the risk level above.",
+                        style="color:#CCCCCC; margin-bottom:12px;",
+                    ),
+                    ui.input_text(
+                        "portfolio_pairs",
+                        "Pairs (e.g., KO/PEP, XOM/CVX, V/MA)",
+                        "",
+                    ),
+                    ui.input_select(
+                        "portfolio_method",
+                        "Allocation",
+                        {"equal_risk": "Equal risk contribution", "vol_target": "Volatility target"},
+                    ),
+                    ui.input_numeric(
+                        "portfolio_target_vol",
+                        "Target volatility (% per year, volatility target only)",
+                        10,
+                        min=1,
+                        max=50,
+                        step=1,
+                    ),
+                    ui.input_action_button(
+                        "build_portfolio",
+                        "Build Portfolio",
+                        class_="btn btn-success",
+                        style="margin-top:6px; margin-bottom:12px;",
+                    ),
+                    ui.div(
+                        ui.output_text_verbatim("portfolio_output"),
+                        style="white-space:pre-line; color:#CCCCCC; margin-bottom:12px;",
+                    ),
+                    output_widget("portfolio_chart"),
                 ),
             )
         ),
@@ -487,6 +727,34 @@ def server(input, output, session):
         "Enter stock tickers and a date range, then click Run Pair Test."
     )
     strategy_plan = reactive.Value(None)
+    sensitivity_job = reactive.Value(None)
+    sensitivity_progress = reactive.Value(0)
+    analysis_id = reactive.Value(None)
+
+    portfolio_result = reactive.Value(None)
+    portfolio_error = reactive.Value("")
+    portfolio_task = reactive.ExtendedTask(_analyze_portfolio)
+
+    def _stored_or_run(ticker_a, ticker_b, start, end, mode, params, compute):
+        stored_id, result = RESULT_STORE.load_or_analyze(
+            ticker_a, ticker_b, start, end, mode, params, compute, _RESULT_MAX_AGE_SECONDS
+        )
+        analysis_id.set(stored_id)
+        return result
+
+    def _current_cost_model() -> CostModel:
+        return CostModel(
+            commission_bps=float(input.trading_cost_bps() or 0.0),
+            borrow_bps_annual=float(input.borrow_fee_bps() or 0.0),
+        )
+
+    def _cancel_sensitivity():
+        with reactive.isolate():
+            job = sensitivity_job.get()
+        if job is not None:
+            for future in job["pending"]:
+                future.cancel()
+        sensitivity_job.set(None)
 
     def _clean_ticker_label(value: str | None, fallback: str) -> str:
         label = (value or "").strip().upper()
@@ -567,6 +835,8 @@ def server(input, output, session):
                     hedge_ratio=plan.hedge_ratio or 1.0,
                     invest_amount=plan.suggested_notional,
                     signal=plan.signal_type,
+                    direction=plan.direction,
+                    lot_size=1,
                 )
         except Exception as e:
             print("Position sizing error:", e)
@@ -627,6 +897,16 @@ def server(input, output, session):
             _info_row("Z-score", _format_z(plan.zscore_value)),
         ]
 
+        backtest = plan.performance
+        if backtest is not None:
+            snapshot_children.extend(
+                [
+                    _info_row(f"Backtest Return ({plan.risk_level})", format_percentage(backtest.total_return)),
+                    _info_row("Backtest Sharpe", f"{backtest.sharpe_ratio:.2f}"),
+                    _info_row("Backtest Max Drawdown", format_percentage(backtest.max_drawdown)),
+                ]
+            )
+
         if snapshot_note:
             snapshot_children.append(
                 ui.tags.small(
@@ -801,6 +1081,44 @@ def server(input, output, session):
             )
         )
 
+    @reactive.effect
+    @reactive.event(input.build_portfolio)
+    def _build_portfolio():
+        pairs = _parse_pairs(input.portfolio_pairs())
+        date_range = input.date_range()
+        if len(pairs) < 2:
+            portfolio_result.set(None)
+            portfolio_error.set("Enter at least two pairs, e.g. KO/PEP, XOM/CVX.")
+            return
+        if not date_range:
+            portfolio_result.set(None)
+            portfolio_error.set("Choose a date range in Pair Analysis first.")
+            return
+
+        start, end = str(date_range[0]), str(date_range[1])
+        p_threshold = float(input.threshhold_p() or DEFAULT_APP_P_THRESHOLD)
+        params = {"p_threshold": p_threshold, "cost_model": _current_cost_model()}
+        capital = float(input.investment_amount() or 0.0)
+        portfolio_result.set(None)
+        portfolio_error.set(f"Analyzing {len(pairs)} pairs...")
+        portfolio_task.invoke(
+            pairs, start, end, params, input.risk_level() or "Medium",
+            method=input.portfolio_method() or "equal_risk",
+            target_volatility=float(input.portfolio_target_vol() or 10) / 100,
+            initial_capital=capital if capital > 0 else 1.0,
+        )
+
+    @reactive.effect
+    def _portfolio_ready():
+        status = portfolio_task.status()
+        if status == "error":
+            portfolio_result.set(None)
+            portfolio_error.set(f"Error: {portfolio_task.error()}")
+        elif status == "success":
+            portfolio, failed = portfolio_task.value()
+            portfolio_result.set(portfolio)
+            portfolio_error.set("Skipped: " + "; ".join(failed) if failed else "")
+
     @reactive.effect
     @reactive.event(input.run_analysis)
     def _run_pair_analysis():
@@ -814,14 +1132,22 @@ def server(input, output, session):
             return
 
         start, end = date_range
-        p_threshold = float(input.threshhold_p() or 0.05)
+        p_threshold = float(input.threshhold_p() or DEFAULT_APP_P_THRESHOLD)
+        cost_model = _current_cost_model()
+        _cancel_sensitivity()
         try:
-            result = analyze_pair(
-                ticker_a=ticker_a,
-                ticker_b=ticker_b,
-                start=str(start),
-                end=str(end),
-                p_threshold=p_threshold, 
+            result = _stored_or_run(
+                ticker_a, ticker_b, str(start), str(end),
+                mode="pairs_trading",
+                params={"p_threshold": p_threshold, "cost_model": cost_model},
+                compute=lambda: analyze_pair(
+                    ticker_a=ticker_a,
+                    ticker_b=ticker_b,
+                    start=str(start),
+                    end=str(end),
+                    p_threshold=p_threshold, 
+                    cost_model=cost_model,
+                ),
             )
         except Exception as err:
             analysis_result.set(None)
@@ -874,11 +1200,16 @@ def server(input, output, session):
 
         start, end = date_range
         try:
-            m_result = analyze_pair_momentum(
-                ticker_a=ticker_a,
-                ticker_b=ticker_b,
-                start=str(start),
-                end=str(end),
+            m_result = _stored_or_run(
+                ticker_a, ticker_b, str(start), str(end),
+                mode="momentum",
+                params={},
+                compute=lambda: analyze_pair_momentum(
+                    ticker_a=ticker_a,
+                    ticker_b=ticker_b,
+                    start=str(start),
+                    end=str(end),
+                ),
             )
         except Exception as err:
             analysis_error.set(f"Error (momentum): {err}")
@@ -890,6 +1221,95 @@ def server(input, output, session):
             "Strategy suggestions will be based on price ratio breaks."
         )
 
+    @reactive.effect
+    def _load_shared_analysis():
+        query = parse_qs((session.clientdata.url_search() or "").lstrip("?"))
+        requested = (query.get("analysis") or [""])[0].strip()
+        if not requested:
+            return
+        try:
+            stored = RESULT_STORE.get(requested)
+        except Exception as e:
+            print("Result store error:", e)
+            stored = None
+        if stored is None:
+            analysis_error.set("The shared analysis was not found; it may have expired.")
+            return
+        analysis_id.set(requested)
+        analysis_result.set(stored)
+        analysis_error.set("")
+
+    @reactive.effect
+    @reactive.event(input.run_sensitivity)
+    def _run_sensitivity():
+        _cancel_sensitivity()
+        result = analysis_result.get()
+        if (
+            result is None
+            or result.mode != "pairs_trading"
+            or result.spread_zscores is None
+            or result.prices is None
+        ):
+            return
+
+        steps = int(min(100, max(5, input.sensitivity_steps() or 50)))
+        entry_values = np.linspace(0.5, 3.5, steps)
+        exit_values = np.linspace(0.0, 2.0, steps)
+        job = {
+            "entry": entry_values,
+            "exit": exit_values,
+            "grids": {
+                "sharpe_ratio": np.full((steps, steps), np.nan),
+                "max_drawdown": np.full((steps, steps), np.nan),
+            },
+            "prices": result.prices.to_numpy(dtype=float),
+            "zscores": result.spread_zscores.to_numpy(dtype=float),
+            "hedge_ratio": result.hedge_ratio,
+            "cost_model": _current_cost_model(),
+            "tradable": result.tradable,
+            "rows": list(range(steps)),     # not yet submitted
+            "pending": {},
+            "total": steps * steps,
+            "done": 0,
+            "regime_filter": result.tradable is not None,
+        }
+        _submit_sensitivity_rows(job)
+
+        sensitivity_progress.set(0)
+        sensitivity_job.set(job)
+
+    @reactive.effect
+    def _stream_sensitivity():
+        job = sensitivity_job.get()
+        if job is None or not job["pending"]:
+            return
+        reactive.invalidate_later(0.25)
+
+        finished = [future for future in job["pending"] if future.done()]
+        if not finished:
+            return
+        for future in finished:
+            row = job["pending"].pop(future)
+            if future.cancelled():
+                continue
+            try:
+                surface = future.result()
+            except Exception as err:
+                print("Sensitivity worker error:", err)
+                continue
+            for metric, values in surface.items():
+                job["grids"][metric][row] = values[0]
+            job["done"] += len(job["exit"])
+        _submit_sensitivity_rows(job)
+
+        # push new cells into the live widget instead of re-rendering it
+        widget = sensitivity_heatmap.widget
+        if widget is not None and widget.data:
+            with reactive.isolate():
+                metric = input.sensitivity_metric()
+            widget.data[0].z = job["grids"][metric]
+        sensitivity_progress.set(job["done"])
+
     # -------------------- RENDER FUNCTIONS --------------------
 
     @render.text
@@ -912,6 +1332,21 @@ def server(input, output, session):
                     f"\n\nSuggested result for a dollar-neutral trade: {direction}."
                 )
 
+            if result.half_life is not None:
+                half_life = (
+                    f"{result.half_life:.1f} days"
+                    if result.half_life != float("inf")
+                    else "n/a (no reversion)"
+                )
+                base_text += (
+                    f"\n\nMean reversion: half-life {half_life}, Hurst {result.hurst:.2f}, "
+                    f"variance ratio {result.variance_ratio:.2f}."
+                )
+
+            stored_id = analysis_id.get()
+            if stored_id is not None:
+                base_text += f"\n\nSaved analysis (share with ?analysis={stored_id})."
+
             return base_text
 
         if error_message:
@@ -920,13 +1355,24 @@ def server(input, output, session):
         return "Enter stock tickers and a date range, then click Run Pair Test."
 
 
-    @render.data_frame
-    def performance_metrics():
-        ticker_a = (input.stock_a() or "Stock A").upper()
-        ticker_b = (input.stock_b() or "Stock B").upper()
+    # numeric inputs settle before anything downstream re-renders
+    capital_input = _debounce(lambda: input.initial_capital())
+    shares_input = _debounce(lambda: input.shares_per_trade())
+    investment_input = _debounce(lambda: input.investment_amount())
+    ticker_a_input = _debounce(lambda: input.stock_a())
+    ticker_b_input = _debounce(lambda: input.stock_b())
+    threshold_input = _debounce(lambda: input.threshhold_p())
+
+    @reactive.calc
+    def _base_metrics():
+        """
+        Capital-independent rows of the metrics table, rebuilt only when the
+        analysis changes. Rows that depend on capital keep a multiplier that
+        performance_metrics applies.
+        """
+        ticker_a = (ticker_a_input() or "Stock A").upper()
+        ticker_b = (ticker_b_input() or "Stock B").upper()
         pair_label = f"{ticker_a}/{ticker_b}"
-        user_capital = float(input.initial_capital() or 1_000_000.0)
-        shares_per_trade = int(input.shares_per_trade() or 0)
 
         result = analysis_result.get()
         metrics = result.performance if result else None
@@ -936,66 +1382,23 @@ def server(input, output, session):
             waiting_note = (
                 analysis_error.get() or f"Waiting for trades from {pair_label}"
             )
-            data = [
-                {
-                    "Metric": "Initial Capital",
-                    "Value": format_currency(user_capital),
-                    "Notes": "Configured once analysis runs",
-                },
-                {
-                    "Metric": "Shares per Trade",
-                    "Value": f"{shares_per_trade:,}",
-                    "Notes": "User-defined size per signal",
-                },
-                {
-                    "Metric": "Final Value",
-                    "Value": format_currency(user_capital),
-                    "Notes": "Pending calculation",
-                },
-                {
-                    "Metric": "Total Return",
-                    "Value": "0.00%",
-                    "Notes": "Calculated after spread-based backtest",
-                },
-                {
-                    "Metric": "Annualized Return",
-                    "Value": "0.00%",
-                    "Notes": "Calculated after spread-based backtest",
-                },
-                {
-                    "Metric": "Annualized Volatility",
-                    "Value": "0.00%",
-                    "Notes": "Calculated after spread-based backtest",
-                },
-                {
-                    "Metric": "Sharpe Ratio",
-                    "Value": "0.00",
-                    "Notes": "Calculated after spread-based backtest",
-                },
-                {
-                    "Metric": "Max Drawdown",
-                    "Value": "0.00%",
-                    "Notes": "Calculated after spread-based backtest",
-                },
+            return [
+                {"Metric": "Initial Capital", "scale": 1.0, "Notes": "Configured once analysis runs"},
+                {"Metric": "Shares per Trade", "shares": True, "Notes": "User-defined size per signal"},
+                {"Metric": "Final Value", "scale": 1.0, "Notes": "Pending calculation"},
+                {"Metric": "Total Return", "Value": "0.00%", "Notes": "Calculated after spread-based backtest"},
+                {"Metric": "Annualized Return", "Value": "0.00%", "Notes": "Calculated after spread-based backtest"},
+                {"Metric": "Annualized Volatility", "Value": "0.00%", "Notes": "Calculated after spread-based backtest"},
+                {"Metric": "Sharpe Ratio", "Value": "0.00", "Notes": "Calculated after spread-based backtest"},
+                {"Metric": "Max Drawdown", "Value": "0.00%", "Notes": "Calculated after spread-based backtest"},
             ]
-            return pd.DataFrame(data)
-
-        scaled_final_value = user_capital * (1 + metrics.total_return)
 
-        data = [
-            {
-                "Metric": "Initial Capital",
-                "Value": format_currency(user_capital),
-                "Notes": "Starting notional used for backtest",
-            },
-            {
-                "Metric": "Shares per Trade",
-                "Value": f"{shares_per_trade:,}",
-                "Notes": "Size submitted on each entry signal",
-            },
+        rows = [
+            {"Metric": "Initial Capital", "scale": 1.0, "Notes": "Starting notional used for backtest"},
+            {"Metric": "Shares per Trade", "shares": True, "Notes": "Size submitted on each entry signal"},
             {
                 "Metric": "Final Value",
-                "Value": format_currency(scaled_final_value),
+                "scale": 1.0 + metrics.total_return,
                 "Notes": f"Strategy valuation after testing {pair_label}",
             },
             {
@@ -1023,7 +1426,79 @@ def server(input, output, session):
                 "Value": format_percentage(metrics.max_drawdown),
                 "Notes": "Worst peak-to-trough decline in equity curve",
             },
+            {
+                "Metric": "Trading Costs",
+                "scale": metrics.total_costs / metrics.initial_capital,
+                "Notes": f"Commissions and borrow over {metrics.total_trades} trades (returns are net)",
+            },
         ]
+
+        # the same mask drives the in-sample, preset, walk-forward and sensitivity backtests
+        tradable = getattr(result, "tradable", None)
+        if tradable is not None:
+            rows.append(
+                {
+                    "Metric": "Regime Filter",
+                    "Value": f"On ({tradable.mean():.0%} of days tradable)",
+                    "Notes": f"Flat while the {result.regime_window}-day ADF p-value is above the threshold",
+                }
+            )
+
+        # block-bootstrap ranges for the metrics too noisy to read on their own
+        intervals = metrics.intervals
+        if intervals is not None:
+            ranges = {
+                "Annualized Return": tuple(map(format_percentage, intervals.annualized_return)),
+                "Sharpe Ratio": tuple(f"{v:.2f}" for v in intervals.sharpe_ratio),
+                "Max Drawdown": tuple(map(format_percentage, intervals.max_drawdown)),
+            }
+            for row in rows:
+                if row["Metric"] in ranges:
+                    lo, hi = ranges[row["Metric"]]
+                    row["CI"] = f"{lo} to {hi} ({intervals.level:.0%})"
+
+        wf = result.walk_forward
+        if wf is not None and wf.folds:
+            oos = wf.performance
+            fold_note = f"{len(wf.folds)} folds, {wf.train_size}d train / {wf.test_size}d test"
+            rows.extend(
+                [
+                    {
+                        "Metric": "Out-of-Sample Return",
+                        "Value": format_percentage(oos.total_return),
+                        "Notes": f"Walk-forward, refit per fold ({fold_note})",
+                    },
+                    {
+                        "Metric": "Out-of-Sample Sharpe",
+                        "Value": f"{oos.sharpe_ratio:.2f}",
+                        "Notes": "Stitched test-fold returns only",
+                    },
+                    {
+                        "Metric": "Out-of-Sample Max Drawdown",
+                        "Value": format_percentage(oos.max_drawdown),
+                        "Notes": "Stitched test-fold equity curve",
+                    },
+                ]
+            )
+        return rows
+
+    @render.data_frame
+    def performance_metrics():
+        # only the capital-scaled cells are formatted here
+        user_capital = float(capital_input() or 1_000_000.0)
+        shares_per_trade = int(shares_input() or 0)
+
+        data = []
+        for row in _base_metrics():
+            if "scale" in row:
+                value = format_currency(row["scale"] * user_capital)
+            elif row.get("shares"):
+                value = f"{shares_per_trade:,}"
+            else:
+                value = row["Value"]
+            data.append(
+                {"Metric": row["Metric"], "Value": value, "Bootstrap CI": row.get("CI", ""), "Notes": row["Notes"]}
+            )
         return pd.DataFrame(data)
 
     def _style_figure(fig):
@@ -1105,16 +1580,84 @@ def server(input, output, session):
         fig.add_hline(y=-0.5, line_dash="dash", line_color="#888888", opacity=0.4)
         return _style_figure(fig)
 
+    @render_widget
+    def rolling_adf_chart():
+        result = analysis_result.get()
+        pvalues = getattr(result, "rolling_pvalue", None) if result else None
+
+        if pvalues is None or pvalues.dropna().empty:
+            return px.line()
+
+        pvalues = pvalues.dropna()
+        df = pd.DataFrame({"date": pd.to_datetime(pvalues.index), "pvalue": pvalues.values})
+        df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+
+        fig = px.line(df, x="date", y="pvalue", color_discrete_sequence=["#00E6A8"])
+        fig.update_traces(line_width=2)
+        threshold = float(threshold_input() or DEFAULT_APP_P_THRESHOLD)
+        fig.add_hline(y=threshold, line_dash="dot", line_color="#FFB347", opacity=0.8)
+        fig.update_layout(
+            yaxis_title=f"ADF p-value ({result.regime_window}-day window)",
+            xaxis_title="",
+        )
+        fig.update_yaxes(range=[0, 1])
+        return _style_figure(fig)
+
+    @render.text
+    def sensitivity_status():
+        done = sensitivity_progress.get()
+        job = sensitivity_job.get()
+        if job is None:
+            return "Run a pairs-trading analysis, then click Run Sensitivity."
+        note = " (regime filter on)" if job.get("regime_filter") else ""
+        if done < job["total"] and job["pending"]:
+            return f"Computing… {done:,} / {job['total']:,} cells{note}"
+        return f"Done: {done:,} cells{note}."
+
+    @render_widget
+    def sensitivity_heatmap():
+        job = sensitivity_job.get()
+        metric = input.sensitivity_metric()
+        if job is None:
+            return _style_figure(go.Figure())
+
+        label = "Sharpe" if metric == "sharpe_ratio" else "Max Drawdown"
+        fig = go.Figure(
+            go.Heatmap(
+                z=job["grids"][metric],
+                x=job["exit"],
+                y=job["entry"],
+                colorscale="Viridis",
+                colorbar={"title": label},
+                hovertemplate="entry %{y:.2f} / exit %{x:.2f}<br>" + label + " %{z:.2f}<extra></extra>",
+            )
+        )
+        fig.update_layout(xaxis_title="Exit Z", yaxis_title="Entry Z")
+        return _style_figure(fig)
+
+    @reactive.calc
+    def _preset_backtest_text() -> str:
+        # lookup only: analyze_pair already backtested every risk level
+        risk = input.risk_level() or "Medium"
+        backtest = preset_performance(analysis_result.get(), risk)
+        if backtest is None:
+            return ""
+        return (
+            f"\nBacktest at {risk} risk: return {format_percentage(backtest.total_return)}, "
+            f"Sharpe {backtest.sharpe_ratio:.2f}, max drawdown {format_percentage(backtest.max_drawdown)}, "
+            f"{backtest.total_trades} trades."
+        )
+
     @render.text
     def strategy_output():
         plan = strategy_plan.get()
         if plan is None:
-            amt = format_currency(float(input.investment_amount() or 0.0))
             risk = input.risk_level() or "Medium"
+            amt = format_currency(float(investment_input() or 0.0))
             return (
                 f"Capital ready: {amt} | Risk level: {risk}. "
                 "Click Generate Strategy to unlock tailored guidance."
-            )
+            ) + _preset_backtest_text()
 
         allocation_pct = plan.allocation_pct * 100
         text = (
@@ -1127,41 +1670,131 @@ def server(input, output, session):
         if plan.entry_z is not None and plan.exit_z is not None:
             text += f"Entry {plan.entry_z:.2f} Z / Exit {plan.exit_z:.2f} Z."
 
-        return text
+        return text + _preset_backtest_text()
+
+    @render.text
+    def portfolio_output():
+        portfolio = portfolio_result.get()
+        error = portfolio_error.get()
+        if portfolio is None:
+            return error or "Enter two or more pairs and click Build Portfolio."
+        if portfolio.weights.empty:
+            return "None of the pairs produced a backtest. " + error
+
+        perf = portfolio.performance
+        method = "Equal risk contribution" if portfolio.method == "equal_risk" else (
+            f"Volatility target {portfolio.target_volatility * 100:.0f}%"
+        )
+        lines = [
+            f"{method}: return {format_percentage(perf.total_return)}, "
+            f"volatility {format_percentage(perf.annualized_volatility)}, "
+            f"Sharpe {perf.sharpe_ratio:.2f}, max drawdown {format_percentage(perf.max_drawdown)}.",
+            f"Gross exposure {portfolio.weights.sum() * 100:.0f}% of {format_currency(perf.initial_capital)}.",
+        ]
+        for label, weight in portfolio.weights.sort_values(ascending=False).items():
+            lines.append(
+                f"  {label}: {weight * 100:.1f}% ({format_currency(weight * perf.initial_capital)}), "
+                f"{portfolio.risk_contributions[label] * 100:.1f}% of risk"
+            )
+        if error:
+            lines.append(error)
+        return "\n".join(lines)
 
     @render_widget
-    def strategy_chart():
+    def portfolio_chart():
+        portfolio = portfolio_result.get()
+        fig = go.Figure()
+        if portfolio is not None and not portfolio.pair_returns.empty:
+            weights = portfolio.weights
+            capital = portfolio.performance.initial_capital
+            growth = (1.0 + portfolio.pair_returns).cumprod()
+            for label in weights.index[weights > 0]:
+                fig.add_trace(
+                    go.Scatter(
+                        x=growth.index,
+                        y=growth[label] * capital,
+                        name=label,
+                        mode="lines",
+                        line={"width": 1},
+                        opacity=0.5,
+                    )
+                )
+            portfolio_equity = (1.0 + portfolio.pair_returns @ weights).cumprod() * capital
+            fig.add_trace(
+                go.Scatter(
+                    x=portfolio_equity.index,
+                    y=portfolio_equity,
+                    name="Portfolio",
+                    mode="lines",
+                    line={"color": "#00E6A8", "width": 3},
+                )
+            )
+        fig.update_layout(xaxis_title="Date", yaxis_title="Equity ($, each pair at full capital)")
+        return _style_figure(fig)
+
+    @reactive.calc
+    def _plan_projection():
+        # simulated once per plan as growth of $1; the chart only rescales it
         plan = strategy_plan.get()
+        if plan is None or plan.performance is None or plan.performance.daily_returns is None:
+            return None
+        returns = plan.performance.daily_returns
+        if len(returns) < _PROJECTION_MIN_HISTORY or not returns.any():
+            return None
+        growth = simulate_growth_paths(
+            returns,
+            horizon=_PROJECTION_HORIZON_DAYS,
+            n_paths=_PROJECTION_PATHS,
+        )
+        return projection_bands(growth)
 
-        if plan is None:
-            df = pd.DataFrame({"day": [1, 2, 3, 4], "balance": [100, 102, 104, 103]})
-        else:
-            drift_map = {"Low": 0.0005, "Medium": 0.0009, "High": 0.0013}
-            vol_map = {"Low": 0.0006, "Medium": 0.0011, "High": 0.0016}
-
-            drift = drift_map.get(plan.risk_level, 0.0008)
-            vol = vol_map.get(plan.risk_level, 0.0012)
-
-            base = max(plan.suggested_notional, 1.0)
-            days = list(range(1, 16))
-            balances = []
-            value = base
-            for idx, _ in enumerate(days):
-                oscillation = ((idx % 4) - 1.5) * vol
-                value *= 1 + drift + oscillation
-                balances.append(value)
-            df = pd.DataFrame({"day": days, "balance": balances})
-
-        fig = px.line(df, x="day", y="balance")
-        fig.update_traces(line_color="#00E6A8")
+    @render_widget
+    def strategy_chart():
+        plan = strategy_plan.get()
+        bands = _plan_projection()
+        fig = go.Figure()
+
+        if bands is None:
+            message = (
+                "Generate a strategy to project its balance."
+                if plan is None
+                else "No backtest history for this plan yet — run a pairs-trading analysis first."
+            )
+            fig.add_annotation(text=message, showarrow=False, font={"color": "#AAAAAA"})
+            fig.update_xaxes(visible=False)
+            fig.update_yaxes(visible=False)
+            return _style_figure(fig)
+
+        capital = float(investment_input() or 0.0)
+        balances = bands * capital
+        days = balances.index
+
+        for low, high, opacity in (("p5", "p95", 0.15), ("p25", "p75", 0.3)):
+            fig.add_trace(
+                go.Scatter(x=days, y=balances[high], mode="lines", line={"width": 0},
+                           showlegend=False, hoverinfo="skip")
+            )
+            fig.add_trace(
+                go.Scatter(
+                    x=days,
+                    y=balances[low],
+                    mode="lines",
+                    line={"width": 0},
+                    fill="tonexty",
+                    fillcolor=f"rgba(0, 230, 168, {opacity})",
+                    name=f"{low[1:]}–{high[1:]}th percentile",
+                )
+            )
+        fig.add_trace(
+            go.Scatter(x=days, y=balances["p50"], mode="lines",
+                       line={"color": "#00E6A8", "width": 2}, name="Median")
+        )
         fig.update_layout(
-            plot_bgcolor="#0F1A1A",
-            paper_bgcolor="#0F1A1A",
-            font_color="#CCCCCC",
+            xaxis_title="Trading days ahead",
+            yaxis_title="Projected balance ($)",
+            title=f"{_PROJECTION_PATHS:,} bootstrapped paths from the {plan.risk_level} risk backtest",
         )
-        fig.update_xaxes(showgrid=False, zeroline=False)
-        fig.update_yaxes(showgrid=False, zeroline=False)
-        return fig
+        return _style_figure(fig)
 
 
 # ---------------------------------------------------------
@@ -0,0 +1,276 @@
+from __future__ import annotations
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import date
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+import pandas as pd
+
+from price_data import download_prices, seed_prices
+from result_store import ResultStore
+from strategy_engine import (
+    CostModel,
+    DEFAULT_APP_COST_MODEL,
+    DEFAULT_APP_P_THRESHOLD,
+    PairResult,
+    analyze_pair,
+    analyze_pair_momentum,
+)
+
+
+# ---------------------------------------------------------
+# Cache warm-up from a watchlist
+#
+# Runs the popular pairs through the same analyze_pair call the app makes,
+# so results land in the result store, in the shared cache (when
+# HEDGEHUB_SHARED_CACHE is set) and, for the background runner, in the app
+# process's PRICE_CACHE. Analyses run in spawned worker processes, which
+# hand their downloads back to be seeded there; from the app that keeps them
+# off the sessions' GIL, but the lightest option is the CLI from cron
+# (python warmup.py watchlist.json), which fills only the result store and
+# the shared cache. Watchlist file:
+#
+#   {
+#     "pairs": ["KO/PEP", "XOM/CVX"],
+#     "windows": [{"years": 1}, {"years": 3}, {"start": "2020-01-01", "end": "2024-12-31"}],
+#     "p_threshold": 0.05,
+#     "cost_model": {"commission_bps": 2.0, "borrow_bps_annual": 50.0},
+#     "momentum": false
+#   }
+#
+# Stored results are keyed on the exact start/end dates, so a warmed entry
+# is only hit when a user picks exactly that range. "years" windows run
+# from N years before today to today, which matches a user who sets the
+# date range to end today; fixed start/end windows suit ranges that users
+# share as links. p_threshold and cost_model default to the app's input
+# defaults (DEFAULT_APP_*); they must match what users submit.
+# ---------------------------------------------------------
+
+
+@dataclass
+class WatchItem:
+    ticker_a: str
+    ticker_b: str
+    start: str
+    end: str
+    mode: str = "pairs_trading"         # or "momentum"
+    p_threshold: float = DEFAULT_APP_P_THRESHOLD
+    cost_model: CostModel = field(default_factory=lambda: replace(DEFAULT_APP_COST_MODEL))
+
+    @property
+    def params(self) -> dict:
+        # the params the app records in the result store for this mode
+        if self.mode == "momentum":
+            return {}
+        return {"p_threshold": self.p_threshold, "cost_model": self.cost_model}
+
+
+@dataclass
+class WarmupReport:
+    started_at: float
+    elapsed: float = 0.0
+    computed: int = 0
+    stored: int = 0                     # already fresh in the result store, skipped
+    failed: list[str] = field(default_factory=list)
+
+
+def _window(spec: dict, today: date) -> tuple[str, str]:
+    if "years" in spec:
+        end = pd.Timestamp(today)
+        start = end - pd.DateOffset(years=float(spec["years"]))
+        return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+    return str(spec["start"]), str(spec["end"])
+
+
+def load_watchlist(path: str | os.PathLike, today: date | None = None) -> list[WatchItem]:
+    with open(path, encoding="utf-8") as fh:
+        config = json.load(fh)
+
+    today = today or date.today()
+    windows = [_window(spec, today) for spec in config.get("windows", [{"years": 1}])]
+    p_threshold = float(config.get("p_threshold", DEFAULT_APP_P_THRESHOLD))
+    cost_model = CostModel(**config["cost_model"]) if "cost_model" in config else replace(DEFAULT_APP_COST_MODEL)
+    modes = ["pairs_trading", "momentum"] if config.get("momentum") else ["pairs_trading"]
+
+    items = []
+    for pair in config.get("pairs", []):
+        legs = [leg.strip().upper() for leg in pair.split("/")]
+        if len(legs) != 2 or not all(legs):
+            continue
+        for start, end in windows:
+            for mode in modes:
+                items.append(WatchItem(legs[0], legs[1], start, end, mode, p_threshold, cost_model))
+    return items
+
+
+def _is_stored(item: WatchItem, store: ResultStore, max_age_seconds: float | None) -> bool:
+    hit = store.find(
+        item.ticker_a, item.ticker_b, item.start, item.end,
+        mode=item.mode, params=item.params, max_age_seconds=max_age_seconds,
+    )
+    return hit is not None
+
+
+def _analyze(item: WatchItem) -> tuple[PairResult, dict[str, pd.Series]]:
+    # runs in a worker process; the downloads go back too, for the parent's PRICE_CACHE
+    prices = {
+        ticker: download_prices(ticker, item.start, item.end) for ticker in (item.ticker_a, item.ticker_b)
+    }
+    if item.mode == "momentum":
+        result = analyze_pair_momentum(item.ticker_a, item.ticker_b, item.start, item.end)
+    else:
+        result = analyze_pair(
+            item.ticker_a, item.ticker_b, item.start, item.end,
+            p_threshold=item.p_threshold, cost_model=item.cost_model,
+        )
+    return result, prices
+
+
+def warm_up(
+    items: list[WatchItem],
+    max_workers: int = 2,
+    store: ResultStore | None = None,
+    max_age_seconds: float | None = 6 * 3600,
+    stop: threading.Event | None = None,
+) -> WarmupReport:
+    """
+    Analyze every watchlist item not already fresh in ``store`` on a pool of
+    ``max_workers`` spawned processes; results are saved, and the downloaded
+    prices seeded into PRICE_CACHE, from this process.
+    A failing pair is recorded and skipped; ``stop`` cancels items not yet started.
+    """
+    report = WarmupReport(started_at=time.time())
+    started = time.perf_counter()
+
+    todo = []
+    for item in items:
+        if store is not None and _is_stored(item, store, max_age_seconds):
+            report.stored += 1
+        else:
+            todo.append(item)
+
+    if todo:
+        # spawn, not fork: the app process runs threads (sessions, this warm-up)
+        with ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            futures = [(item, pool.submit(_analyze, item)) for item in todo]
+            for item, future in futures:
+                if stop is not None and stop.is_set():
+                    future.cancel()
+                try:
+                    result, prices = future.result()
+                    for ticker, series in prices.items():
+                        seed_prices(ticker, item.start, item.end, series)
+                    if store is not None:
+                        store.save(result, item.ticker_a, item.ticker_b, item.start, item.end, item.params)
+                except CancelledError:
+                    continue
+                except Exception as err:
+                    report.failed.append(f"{item.ticker_a}/{item.ticker_b} {item.start}..{item.end} ({err})")
+                    continue
+                report.computed += 1
+
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+# ---------------------------------------------------------
+# Background runner for the app process
+# ---------------------------------------------------------
+class Warmup:
+    """
+    Daemon thread that warms the watchlist right away and then every
+    ``interval_seconds`` (None = once). The watchlist file is re-read each
+    round so "years" windows follow the calendar and edits need no restart.
+    The thread only coordinates; the analyses run in worker processes.
+    """
+
+    def __init__(
+        self,
+        watchlist: str | os.PathLike,
+        interval_seconds: float | None = None,
+        max_workers: int = 2,
+        store: ResultStore | None = None,
+    ):
+        self.watchlist = watchlist
+        self.interval_seconds = interval_seconds
+        self.max_workers = max_workers
+        self.store = store
+        self.last_report: WarmupReport | None = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="hedgehub-warmup", daemon=True)
+
+    def start(self) -> "Warmup":
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                items = load_watchlist(self.watchlist)
+                self.last_report = warm_up(items, self.max_workers, self.store, stop=self._stop)
+                report = self.last_report
+                print(
+                    f"Warm-up: {report.computed} computed, {report.stored} already stored, "
+                    f"{len(report.failed)} failed in {report.elapsed:.1f}s"
+                )
+            except Exception as e:
+                print("Warm-up error:", e)
+            if not self.interval_seconds:
+                return
+            self._stop.wait(self.interval_seconds)
+
+
+def start_warmup_from_env(store: ResultStore | None = None) -> Warmup | None:
+    """
+    Start a background warm-up when HEDGEHUB_WATCHLIST names a watchlist file.
+      HEDGEHUB_WARMUP_INTERVAL  seconds between rounds, unset or 0 = once at startup
+      HEDGEHUB_WARMUP_WORKERS   pairs analyzed at once, default 2
+    """
+    path = os.environ.get("HEDGEHUB_WATCHLIST")
+    if not path:
+        return None
+    interval = float(os.environ.get("HEDGEHUB_WARMUP_INTERVAL", 0)) or None
+    workers = int(os.environ.get("HEDGEHUB_WARMUP_WORKERS", 2))
+    return Warmup(path, interval, workers, store).start()
+
+
+def main(argv: list[str] | None = None) -> WarmupReport:
+    parser = argparse.ArgumentParser(description="Precompute watchlist pairs into the Hedgehub caches")
+    parser.add_argument("watchlist", help="watchlist JSON file")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--results-db", help="result store to fill (default: HEDGEHUB_RESULTS_DB)")
+    parser.add_argument("--no-store", action="store_true", help="only warm the price/shared caches")
+    args = parser.parse_args(argv)
+
+    store = None if args.no_store else ResultStore(args.results_db)
+    try:
+        report = warm_up(load_watchlist(args.watchlist), max_workers=args.workers, store=store)
+    finally:
+        if store is not None:
+            store.close()
+    print(
+        f"{report.computed} computed, {report.stored} already stored, "
+        f"{len(report.failed)} failed in {report.elapsed:.1f}s"
+    )
+    for failure in report.failed:
+        print("  failed:", failure)
+    return report
+
+
+if __name__ == "__main__":
+    main()